@@ -4,7 +4,8 @@ QR Code Generator - Backend Flask unifié avec MySQL/SQLite
 Version propre et organisée
 """
 
-from flask import Flask, request, jsonify, redirect
+from flask import Flask, Response, request, jsonify, redirect, stream_with_context
+from markupsafe import escape
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -12,11 +13,12 @@ from flask_jwt_extended import JWTManager, create_access_token, create_refresh_t
 from flask_mail import Mail, Message
 from email_validator import validate_email, EmailNotValidError
 import os
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import click
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import uuid
-import string
-import random
 import secrets
 from dotenv import load_dotenv
 
@@ -25,10 +27,97 @@ load_dotenv()
 
 # Import des modèles et configuration
 from config import get_config
-from models import db, User, RefreshToken, QRCode, QRScanLog, ShortLink
+from models import db, User, RefreshToken, QRCode, QRScanLog, QRScanRollup, QRScanSketch, ShortLink
+from cache import LRUCache, CachedShortLink, MISSING_SHORT_LINK
+from scan_ingest import ScanIngestor, ScanEvent
+from short_code_filter import ShortCodeFilter
+from redirect_map import RedirectMapExporter
+from user_agents import classify as classify_user_agent, cache_stats as user_agent_cache_stats
+from geoip import build_database_from_csv, open_database
+from short_codes import ShortCodeAllocator
+from qr_ids import new_qr_id
+from migrations import backfill_last_scanned_at, pending_schema_changes, upgrade_schema
+from scan_segments import SEGMENT_BUCKETS, SEGMENT_GROUPS, open_store as open_segment_store
+from scan_archive import open_archive as open_scan_archive, purge_scan_logs
+from scan_export import EXPORT_FORMATS, iter_scan_rows, stream_export
+from pagination import encode_cursor, decode_cursor, keyset_before
+from qr_render import (
+    EC_LEVELS, IMAGE_DEFAULT_SIZE, IMAGE_FORMATS, IMAGE_MAX_SIZE, IMAGE_MIMETYPES, IMAGE_MIN_SIZE,
+    DataTooLongError, clamp_size, parse_color, render as render_qr_image
+)
+from image_cache import image_key, open_disk_cache as open_image_disk_cache
+from scan_rollups import (
+    BUCKETS, DIMENSIONS, GRANULARITIES, backfill_rollups, backfill_sketches, bucket_range, bucket_start,
+    query_rollups, query_sketches, query_user_rollups, rollup_version, union_count
+)
 
-def create_app():
-    """Factory pour créer l'application Flask"""
+# Pages HTML de la redirection (rendues une fois dans create_app)
+NOT_FOUND_PAGE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Lien non trouvé</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }
+        .error { color: #d32f2f; }
+        .code { background: #f5f5f5; padding: 10px; border-radius: 5px; }
+    </style>
+</head>
+<body>
+    <h1 class="error">Lien court introuvable</h1>
+    <p>Le lien court <code class="code">{short_code}</code> n'existe pas ou a expiré.</p>
+    <p><a href="https://qrcodes.taohome.ci">Retour à l'accueil</a></p>
+</body>
+</html>
+'''
+
+EXPIRED_PAGE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>QR code expiré</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }
+        .error { color: #d32f2f; }
+    </style>
+</head>
+<body>
+    <h1 class="error">QR code expiré</h1>
+    <p>Ce QR code a expiré ou a été désactivé.</p>
+    <p><a href="https://qrcodes.taohome.ci">Retour à l'accueil</a></p>
+</body>
+</html>
+'''
+
+SERVER_ERROR_PAGE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Erreur serveur</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }
+        .error { color: #d32f2f; }
+    </style>
+</head>
+<body>
+    <h1 class="error">Erreur serveur</h1>
+    <p>Une erreur est survenue lors du traitement de votre demande.</p>
+    <p><a href="https://qrcodes.taohome.ci">Retour à l'accueil</a></p>
+</body>
+</html>
+'''
+
+def create_app(config_overrides: Optional[dict] = None):
+    """Factory pour créer l'application Flask
+    
+    `config_overrides` remplace des clés de configuration avant
+    l'initialisation des extensions (base SQLite de test, rate limiting,
+    ingestion synchrone...). Les réglages sont donc toujours lus dans
+    `app.config`, jamais dans l'objet de configuration du module.
+    """
     app = Flask(__name__)
     
     # Configuration selon l'environnement
@@ -41,6 +130,8 @@ def create_app():
         config = get_config()
     
     app.config.from_object(config)
+    if config_overrides:
+        app.config.update(config_overrides)
     
     # Initialisation des extensions
     db.init_app(app)
@@ -48,27 +139,141 @@ def create_app():
     mail = Mail(app)
     
     # Configuration CORS
-    CORS(app, origins=config.CORS_ORIGINS, supports_credentials=True)
+    CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
     
     # Rate limiting
     limiter = Limiter(
         key_func=get_remote_address,
         app=app,
         default_limits=["200 per day", "50 per hour"],
-        storage_uri=getattr(config, 'RATELIMIT_STORAGE_URL', 'memory://')
+        storage_uri=app.config.get('RATELIMIT_STORAGE_URL', 'memory://')
     )
+    # Référence forte : désactivé (RATELIMIT_ENABLED=False), Flask-Limiter ne
+    # s'enregistre pas dans app.extensions et ses décorateurs perdent le limiter
+    app.extensions['rate_limiter'] = limiter
     
     # Logging
-    log_level = getattr(config, 'LOG_LEVEL', 'INFO')
+    log_level = app.config.get('LOG_LEVEL', 'INFO')
     logging.basicConfig(
         level=getattr(logging, log_level),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     logger = logging.getLogger(__name__)
     
+    # Cache de résolution des liens courts (local au worker, borné par le TTL)
+    short_link_cache = LRUCache(
+        maxsize=app.config.get('SHORT_LINK_CACHE_SIZE', 10000),
+        ttl=app.config.get('SHORT_LINK_CACHE_TTL', 60)
+    )
+    app.extensions['short_link_cache'] = short_link_cache
+    
+    # Tableau de bord par utilisateur, invalidé quand les compteurs de ses QR codes changent
+    dashboard_cache = LRUCache(
+        maxsize=app.config.get('DASHBOARD_CACHE_SIZE', 1000),
+        ttl=app.config.get('DASHBOARD_CACHE_TTL', 60)
+    )
+    app.extensions['dashboard_cache'] = dashboard_cache
+    
+    # Résultats /analytics, indexés par ETag (jamais invalidés : l'ETag change)
+    analytics_cache = LRUCache(
+        maxsize=app.config.get('ANALYTICS_CACHE_SIZE', 2000),
+        ttl=app.config.get('ANALYTICS_CACHE_TTL', 300)
+    )
+    app.extensions['analytics_cache'] = analytics_cache
+    
+    # Images de QR codes rendues, indexées par l'empreinte de leurs paramètres
+    image_cache = LRUCache(
+        maxsize=app.config.get('IMAGE_CACHE_SIZE', 500),
+        ttl=app.config.get('IMAGE_CACHE_TTL', 3600)
+    )
+    app.extensions['image_cache'] = image_cache
+    image_disk_cache = open_image_disk_cache(
+        app.config.get('IMAGE_CACHE_DIR', ''),
+        app.config.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+    )
+    app.extensions['image_disk_cache'] = image_disk_cache
+    
+    def invalidate_dashboards(qr_ids: set) -> None:
+        """Invalide les tableaux de bord des propriétaires des QR codes scannés"""
+        if not len(dashboard_cache):
+            return
+        user_ids = db.session.execute(
+            db.select(QRCode.user_id).where(QRCode.id.in_(qr_ids)).distinct()
+        ).scalars().all()
+        dashboard_cache.invalidate_many(user_ids)
+    
+    # Base IP -> pays, interrogée par le thread d'ingestion
+    geoip_db = open_database(
+        app.config.get('GEOIP_DB_PATH', ''),
+        cache_size=app.config.get('GEOIP_CACHE_SIZE', 10000)
+    )
+    app.extensions['geoip'] = geoip_db
+    
+    # Copie en colonnes des scans pour les agrégations sur tout l'historique (optionnelle)
+    segment_store = open_segment_store(
+        app.config.get('SCAN_SEGMENTS_DIR', ''),
+        segment_rows=app.config.get('SCAN_SEGMENT_ROWS', 1000000)
+    )
+    app.extensions['scan_segments'] = segment_store
+    
+    # Écriture des scans hors du chemin de redirection
+    scan_ingestor = ScanIngestor(
+        app,
+        queue_size=app.config.get('SCAN_INGEST_QUEUE_SIZE', 10000),
+        flush_size=app.config.get('SCAN_INGEST_FLUSH_SIZE', 500),
+        flush_interval=app.config.get('SCAN_INGEST_FLUSH_INTERVAL', 1.0),
+        backpressure=app.config.get('SCAN_INGEST_BACKPRESSURE', 'drop'),
+        counter_flush_interval=app.config.get('SCAN_COUNTER_FLUSH_INTERVAL', 5.0),
+        country_resolver=geoip_db.lookup if geoip_db else None,
+        on_counters_flush=invalidate_dashboards,
+        segment_store=segment_store
+    )
+    app.extensions['scan_ingestor'] = scan_ingestor
+    
+    # Filtre des codes courts existants (reconstruit au démarrage)
+    short_code_filter = ShortCodeFilter(
+        capacity=app.config.get('SHORT_CODE_FILTER_CAPACITY', 100000),
+        error_rate=app.config.get('SHORT_CODE_FILTER_ERROR_RATE', 0.001),
+        refresh_interval=app.config.get('SHORT_CODE_FILTER_REFRESH_INTERVAL', 2.0)
+    )
+    app.extensions['short_code_filter'] = short_code_filter
+    
+    # Allocation des codes courts sans requête d'unicité
+    short_code_allocator = ShortCodeAllocator(
+        block_size=app.config.get('SHORT_CODE_BLOCK_SIZE', 1000),
+        min_length=app.config.get('SHORT_CODE_MIN_LENGTH', 7),
+        max_length=app.config.get('SHORT_CODE_MAX_LENGTH', 10)
+    )
+    app.extensions['short_code_allocator'] = short_code_allocator
+    
+    # Table de redirection exportée pour le serveur web frontal (optionnelle)
+    redirect_map_path = app.config.get('REDIRECT_MAP_PATH', '')
+    redirect_map = RedirectMapExporter(
+        redirect_map_path,
+        app.config.get('REDIRECT_MAP_FORMAT', 'nginx'),
+        reload_command=app.config.get('REDIRECT_MAP_RELOAD_COMMAND', ''),
+        flush_interval=app.config.get('REDIRECT_MAP_FLUSH_INTERVAL', 1.0),
+        app=app,
+        export_interval=app.config.get('REDIRECT_MAP_EXPORT_INTERVAL', 300.0),
+        allow_uncounted=app.config.get('REDIRECT_MAP_ALLOW_UNCOUNTED', False)
+    ) if redirect_map_path else None
+    app.extensions['redirect_map'] = redirect_map
+    # Archives des logs de scan purgés par la rétention (relues par l'export)
+    scan_archive = open_scan_archive(app.config.get('SCAN_ARCHIVE_DIR', ''))
+    app.extensions['scan_archive'] = scan_archive
+    beacon_allowed_ips = set(app.config.get('REDIRECT_BEACON_ALLOWED_IPS', ['127.0.0.1', '::1']))
+    
+    # Pages d'erreur de la redirection : seul le code (échappé) est inséré par requête
+    not_found_head, not_found_tail = NOT_FOUND_PAGE.split('{short_code}')
+    expired_page = EXPIRED_PAGE
+    server_error_page = SERVER_ERROR_PAGE
+    
+    def not_found_page(short_code: str):
+        return not_found_head + str(escape(short_code)) + not_found_tail, 404
+    
     # Configuration JWT
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=getattr(config, 'JWT_ACCESS_TOKEN_EXPIRES', 900))
-    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(seconds=getattr(config, 'JWT_REFRESH_TOKEN_EXPIRES', 2592000))
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=app.config.get('JWT_ACCESS_TOKEN_EXPIRES', 900))
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(seconds=app.config.get('JWT_REFRESH_TOKEN_EXPIRES', 2592000))
     
     # JWT Error Handlers
     @jwt.expired_token_loader
@@ -98,20 +303,87 @@ def create_app():
             return None
         return text.strip()
     
-    def generate_short_code(length: int = 6) -> str:
-        """Génère un code court aléatoire"""
-        characters = string.ascii_letters + string.digits
-        return ''.join(random.choice(characters) for _ in range(length))
-    
-    def get_device_type(user_agent: str) -> str:
-        """Détermine le type d'appareil"""
-        user_agent = user_agent.lower()
-        if 'mobile' in user_agent or 'android' in user_agent or 'iphone' in user_agent:
-            return 'mobile'
-        elif 'tablet' in user_agent or 'ipad' in user_agent:
-            return 'tablet'
-        else:
-            return 'desktop'
+    def is_valid_size(size) -> bool:
+        """Taille d'image en pixels : entier entre IMAGE_MIN_SIZE et IMAGE_MAX_SIZE"""
+        return (isinstance(size, int) and not isinstance(size, bool)
+                and IMAGE_MIN_SIZE <= size <= IMAGE_MAX_SIZE)
+    
+    def parse_iso_datetime(value) -> datetime:
+        """Date ISO 8601 d'un paramètre, en UTC sans fuseau comme les colonnes.
+        Le suffixe « Z » est accepté (fromisoformat le refuse avant Python 3.11) ;
+        ValueError si la date est invalide."""
+        value = str(value).strip()
+        if value[-1:] in ('Z', 'z'):
+            value = value[:-1] + '+00:00'
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment
+    
+    def resolve_short_link(short_code: str) -> Optional[CachedShortLink]:
+        """Résout un code court via le cache, la base n'est lue qu'en cas d'absence
+        (une seule requête indexée : lien court joint à son QR code) ; les codes
+        inconnus sont aussi mis en cache"""
+        entry = short_link_cache.get(short_code)
+        if entry is None:
+            row = db.session.execute(
+                db.select(
+                    ShortLink.original_url,
+                    ShortLink.qr_code_id,
+                    ShortLink.is_active,
+                    QRCode.status,
+                    QRCode.expires_at
+                )
+                .outerjoin(QRCode, QRCode.id == ShortLink.qr_code_id)
+                .where(ShortLink.short_code == short_code)
+            ).first()
+            if not row:
+                short_link_cache.set(short_code, MISSING_SHORT_LINK)
+                return None
+            entry = CachedShortLink(
+                original_url=row.original_url,
+                qr_code_id=row.qr_code_id,
+                is_active=bool(row.is_active),
+                qr_status=row.status,
+                expires_at=row.expires_at
+            )
+            short_link_cache.set(short_code, entry)
+        if entry is MISSING_SHORT_LINK:
+            return None
+        return entry
+    
+    def record_scan(short_code: str, short_link: CachedShortLink, ip_address: Optional[str]) -> None:
+        """Dépose le scan dans la file d'ingestion (compteurs et log écrits en arrière-plan) ;
+        les robots et aperçus de liens ne sont pas comptés"""
+        user_agent = request.headers.get('User-Agent')
+        agent = classify_user_agent(user_agent)
+        if agent.is_bot:
+            scan_ingestor.bots += 1
+            return
+        scan_ingestor.submit(ScanEvent(
+            short_code=short_code,
+            qr_code_id=short_link.qr_code_id,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            device_type=agent.device_type,
+            os=agent.os,
+            browser=agent.browser,
+            scanned_at=datetime.utcnow()
+        ))
+    
+    def sync_redirect_map(upserts: Optional[dict] = None, removals: Optional[list] = None,
+                          expires_at: Optional[datetime] = None) -> None:
+        """Répercute les changements de liens dans la table du serveur frontal
+        (`expires_at` : première expiration des liens ajoutés)"""
+        if redirect_map is None:
+            return
+        try:
+            if upserts:
+                redirect_map.upsert_many(upserts, expires_at)
+            if removals:
+                redirect_map.remove_many(removals)
+        except Exception as e:
+            logger.error(f"Erreur mise à jour table de redirection: {e}")
     
     # Routes d'authentification
     @app.route('/register', methods=['POST'])
@@ -197,7 +469,7 @@ def create_app():
                 token=refresh_token,
                 ip_address=request.remote_addr,
                 user_agent=request.headers.get('User-Agent', ''),
-                device_info=get_device_type(request.headers.get('User-Agent', ''))
+                device_info=classify_user_agent(request.headers.get('User-Agent', '')).device_type
             )
             
             db.session.add(refresh_token_obj)
@@ -299,26 +571,28 @@ def create_app():
             if not data:
                 return jsonify({'error': 'Données manquantes'}), 400
             
-            # Générer un ID unique pour le QR code
+            size = data.get('size', IMAGE_DEFAULT_SIZE)
+            if not is_valid_size(size):
+                return jsonify({'error': 'Taille invalide'}), 400
+            
+            # Générer un ID unique pour le QR code (ULID ordonné, sans requête d'unicité)
             qr_id = data.get('id')
             if not qr_id:
-                # Générer un ID unique avec timestamp et random
-                timestamp = int(datetime.now().timestamp() * 1000)
-                random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-                qr_id = f"qr_{timestamp}_{random_suffix}"
-            
-            # Vérifier si l'ID existe déjà
-            while QRCode.query.filter_by(id=qr_id).first():
-                timestamp = int(datetime.now().timestamp() * 1000)
-                random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-                qr_id = f"qr_{timestamp}_{random_suffix}"
+                qr_id = new_qr_id()
+            elif db.session.get(QRCode, qr_id):
+                # ID fourni par le client déjà pris : en générer un nouveau
+                qr_id = new_qr_id()
             
             # Vérifier si un QR code existe déjà avec le même contenu pour cet utilisateur
-            existing_qr = QRCode.query.filter_by(
-                user_id=current_user_id,
-                data=data.get('data'),
-                type=data.get('type')
-            ).first()
+            # (index composite sur l'empreinte, data n'est comparé que sur les candidats)
+            existing_qr = None
+            data_digest = QRCode.compute_digest(data.get('data'))
+            if data_digest:
+                existing_qr = QRCode.query.filter_by(
+                    user_id=current_user_id,
+                    type=data.get('type'),
+                    data_digest=data_digest
+                ).filter(QRCode.data == data.get('data')).first()
             
             if existing_qr:
                 return jsonify({
@@ -335,9 +609,7 @@ def create_app():
             
             if is_dynamic and data.get('type') == 'url':
                 # Générer un code court unique côté serveur
-                short_code = generate_short_code()
-                while ShortLink.query.filter_by(short_code=short_code).first():
-                    short_code = generate_short_code()
+                short_code = short_code_allocator.allocate()
                 
                 original_url = data.get('data')
                 base_url = app.config['BASE_URL'].rstrip('/')
@@ -365,7 +637,7 @@ def create_app():
                 original_url=original_url,
                 color=data.get('color', '#000000'),
                 background_color=data.get('backgroundColor', '#ffffff'),
-                size=data.get('size', 256),
+                size=size,
                 is_dynamic=is_dynamic,
                 short_code=short_code,
                 short_url=short_url,
@@ -375,6 +647,12 @@ def create_app():
             
             db.session.add(qr_code)
             db.session.commit()
+            dashboard_cache.invalidate(current_user_id)
+            
+            if short_code:
+                short_link_cache.invalidate(short_code)
+                short_code_filter.add(short_code)
+                sync_redirect_map(upserts={short_code: original_url}, expires_at=qr_code.expires_at)
             
             response_data = qr_code.to_dict()
             response_data['exists'] = False
@@ -387,20 +665,652 @@ def create_app():
             logger.error(f"Erreur création QR: {e}")
             return jsonify({'error': 'Erreur serveur'}), 500
     
+    # Champs de la liste paginée (mêmes noms que QRCode.to_dict et que les colonnes)
+    qr_list_fields = (
+        'id', 'user_id', 'type', 'data', 'original_url', 'color', 'background_color', 'size',
+        'is_dynamic', 'short_code', 'short_url', 'status', 'scans', 'last_scanned_at',
+        'created_at', 'updated_at', 'expires_at', 'validity_duration'
+    )
+    qr_list_params = ('limit', 'after', 'fields', 'type', 'is_dynamic', 'status',
+                      'expires_after', 'expires_before')
+    
+    def qr_filter_conditions(params) -> list:
+        """Conditions SQL des filtres de liste (type, status, is_dynamic,
+        expires_after, expires_before) ; `params` vient de la query string ou
+        d'un corps JSON. ValueError si une valeur est invalide."""
+        table = QRCode.__table__
+        conditions = []
+        for name in ('type', 'status'):
+            values = params.get(name)
+            if values:
+                if isinstance(values, str):
+                    values = values.split(',')
+                if not isinstance(values, list):
+                    raise ValueError(f'{name} invalide')
+                conditions.append(table.c[name].in_(values))
+        is_dynamic = params.get('is_dynamic')
+        if is_dynamic is not None and is_dynamic != '':
+            if not isinstance(is_dynamic, bool):
+                is_dynamic = str(is_dynamic).lower()
+                if is_dynamic not in ('true', 'false', '1', '0'):
+                    raise ValueError('is_dynamic doit valoir true ou false')
+                is_dynamic = is_dynamic in ('true', '1')
+            conditions.append(table.c.is_dynamic == is_dynamic)
+        try:
+            if params.get('expires_after'):
+                conditions.append(table.c.expires_at >= parse_iso_datetime(params['expires_after']))
+            if params.get('expires_before'):
+                conditions.append(table.c.expires_at < parse_iso_datetime(params['expires_before']))
+        except ValueError:
+            raise ValueError('Date invalide (format ISO 8601 attendu)')
+        return conditions
+    
     @app.route('/qr-codes', methods=['GET'])
     @jwt_required()
     @limiter.limit("60 per minute")
     def get_user_qr_codes():
-        """Récupérer les QR codes de l'utilisateur"""
+        """Récupérer les QR codes de l'utilisateur
+        
+        Sans paramètre : liste complète (format historique). Avec limit, after,
+        fields ou un filtre (type, is_dynamic, status, expires_after,
+        expires_before) : page triée par created_at puis id décroissants, avec
+        un curseur `next_cursor`, et seules les colonnes demandées sont lues.
+        """
         try:
             current_user_id = int(get_jwt_identity())
-            qr_codes = QRCode.query.filter_by(user_id=current_user_id).all()
+            if not any(param in request.args for param in qr_list_params):
+                qr_codes = QRCode.query.filter_by(user_id=current_user_id).all()
+                return jsonify([qr.to_dict() for qr in qr_codes]), 200
+            
+            limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+            fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or list(qr_list_fields)
+            unknown = [f for f in fields if f not in qr_list_fields]
+            if unknown:
+                return jsonify({'error': f"Champs inconnus: {', '.join(unknown)}"}), 400
+            
+            table = QRCode.__table__
+            # id et created_at sont toujours lus : ils forment le curseur
+            columns = list(dict.fromkeys(['id', 'created_at'] + fields))
+            query = (
+                db.select(*(table.c[name] for name in columns))
+                .where(table.c.user_id == current_user_id)
+                .order_by(table.c.created_at.desc(), table.c.id.desc())
+                .limit(limit + 1)
+            )
             
-            return jsonify([qr.to_dict() for qr in qr_codes]), 200
+            try:
+                query = query.where(*qr_filter_conditions(request.args))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if request.args.get('after'):
+                try:
+                    created_at, last_id = decode_cursor(request.args['after'])
+                except ValueError:
+                    return jsonify({'error': 'Curseur invalide'}), 400
+                query = query.where(keyset_before(table.c.created_at, table.c.id, created_at, last_id))
+            
+            rows = db.session.execute(query).all()
+            has_next = len(rows) > limit
+            rows = rows[:limit]
+            
+            items = []
+            for row in rows:
+                mapping = row._mapping
+                items.append({
+                    name: mapping[name].isoformat() if isinstance(mapping[name], datetime) else mapping[name]
+                    for name in fields
+                })
+            
+            return jsonify({
+                'qr_codes': items,
+                'pagination': {
+                    'limit': limit,
+                    'has_next': has_next,
+                    'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if has_next else None
+                }
+            }), 200
         except Exception as e:
             logger.error(f"Erreur récupération QR: {e}")
             return jsonify({'error': 'Erreur serveur'}), 500
     
+    @app.route('/dashboard', methods=['GET'])
+    @jwt_required()
+    @limiter.limit("60 per minute")
+    def get_dashboard():
+        """Résumé de tous les QR codes de l'utilisateur : total de scans, dernier
+        scan et activité des 7 derniers jours (deux requêtes, résultat en cache)"""
+        try:
+            current_user_id = int(get_jwt_identity())
+            cached = dashboard_cache.get(current_user_id)
+            if cached is not None:
+                return jsonify(cached), 200
+            
+            today = bucket_start(datetime.utcnow(), 'day')
+            days = bucket_range(today - timedelta(days=6), today, 'day')
+            day_index = {day: i for i, day in enumerate(days)}
+            
+            qr_codes = db.session.execute(
+                db.select(
+                    QRCode.id, QRCode.type, QRCode.short_code, QRCode.is_dynamic,
+                    QRCode.status, QRCode.scans, QRCode.last_scanned_at,
+                    QRCode.created_at, QRCode.expires_at
+                )
+                .where(QRCode.user_id == current_user_id)
+                .order_by(QRCode.created_at.desc())
+            ).all()
+            
+            sparklines = {qr.id: [0] * len(days) for qr in qr_codes}
+            for row in query_user_rollups(current_user_id, 'day', 'total', days[0]):
+                if row.qr_code_id in sparklines and row.bucket_start in day_index:
+                    sparklines[row.qr_code_id][day_index[row.bucket_start]] += row.count
+            
+            items = [{
+                'id': qr.id,
+                'type': qr.type,
+                'short_code': qr.short_code,
+                'is_dynamic': qr.is_dynamic,
+                'status': qr.status,
+                'scans': qr.scans or 0,
+                'last_scanned_at': qr.last_scanned_at.isoformat() if qr.last_scanned_at else None,
+                'created_at': qr.created_at.isoformat() if qr.created_at else None,
+                'expires_at': qr.expires_at.isoformat() if qr.expires_at else None,
+                'scans_7d': sum(sparklines[qr.id]),
+                'sparkline': sparklines[qr.id]
+            } for qr in qr_codes]
+            
+            dashboard = {
+                'days': [day.date().isoformat() for day in days],
+                'totals': {
+                    'qr_codes': len(items),
+                    'scans': sum(item['scans'] for item in items),
+                    'scans_7d': sum(item['scans_7d'] for item in items)
+                },
+                'qr_codes': items,
+                'generated_at': datetime.utcnow().isoformat()
+            }
+            dashboard_cache.set(current_user_id, dashboard)
+            return jsonify(dashboard), 200
+            
+        except Exception as e:
+            logger.error(f"Erreur tableau de bord: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    @app.route('/analytics', methods=['GET'])
+    @jwt_required()
+    @limiter.limit("120 per minute")
+    def get_analytics():
+        """Scans par période (hour, day, week, month) d'un ou plusieurs QR codes,
+        éventuellement ventilés par device_type ou country, lus dans les agrégats.
+        
+        L'ETag dépend de l'état des agrégats des QR codes concernés sur la
+        plage et des paramètres : un tableau de bord qui interroge en boucle
+        reçoit 304 tant qu'aucun de ses QR codes n'est scanné.
+        """
+        try:
+            current_user_id = int(get_jwt_identity())
+            
+            bucket = request.args.get('bucket', 'day')
+            group_by = request.args.get('group_by') or 'total'
+            if bucket not in BUCKETS:
+                return jsonify({'error': f"bucket doit être parmi {', '.join(BUCKETS)}"}), 400
+            if group_by not in DIMENSIONS:
+                return jsonify({'error': f"group_by doit être parmi {', '.join(DIMENSIONS[1:])}"}), 400
+            try:
+                end = parse_iso_datetime(request.args['to']) if request.args.get('to') else datetime.utcnow()
+                # Début par défaut aligné sur la période : l'ETag reste stable d'un appel à l'autre
+                start = (parse_iso_datetime(request.args['from']) if request.args.get('from')
+                         else bucket_start(end - timedelta(days=30), bucket))
+            except ValueError:
+                return jsonify({'error': 'Date invalide (format ISO 8601 attendu)'}), 400
+            if start > end:
+                return jsonify({'error': 'from doit précéder to'}), 400
+            buckets = bucket_range(start, end, bucket)
+            if len(buckets) > 1000:
+                return jsonify({'error': 'Plage trop longue pour cette période (1000 périodes maximum)'}), 400
+            
+            # QR codes demandés, restreints à ceux de l'utilisateur
+            requested = [qr_id.strip() for qr_id in request.args.get('qr_ids', '').split(',') if qr_id.strip()]
+            if len(requested) > 200:
+                return jsonify({'error': '200 QR codes maximum par requête'}), 400
+            owned_query = db.select(QRCode.id).where(QRCode.user_id == current_user_id)
+            if requested:
+                owned_query = owned_query.where(QRCode.id.in_(requested))
+            qr_ids = sorted(db.session.execute(owned_query).scalars().all())
+            if requested and len(qr_ids) != len(set(requested)):
+                return jsonify({'error': 'QR code non trouvé'}), 404
+            
+            source = 'hour' if bucket == 'hour' else 'day'
+            first = bucket_start(start, source)
+            if requested:
+                version = rollup_version(source, first, end, qr_ids=qr_ids) if qr_ids else (0, 0)
+            else:
+                version = rollup_version(source, first, end, user_id=current_user_id)
+            # Période courante incluse : sans `to`, l'ETag change au passage à la période suivante
+            etag = hashlib.sha256('|'.join([
+                str(current_user_id), '%d:%d' % version, bucket, group_by,
+                start.isoformat(), end.isoformat() if request.args.get('to') else '',
+                bucket_start(end, bucket).isoformat(), ','.join(qr_ids)
+            ]).encode('utf-8')).hexdigest()[:32]
+            
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            
+            result = analytics_cache.get(etag)
+            if result is None:
+                if requested:
+                    rows = query_rollups(qr_ids, source, group_by, first, end) if qr_ids else []
+                else:
+                    rows = query_user_rollups(current_user_id, source, group_by, first, end)
+                
+                counts = {b: {} for b in buckets}
+                total = 0
+                for row in rows:
+                    period = counts.setdefault(bucket_start(row.bucket_start, bucket), {})
+                    value = row.value or 'unknown'
+                    period[value] = period.get(value, 0) + row.count
+                    total += row.count
+                
+                if group_by == 'total':
+                    series = [{'bucket': b.isoformat(), 'count': sum(c.values())} for b, c in sorted(counts.items())]
+                else:
+                    series = [{'bucket': b.isoformat(), 'counts': c} for b, c in sorted(counts.items())]
+                result = {
+                    'qr_code_ids': qr_ids,
+                    'bucket': bucket,
+                    'group_by': None if group_by == 'total' else group_by,
+                    'from': start.isoformat(),
+                    'to': end.isoformat(),
+                    'total': total,
+                    'series': series
+                }
+                analytics_cache.set(etag, result)
+            
+            response = jsonify(result)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response, 200
+            
+        except Exception as e:
+            logger.error(f"Erreur analytics: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    def serialize_qr_row(values: dict) -> dict:
+        """Dictionnaire au format QRCode.to_dict à partir des valeurs de colonnes"""
+        return {
+            name: values.get(name).isoformat() if isinstance(values.get(name), datetime) else values.get(name)
+            for name in qr_list_fields
+        }
+    
+    @app.route('/qr-codes/batch', methods=['POST'])
+    @jwt_required()
+    @limiter.limit("10 per minute")
+    def create_qr_codes_batch():
+        """Créer des QR codes en lot (tirages imprimés)
+        
+        Corps : liste d'éléments au format de POST /qr-codes (ou {"items": [...]}).
+        Tout est validé avant écriture ; un élément invalide rejette le lot.
+        Les contenus déjà existants (ou répétés dans le lot) ne sont pas recréés.
+        Les résultats sont renvoyés dans l'ordre des éléments.
+        """
+        try:
+            current_user_id = int(get_jwt_identity())
+            payload = request.get_json(silent=True)
+            items = payload.get('items') if isinstance(payload, dict) else payload
+            if not isinstance(items, list) or not items:
+                return jsonify({'error': 'Liste de QR codes manquante'}), 400
+            max_size = app.config.get('QR_BATCH_MAX_SIZE', 5000)
+            if len(items) > max_size:
+                return jsonify({'error': f'{max_size} QR codes maximum par lot'}), 400
+            
+            # Validation complète avant toute requête
+            errors = []
+            parsed = []
+            for index, item in enumerate(items):
+                if not isinstance(item, dict):
+                    errors.append({'index': index, 'error': 'Élément invalide'})
+                    continue
+                qr_type = item.get('type')
+                content = item.get('data')
+                if not qr_type or not isinstance(qr_type, str) or len(qr_type) > 20:
+                    errors.append({'index': index, 'error': 'Type manquant ou invalide'})
+                    continue
+                if not content or not isinstance(content, str):
+                    errors.append({'index': index, 'error': 'Contenu manquant'})
+                    continue
+                try:
+                    expires_at = datetime.fromisoformat(str(item.get('expiresAt')).replace('Z', '+00:00'))
+                except ValueError:
+                    errors.append({'index': index, 'error': "Date d'expiration invalide"})
+                    continue
+                size = item.get('size', IMAGE_DEFAULT_SIZE)
+                if not is_valid_size(size):
+                    errors.append({'index': index, 'error': 'Taille invalide'})
+                    continue
+                parsed.append({
+                    'client_id': item.get('id') if isinstance(item.get('id'), str) else None,
+                    'type': qr_type,
+                    'data': content,
+                    'digest': QRCode.compute_digest(content),
+                    'is_dynamic': bool(item.get('isDynamic', False)),
+                    'color': sanitize_input(item.get('color') or '#000000', 7) or '#000000',
+                    'background_color': sanitize_input(item.get('backgroundColor') or '#ffffff', 7) or '#ffffff',
+                    'size': size,
+                    'expires_at': expires_at,
+                    'validity_duration': item.get('validityDuration')
+                })
+            if errors:
+                return jsonify({'error': 'Lot invalide, aucun QR code créé', 'errors': errors}), 400
+            
+            table = QRCode.__table__
+            
+            # Déduplication : une requête pour toutes les empreintes du lot
+            existing = {}
+            for row in db.session.execute(
+                db.select(table).where(
+                    table.c.user_id == current_user_id,
+                    table.c.data_digest.in_({item['digest'] for item in parsed})
+                )
+            ).mappings():
+                existing.setdefault((row['type'], row['data']), dict(row))
+            
+            # Identifiants fournis par le client : une requête pour ceux déjà pris
+            client_ids = {item['client_id'] for item in parsed if item['client_id']}
+            taken_ids = set()
+            if client_ids:
+                taken_ids = set(db.session.execute(
+                    db.select(table.c.id).where(table.c.id.in_(client_ids))
+                ).scalars())
+            
+            to_create = []
+            results = []
+            created_keys = {}
+            for item in parsed:
+                key = (item['type'], item['data'])
+                if key in existing:
+                    results.append(('existing', existing[key]))
+                elif key in created_keys:
+                    results.append(('existing', created_keys[key]))
+                else:
+                    qr_id = item['client_id']
+                    if not qr_id or qr_id in taken_ids:
+                        qr_id = new_qr_id()
+                    taken_ids.add(qr_id)
+                    row = {
+                        'id': qr_id,
+                        'user_id': current_user_id,
+                        'type': item['type'],
+                        'data': item['data'],
+                        'data_digest': item['digest'],
+                        'original_url': None,
+                        'color': item['color'],
+                        'background_color': item['background_color'],
+                        'size': item['size'],
+                        'is_dynamic': item['is_dynamic'],
+                        'short_code': None,
+                        'short_url': None,
+                        'status': 'active',
+                        'scans': 0,
+                        'expires_at': item['expires_at'],
+                        'validity_duration': item['validity_duration']
+                    }
+                    to_create.append(row)
+                    if not (item['is_dynamic'] and item['type'] == 'url'):
+                        # Un QR dynamique contient son URL courte : jamais dédupliqué (comme POST /qr-codes)
+                        created_keys[key] = row
+                    results.append(('created', row))
+            
+            # Codes courts et liens courts des QR dynamiques, réservés en un bloc
+            dynamic_rows = [row for row in to_create if row['is_dynamic'] and row['type'] == 'url']
+            base_url = app.config['BASE_URL'].rstrip('/')
+            now = datetime.utcnow()
+            short_links = []
+            for row, short_code in zip(dynamic_rows, short_code_allocator.allocate_many(len(dynamic_rows))):
+                row['original_url'] = row['data']
+                row['short_code'] = short_code
+                row['short_url'] = f"{base_url}/go/{short_code}"
+                # Le QR code contient l'URL courte générée par le serveur
+                row['data'] = row['short_url']
+                row['data_digest'] = QRCode.compute_digest(row['data'])
+                short_links.append({
+                    'short_code': short_code,
+                    'original_url': row['original_url'],
+                    'qr_code_id': row['id'],
+                    'clicks': 0,
+                    'is_active': True,
+                    'created_at': now,
+                    'updated_at': now
+                })
+            for row in to_create:
+                row['created_at'] = now
+                row['updated_at'] = now
+            
+            # Une transaction, deux INSERT multi-lignes
+            if to_create:
+                db.session.execute(table.insert(), to_create)
+                if short_links:
+                    db.session.execute(ShortLink.__table__.insert(), short_links)
+                db.session.commit()
+                dashboard_cache.invalidate(current_user_id)
+                short_link_cache.invalidate_many([link['short_code'] for link in short_links])
+                for link in short_links:
+                    short_code_filter.add(link['short_code'])
+                sync_redirect_map(
+                    upserts={link['short_code']: link['original_url'] for link in short_links},
+                    expires_at=min((row['expires_at'] for row in dynamic_rows), default=None)
+                )
+            
+            logger.info(f"Lot de QR codes: {len(to_create)} créés, {len(parsed) - len(to_create)} existants, "
+                        f"utilisateur: {current_user_id}")
+            
+            response_items = []
+            for index, (status, row) in enumerate(results):
+                item = serialize_qr_row(row)
+                item['index'] = index
+                item['exists'] = status == 'existing'
+                response_items.append(item)
+            
+            return jsonify({
+                'created': len(to_create),
+                'existing': len(parsed) - len(to_create),
+                'results': response_items
+            }), 201 if to_create else 200
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erreur création QR en lot: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    def select_qr_batch(user_id: int, payload: dict):
+        """QR codes visés par une opération en lot : {"ids": [...]} et/ou
+        {"filter": {...}} (mêmes filtres que GET /qr-codes), toujours restreints
+        à l'utilisateur. Renvoie (ids demandés ou None, lignes trouvées)."""
+        max_size = app.config.get('QR_BATCH_MAX_SIZE', 5000)
+        ids = payload.get('ids')
+        filters = payload.get('filter')
+        if ids is None and filters is None:
+            raise ValueError('Liste d\'identifiants ou filtre manquant')
+        table = QRCode.__table__
+        query = (
+            db.select(table.c.id, table.c.short_code, table.c.is_dynamic)
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.created_at.desc(), table.c.id.desc())
+            .limit(max_size + 1)
+        )
+        if ids is not None:
+            if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+                raise ValueError('Liste d\'identifiants invalide')
+            ids = list(dict.fromkeys(ids))
+            if len(ids) > max_size:
+                raise ValueError(f'{max_size} QR codes maximum par lot')
+            query = query.where(table.c.id.in_(ids))
+        if filters is not None:
+            if not isinstance(filters, dict):
+                raise ValueError('Filtre invalide')
+            query = query.where(*qr_filter_conditions(filters))
+        rows = db.session.execute(query).all()
+        if len(rows) > max_size:
+            raise ValueError(f'Plus de {max_size} QR codes correspondent au filtre, affinez-le')
+        return ids, rows
+    
+    def batch_results(ids, rows, outcomes: dict) -> list:
+        """Statut par identifiant, dans l'ordre des ids demandés (ou des lignes)"""
+        order = ids if ids is not None else [row.id for row in rows]
+        return [{'id': qr_id, 'status': outcomes.get(qr_id, 'not_found')} for qr_id in order]
+    
+    @app.route('/qr-codes/batch', methods=['PUT'])
+    @jwt_required()
+    @limiter.limit("10 per minute")
+    def update_qr_codes_batch():
+        """Mettre à jour des QR codes en lot
+        
+        Corps : {"ids": [...]} ou {"filter": {...}}, et "changes" avec color,
+        backgroundColor, size et/ou newUrl (QR dynamiques uniquement : les
+        autres sont laissés intacts et signalés `not_dynamic`). Une requête
+        UPDATE par table, la propriété est vérifiée dans le WHERE.
+        """
+        try:
+            current_user_id = int(get_jwt_identity())
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict):
+                return jsonify({'error': 'Données manquantes'}), 400
+            changes = payload.get('changes')
+            if not isinstance(changes, dict) or not changes:
+                return jsonify({'error': 'Modifications manquantes'}), 400
+            
+            values = {}
+            if 'color' in changes:
+                values['color'] = sanitize_input(changes['color'], 7)
+            if 'backgroundColor' in changes:
+                values['background_color'] = sanitize_input(changes['backgroundColor'], 7)
+            if 'size' in changes:
+                size = changes['size']
+                if not is_valid_size(size):
+                    return jsonify({'error': 'Taille invalide'}), 400
+                values['size'] = size
+            new_url = None
+            if 'newUrl' in changes:
+                new_url = sanitize_input(changes['newUrl'], 2000)
+                if not new_url:
+                    return jsonify({'error': 'URL invalide'}), 400
+                values['original_url'] = new_url
+            if not values:
+                return jsonify({'error': 'Aucune modification reconnue'}), 400
+            
+            try:
+                ids, rows = select_qr_batch(current_user_id, payload)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            outcomes = {}
+            targets = []
+            for row in rows:
+                if new_url is not None and not row.is_dynamic:
+                    outcomes[row.id] = 'not_dynamic'
+                else:
+                    outcomes[row.id] = 'updated'
+                    targets.append(row)
+            
+            if targets:
+                table = QRCode.__table__
+                now = datetime.utcnow()
+                target_ids = [row.id for row in targets]
+                owned = db.select(table.c.id).where(table.c.user_id == current_user_id, table.c.id.in_(target_ids))
+                db.session.execute(
+                    table.update()
+                    .where(table.c.user_id == current_user_id, table.c.id.in_(target_ids))
+                    .values(updated_at=now, **values)
+                )
+                short_codes = [row.short_code for row in targets if row.short_code]
+                if new_url is not None:
+                    links = ShortLink.__table__
+                    db.session.execute(
+                        links.update()
+                        .where(links.c.qr_code_id.in_(owned))
+                        .values(original_url=new_url, updated_at=now)
+                    )
+                db.session.commit()
+                if new_url is not None and short_codes:
+                    short_link_cache.invalidate_many(short_codes)
+                    sync_redirect_map(upserts={code: new_url for code in short_codes})
+            
+            updated = len(targets)
+            logger.info(f"Lot de QR codes: {updated} mis à jour, utilisateur: {current_user_id}")
+            
+            return jsonify({
+                'updated': updated,
+                'results': batch_results(ids, rows, outcomes)
+            }), 200
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erreur mise à jour QR en lot: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    @app.route('/qr-codes/batch', methods=['DELETE'])
+    @jwt_required()
+    @limiter.limit("10 per minute")
+    def delete_qr_codes_batch():
+        """Supprimer des QR codes en lot
+        
+        Corps : {"ids": [...]} ou {"filter": {...}}. Logs, agrégats, sketches,
+        liens courts puis QR codes sont supprimés par une requête DELETE par
+        table, dans une seule transaction.
+        """
+        try:
+            current_user_id = int(get_jwt_identity())
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict):
+                return jsonify({'error': 'Données manquantes'}), 400
+            try:
+                ids, rows = select_qr_batch(current_user_id, payload)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            target_ids = [row.id for row in rows]
+            short_codes = [row.short_code for row in rows if row.short_code]
+            if target_ids:
+                table = QRCode.__table__
+                owned = db.select(table.c.id).where(table.c.user_id == current_user_id, table.c.id.in_(target_ids))
+                # Enfants d'abord : pas de cascade ORM pour un DELETE ensembliste
+                for child in (QRScanLog, QRScanRollup, QRScanSketch, ShortLink):
+                    child_table = child.__table__
+                    db.session.execute(child_table.delete().where(child_table.c.qr_code_id.in_(owned)))
+                db.session.execute(
+                    table.delete().where(table.c.user_id == current_user_id, table.c.id.in_(target_ids))
+                )
+                db.session.commit()
+                dashboard_cache.invalidate(current_user_id)
+                
+                if short_codes:
+                    short_link_cache.invalidate_many(short_codes)
+                    sync_redirect_map(removals=short_codes)
+                if scan_archive is not None:
+                    for qr_id in target_ids:
+                        try:
+                            scan_archive.remove(qr_id)
+                        except OSError as e:
+                            logger.error(f"Erreur suppression archives de scans {qr_id}: {e}")
+                if segment_store is not None:
+                    try:
+                        segment_store.remove_many(target_ids)
+                    except OSError as e:
+                        logger.error(f"Erreur suppression historique en colonnes: {e}")
+            
+            logger.info(f"Lot de QR codes: {len(target_ids)} supprimés, utilisateur: {current_user_id}")
+            
+            return jsonify({
+                'deleted': len(target_ids),
+                'results': batch_results(ids, rows, {qr_id: 'deleted' for qr_id in target_ids})
+            }), 200
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erreur suppression QR en lot: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
     @app.route('/qr-codes/<qr_id>/update-url', methods=['PUT'])
     @jwt_required()
     @limiter.limit("30 per minute")
@@ -431,6 +1341,8 @@ def create_app():
                 qr_code.original_url = new_url
                 
                 db.session.commit()
+                short_link_cache.invalidate(short_link.short_code)
+                sync_redirect_map(upserts={short_link.short_code: new_url})
                 
                 return jsonify({
                     'success': True,
@@ -469,9 +1381,9 @@ def create_app():
             if 'backgroundColor' in data:
                 qr_code.background_color = sanitize_input(data['backgroundColor'], 7)
             if 'size' in data:
-                size = data['size']
-                if isinstance(size, int) and 100 <= size <= 1000:
-                    qr_code.size = size
+                if not is_valid_size(data['size']):
+                    return jsonify({'error': 'Taille invalide'}), 400
+                qr_code.size = data['size']
             if 'data' in data and not qr_code.is_dynamic:
                 # Seuls les QR codes non-dynamiques peuvent avoir leur data modifiée
                 qr_code.data = sanitize_input(data['data'], 2000)
@@ -503,14 +1415,32 @@ def create_app():
                 return jsonify({'error': 'QR code non trouvé'}), 404
             
             # Supprimer le lien court associé si c'est un QR code dynamique
-            if qr_code.is_dynamic and qr_code.short_code:
-                short_link = ShortLink.query.filter_by(short_code=qr_code.short_code).first()
+            short_code = qr_code.short_code
+            if qr_code.is_dynamic and short_code:
+                short_link = ShortLink.query.filter_by(short_code=short_code).first()
                 if short_link:
                     db.session.delete(short_link)
             
-            # Supprimer le QR code (les scan logs seront supprimés automatiquement grâce au cascade)
+            # Supprimer les agrégats puis le QR code (les scan logs seront supprimés automatiquement grâce au cascade)
+            QRScanRollup.query.filter_by(qr_code_id=qr_id).delete(synchronize_session=False)
+            QRScanSketch.query.filter_by(qr_code_id=qr_id).delete(synchronize_session=False)
             db.session.delete(qr_code)
             db.session.commit()
+            dashboard_cache.invalidate(current_user_id)
+            
+            if short_code:
+                short_link_cache.invalidate(short_code)
+                sync_redirect_map(removals=[short_code])
+            if scan_archive is not None:
+                try:
+                    scan_archive.remove(qr_id)
+                except OSError as e:
+                    logger.error(f"Erreur suppression archives de scans {qr_id}: {e}")
+            if segment_store is not None:
+                try:
+                    segment_store.remove_many([qr_id])
+                except OSError as e:
+                    logger.error(f"Erreur suppression historique en colonnes {qr_id}: {e}")
             
             logger.info(f"QR code supprimé: {qr_id} par utilisateur: {current_user_id}")
             
@@ -535,93 +1465,315 @@ def create_app():
                 return jsonify({'error': 'QR code non trouvé'}), 404
             
             # Récupérer les paramètres de pagination
+            # (curseur `after` ; `page` reste accepté pour les anciens clients)
+            after = request.args.get('after')
             page = request.args.get('page', 1, type=int)
-            per_page = min(request.args.get('per_page', 50, type=int), 100)  # Limiter à 100 par page
+            per_page = max(1, min(request.args.get('per_page', 50, type=int), 100))  # Limiter à 100 par page
+            include_total = request.args.get('include_total', 'true').lower() not in ('0', 'false', 'no')
             
-            # Récupérer les logs de scan avec pagination
+            # Parcours de l'index (qr_code_id, scanned_at, id), sans COUNT(*)
             scan_logs_query = QRScanLog.query.filter_by(qr_code_id=qr_id).order_by(
-                QRScanLog.scanned_at.desc()
+                QRScanLog.scanned_at.desc(), QRScanLog.id.desc()
             )
+            if after:
+                try:
+                    scanned_at, log_id = decode_cursor(after)
+                except ValueError:
+                    return jsonify({'error': 'Curseur invalide'}), 400
+                scan_logs_query = scan_logs_query.filter(
+                    keyset_before(QRScanLog.scanned_at, QRScanLog.id, scanned_at, log_id)
+                )
+            elif page > 1:
+                scan_logs_query = scan_logs_query.offset((page - 1) * per_page)
             
-            scan_logs_paginated = scan_logs_query.paginate(
-                page=page,
-                per_page=per_page,
-                error_out=False
-            )
+            logs = scan_logs_query.limit(per_page + 1).all()
+            has_next = len(logs) > per_page
+            logs = logs[:per_page]
+            next_cursor = encode_cursor(logs[-1].scanned_at, logs[-1].id) if has_next else None
             
             # Formatter les logs de scan
-            scan_logs = [log.to_dict() for log in scan_logs_paginated.items]
+            scan_logs = [log.to_dict() for log in logs]
+            
+            pagination = {
+                'per_page': per_page,
+                'has_next': has_next,
+                'has_prev': bool(after) or page > 1,
+                'next_cursor': next_cursor
+            }
+            if not after:
+                pagination['page'] = page
+            summary = {'total_scans': qr_code.scans}
+            if include_total:
+                # Total issu du compteur du QR code plutôt que d'un COUNT(*) sur les logs
+                total = qr_code.scans or 0
+                pagination['total'] = total
+                pagination['pages'] = (total + per_page - 1) // per_page
+                summary['total_logs'] = total
             
             return jsonify({
                 'qr_code_id': qr_id,
                 'scan_logs': scan_logs,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': scan_logs_paginated.total,
-                    'pages': scan_logs_paginated.pages,
-                    'has_next': scan_logs_paginated.has_next,
-                    'has_prev': scan_logs_paginated.has_prev
-                },
-                'summary': {
-                    'total_scans': qr_code.scans,
-                    'total_logs': scan_logs_paginated.total
-                }
+                'pagination': pagination,
+                'summary': summary
             }), 200
             
         except Exception as e:
             logger.error(f"Erreur récupération scan logs: {e}")
             return jsonify({'error': 'Erreur serveur'}), 500
     
+    def scan_export_response(user_id: int, qr_id: Optional[str], filename: str):
+        """Réponse en flux pour l'export des logs de scan"""
+        fmt = request.args.get('format', 'csv').lower()
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f"format doit être parmi {', '.join(EXPORT_FORMATS)}"}), 400
+        compress = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+        try:
+            start = parse_iso_datetime(request.args['from']) if request.args.get('from') else None
+            end = parse_iso_datetime(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify({'error': 'Date invalide (format ISO 8601 attendu)'}), 400
+        
+        filename = f"{filename}.{fmt}" + ('.gz' if compress else '')
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        if compress:
+            mimetype = 'application/gzip'
+        rows = iter_scan_rows(user_id, qr_id=qr_id, start=start, end=end, archive=scan_archive)
+        return Response(
+            stream_with_context(stream_export(rows, fmt, compress)),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Cache-Control': 'no-store'
+            }
+        )
+    
+    @app.route('/qr-codes/<qr_id>/scan-logs/export', methods=['GET'])
+    @jwt_required()
+    @limiter.limit("10 per minute")
+    def export_qr_scan_logs(qr_id):
+        """Exporter tous les logs de scan d'un QR code (CSV ou NDJSON)"""
+        try:
+            current_user_id = int(get_jwt_identity())
+            
+            # Vérifier que le QR code appartient à l'utilisateur
+            qr_code = QRCode.query.filter_by(id=qr_id, user_id=current_user_id).first()
+            if not qr_code:
+                return jsonify({'error': 'QR code non trouvé'}), 404
+            
+            return scan_export_response(current_user_id, qr_id, f"scans-{qr_id}")
+            
+        except Exception as e:
+            logger.error(f"Erreur export scan logs: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    @app.route('/scan-logs/export', methods=['GET'])
+    @jwt_required()
+    @limiter.limit("5 per minute")
+    def export_account_scan_logs():
+        """Exporter les logs de scan de tous les QR codes du compte"""
+        try:
+            current_user_id = int(get_jwt_identity())
+            return scan_export_response(current_user_id, None, f"scans-{datetime.utcnow():%Y%m%d}")
+            
+        except Exception as e:
+            logger.error(f"Erreur export scan logs: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    @app.route('/qr-codes/<qr_id>/stats', methods=['GET'])
+    @jwt_required()
+    @limiter.limit("60 per minute")
+    def get_qr_stats(qr_id):
+        """Statistiques de scans d'un QR code, lues dans les agrégats"""
+        try:
+            current_user_id = int(get_jwt_identity())
+            
+            # Vérifier que le QR code appartient à l'utilisateur
+            qr_code = QRCode.query.filter_by(id=qr_id, user_id=current_user_id).first()
+            if not qr_code:
+                return jsonify({'error': 'QR code non trouvé'}), 404
+            
+            granularity = request.args.get('granularity', 'day')
+            group_by = request.args.get('group_by') or 'total'
+            days = request.args.get('days', 90, type=int)
+            if granularity not in GRANULARITIES:
+                return jsonify({'error': f"granularity doit être parmi {', '.join(GRANULARITIES)}"}), 400
+            if group_by not in DIMENSIONS:
+                return jsonify({'error': f"group_by doit être parmi {', '.join(DIMENSIONS[1:])}"}), 400
+            if not days or days < 1 or days > 366:
+                return jsonify({'error': 'days doit être compris entre 1 et 366'}), 400
+            
+            now = datetime.utcnow()
+            start = bucket_start(now - timedelta(days=days - 1), 'day')
+            rows = query_rollups([qr_id], granularity, group_by, start)
+            
+            # Séries complètes (périodes sans scan à 0)
+            buckets = {b: {} for b in bucket_range(start, now, granularity)}
+            total = 0
+            for row in rows:
+                counts = buckets.setdefault(row.bucket_start, {})
+                counts[row.value or 'unknown'] = counts.get(row.value or 'unknown', 0) + row.count
+                total += row.count
+            
+            if group_by == 'total':
+                series = [{'bucket': b.isoformat(), 'count': sum(c.values())} for b, c in sorted(buckets.items())]
+            else:
+                series = [{'bucket': b.isoformat(), 'counts': c} for b, c in sorted(buckets.items())]
+            
+            # Scanners distincts : union des sketches journaliers de la plage
+            sketches = query_sketches([qr_id], start)
+            if granularity == 'day':
+                for point in series:
+                    sketch = sketches.get(datetime.fromisoformat(point['bucket']))
+                    point['unique'] = sketch.count() if sketch else 0
+            
+            return jsonify({
+                'qr_code_id': qr_id,
+                'granularity': granularity,
+                'group_by': None if group_by == 'total' else group_by,
+                'from': start.isoformat(),
+                'to': now.isoformat(),
+                'total': total,
+                'unique_scanners': union_count(sketches.values()),
+                'series': series
+            }), 200
+            
+        except Exception as e:
+            logger.error(f"Erreur statistiques QR: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    @app.route('/qr-codes/<qr_id>/history', methods=['GET'])
+    @jwt_required()
+    @limiter.limit("60 per minute")
+    def get_qr_history(qr_id):
+        """Scans d'un QR code sur tout son historique, agrégés depuis le
+        stockage en colonnes (sans lecture des logs ni des agrégats SQL)"""
+        try:
+            if segment_store is None:
+                return jsonify({'error': 'Historique en colonnes non configuré (SCAN_SEGMENTS_DIR)'}), 503
+            if not segment_store.can_aggregate:
+                return jsonify({'error': 'Historique en colonnes indisponible (NumPy non installé)'}), 503
+            current_user_id = int(get_jwt_identity())
+            
+            # Vérifier que le QR code appartient à l'utilisateur
+            owned = db.session.execute(
+                db.select(QRCode.id).where(QRCode.id == qr_id, QRCode.user_id == current_user_id)
+            ).first()
+            if not owned:
+                return jsonify({'error': 'QR code non trouvé'}), 404
+            
+            bucket = request.args.get('bucket', 'month')
+            group_by = request.args.get('group_by') or 'total'
+            if bucket not in SEGMENT_BUCKETS:
+                return jsonify({'error': f"bucket doit être parmi {', '.join(SEGMENT_BUCKETS)}"}), 400
+            if group_by not in SEGMENT_GROUPS:
+                return jsonify({'error': f"group_by doit être parmi {', '.join(SEGMENT_GROUPS[1:])}"}), 400
+            
+            periods = segment_store.aggregate(qr_id, bucket, group_by)
+            if group_by == 'total':
+                series = [{'bucket': b.isoformat(), 'count': c['total']} for b, c in periods.items()]
+            else:
+                series = [{'bucket': b.isoformat(), 'counts': c} for b, c in periods.items()]
+            
+            return jsonify({
+                'qr_code_id': qr_id,
+                'bucket': bucket,
+                'group_by': None if group_by == 'total' else group_by,
+                'total': sum(sum(c.values()) for c in periods.values()),
+                'series': series
+            }), 200
+            
+        except Exception as e:
+            logger.error(f"Erreur historique QR: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    @app.route('/qr-codes/<qr_id>/image', methods=['GET'])
+    @jwt_required()
+    @limiter.limit("300 per minute")
+    def get_qr_image(qr_id):
+        """Image du QR code (PNG ou SVG) avec ses couleurs et sa taille
+        
+        Paramètres : format (png par défaut, svg) et ec, niveau de correction
+        d'erreur (L, M par défaut, Q, H). L'ETag est l'empreinte des paramètres
+        de rendu : If-None-Match reçoit 304 sans rendu ni lecture du cache.
+        """
+        try:
+            current_user_id = int(get_jwt_identity())
+            fmt = request.args.get('format', 'png').lower()
+            ec = request.args.get('ec', 'M').upper()
+            if fmt not in IMAGE_FORMATS:
+                return jsonify({'error': f"format doit être parmi {', '.join(IMAGE_FORMATS)}"}), 400
+            if ec not in EC_LEVELS:
+                return jsonify({'error': f"ec doit être parmi {', '.join(EC_LEVELS)}"}), 400
+            
+            qr_code = db.session.execute(
+                db.select(QRCode.data, QRCode.color, QRCode.background_color, QRCode.size)
+                .where(QRCode.id == qr_id, QRCode.user_id == current_user_id)
+            ).first()
+            if not qr_code:
+                return jsonify({'error': 'QR code non trouvé'}), 404
+            
+            color = parse_color(qr_code.color, '#000000')
+            background = parse_color(qr_code.background_color, '#ffffff')
+            # Lignes antérieures à la validation : taille bornée au rendu
+            size = clamp_size(qr_code.size)
+            etag = image_key(qr_code.data, color, background, size, fmt, ec)
+            max_age = app.config.get('IMAGE_CACHE_MAX_AGE', 0)
+            cache_control = f'private, max-age={max_age}' if max_age else 'private, no-cache'
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = cache_control
+                return response
+            
+            # Mémoire, puis disque, puis rendu
+            image = image_cache.get(etag)
+            if image is None:
+                if image_disk_cache is not None:
+                    image = image_disk_cache.get(etag, fmt)
+                if image is None:
+                    try:
+                        image = render_qr_image(qr_code.data, fmt, ec, color=color, background=background, size=size)
+                    except DataTooLongError as e:
+                        return jsonify({'error': str(e)}), 400
+                    if image_disk_cache is not None:
+                        try:
+                            image_disk_cache.put(etag, fmt, image)
+                        except OSError as e:
+                            logger.error(f"Erreur écriture cache disque des images: {e}")
+                image_cache.set(etag, image)
+            
+            response = Response(image, mimetype=IMAGE_MIMETYPES[fmt])
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+            
+        except Exception as e:
+            logger.error(f"Erreur rendu image QR: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
     # Route de redirection pour les liens courts
     @app.route('/go/<short_code>')
     @limiter.limit("100 per minute")
     def redirect_short_link(short_code):
         """Rediriger via un lien court"""
         try:
-            short_link = ShortLink.query.filter_by(short_code=short_code, is_active=True).first()
+            # Code certainement inconnu : rejet sans requête en base (un code
+            # créé par un autre worker depuis la dernière lecture est résolu)
+            if not short_code_filter.might_contain(short_code, resolve_short_link):
+                return not_found_page(short_code)
+            
+            short_link = resolve_short_link(short_code)
             
-            if not short_link:
+            if not short_link or not short_link.is_active:
                 # Afficher une page d'erreur HTML au lieu d'un JSON
-                return f'''
-                <!DOCTYPE html>
-                <html>
-                <head>
-                    <title>Lien non trouvé</title>
-                    <meta charset="utf-8">
-                    <style>
-                        body {{ font-family: Arial, sans-serif; text-align: center; padding: 50px; }}
-                        .error {{ color: #d32f2f; }}
-                        .code {{ background: #f5f5f5; padding: 10px; border-radius: 5px; }}
-                    </style>
-                </head>
-                <body>
-                    <h1 class="error">Lien court introuvable</h1>
-                    <p>Le lien court <code class="code">{short_code}</code> n'existe pas ou a expiré.</p>
-                    <p><a href="https://qrcodes.taohome.ci">Retour à l'accueil</a></p>
-                </body>
-                </html>
-                ''', 404
-            
-            # Incrémenter les compteurs
-            short_link.increment_clicks()
-            
-            # Mettre à jour le QR code associé
-            if short_link.qr_code_id:
-                qr_code = db.session.get(QRCode, short_link.qr_code_id)
-                if qr_code:
-                    qr_code.increment_scan()
-                    
-                    # Logger le scan
-                    scan_log = QRScanLog(
-                        qr_code_id=qr_code.id,
-                        ip_address=request.remote_addr,
-                        user_agent=request.headers.get('User-Agent'),
-                        device_type=get_device_type(request.headers.get('User-Agent', ''))
-                    )
-                    db.session.add(scan_log)
+                return not_found_page(short_code)
             
-            db.session.commit()
+            # QR code expiré ou désactivé : rejet sans compter le scan
+            if short_link.is_expired(datetime.utcnow()):
+                return expired_page, 410
+            
+            # Compteurs et log du scan écrits en arrière-plan par lots
+            record_scan(short_code, short_link, request.remote_addr)
             
             # Rediriger vers l'URL originale
             return redirect(short_link.original_url)
@@ -629,24 +1781,25 @@ def create_app():
         except Exception as e:
             db.session.rollback()
             logger.error(f"Erreur redirection: {e}")
-            return f'''
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Erreur serveur</title>
-                <meta charset="utf-8">
-                <style>
-                    body {{ font-family: Arial, sans-serif; text-align: center; padding: 50px; }}
-                    .error {{ color: #d32f2f; }}
-                </style>
-            </head>
-            <body>
-                <h1 class="error">Erreur serveur</h1>
-                <p>Une erreur est survenue lors du traitement de votre demande.</p>
-                <p><a href="https://qrcodes.taohome.ci">Retour à l'accueil</a></p>
-            </body>
-            </html>
-            ''', 500
+            return server_error_page, 500
+    
+    @app.route('/go/<short_code>/beacon', methods=['GET', 'POST'])
+    @limiter.exempt
+    def scan_beacon(short_code):
+        """Compte un scan redirigé par le serveur frontal (requête miroir)"""
+        if request.remote_addr not in beacon_allowed_ips:
+            return '', 403
+        try:
+            if not short_code_filter.might_contain(short_code, resolve_short_link):
+                return '', 204
+            short_link = resolve_short_link(short_code)
+            if short_link and short_link.is_active and not short_link.is_expired(datetime.utcnow()):
+                client_ip = request.headers.get('X-Forwarded-For', request.remote_addr).split(',')[0].strip()
+                record_scan(short_code, short_link, client_ip)
+            return '', 204
+        except Exception as e:
+            logger.error(f"Erreur balise de scan: {e}")
+            return '', 204
     
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -674,6 +1827,32 @@ def create_app():
             logger.info("Tables créées avec succès")
         except Exception as e:
             logger.error(f"Erreur création tables: {e}")
+        
+        # Mise à jour du schéma : une fois par déploiement (`flask upgrade-db`),
+        # pas dans chaque worker
+        if app.config.get('SCHEMA_AUTO_UPGRADE', False):
+            try:
+                upgrade_schema()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erreur mise à jour du schéma: {e}")
+        else:
+            try:
+                pending = pending_schema_changes()
+                if pending:
+                    logger.warning(f"Schéma en retard sur les modèles ({', '.join(pending)}) : "
+                                   "lancer `flask --app wsgi upgrade-db`")
+            except Exception as e:
+                logger.error(f"Erreur vérification du schéma: {e}")
+        
+        try:
+            short_code_filter.rebuild()
+        except Exception as e:
+            logger.error(f"Erreur construction filtre codes courts: {e}")
+    
+    # Export complet de la table de redirection, puis à chaque expiration
+    if redirect_map is not None:
+        redirect_map.start()
     
     # Fonction pour mettre à jour les liens courts existants
     def update_existing_short_urls():
@@ -700,6 +1879,7 @@ def create_app():
                     logger.info(f"Mis à jour QR {qr_code.id}: {old_short_url} -> {new_short_url}")
             
             db.session.commit()
+            short_link_cache.clear()
             logger.info(f"Mis à jour {len(dynamic_qr_codes)} QR codes dynamiques")
             
         except Exception as e:
@@ -725,6 +1905,144 @@ def create_app():
             logger.error(f"Erreur mise à jour: {e}")
             return jsonify({'error': 'Erreur serveur'}), 500
     
+    @app.route('/admin/export-redirect-map', methods=['POST'])
+    @jwt_required()
+    def export_redirect_map():
+        """Régénère la table de redirection du serveur frontal"""
+        if redirect_map is None:
+            return jsonify({'error': 'REDIRECT_MAP_PATH non configuré'}), 400
+        try:
+            count = redirect_map.export_all()
+            return jsonify({'message': 'Table de redirection exportée', 'links': count, 'path': redirect_map.path}), 200
+        except Exception as e:
+            logger.error(f"Erreur export table de redirection: {e}")
+            return jsonify({'error': 'Erreur serveur'}), 500
+    
+    @app.cli.command('export-redirect-map')
+    @click.option('--path', default=None, help='Fichier de sortie (REDIRECT_MAP_PATH par défaut)')
+    @click.option('--format', 'fmt', default=None, help='nginx ou apache (REDIRECT_MAP_FORMAT par défaut)')
+    def export_redirect_map_command(path, fmt):
+        """Exporte les liens courts actifs pour le serveur web frontal"""
+        path = path or redirect_map_path
+        if not path:
+            raise click.UsageError('Indiquer --path ou REDIRECT_MAP_PATH')
+        try:
+            exporter = RedirectMapExporter(
+                path, fmt or app.config.get('REDIRECT_MAP_FORMAT', 'nginx'),
+                reload_command=app.config.get('REDIRECT_MAP_RELOAD_COMMAND', ''),
+                allow_uncounted=app.config.get('REDIRECT_MAP_ALLOW_UNCOUNTED', False)
+            )
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        click.echo(f"{exporter.export_all()} liens exportés vers {path}")
+    
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Aligne le schéma de la base sur les modèles (une fois par déploiement)"""
+        db.create_all()
+        added = upgrade_schema()
+        pending = pending_schema_changes()
+        if pending:
+            raise click.ClickException(f"Schéma incomplet après mise à jour: {', '.join(pending)}")
+        click.echo(f"Schéma à jour ({len(added)} colonnes ajoutées)")
+    
+    @app.cli.command('backfill-last-scanned-at')
+    def backfill_last_scanned_at_command():
+        """Renseigne la date du dernier scan des QR codes scannés qui n'en ont pas"""
+        click.echo(f"last_scanned_at renseigné pour {backfill_last_scanned_at()} QR codes")
+    
+    @app.cli.command('backfill-scan-rollups')
+    def backfill_scan_rollups_command():
+        """Construit les agrégats de scans à partir des logs existants (une seule fois)"""
+        if QRScanRollup.query.first() is not None:
+            raise click.UsageError('La table qr_scan_rollups contient déjà des agrégats')
+        click.echo(f"{backfill_rollups()} logs de scan agrégés")
+    
+    @app.cli.command('backfill-scan-sketches')
+    def backfill_scan_sketches_command():
+        """Construit les sketches de scanners distincts à partir des logs existants (une seule fois)"""
+        if QRScanSketch.query.first() is not None:
+            raise click.UsageError('La table qr_scan_sketches contient déjà des sketches')
+        click.echo(f"{backfill_sketches()} logs de scan intégrés aux sketches")
+    
+    @app.cli.command('backfill-scan-segments')
+    def backfill_scan_segments_command():
+        """Copie les logs de scan existants dans le stockage en colonnes (une seule fois)"""
+        if segment_store is None:
+            raise click.UsageError('Indiquer SCAN_SEGMENTS_DIR')
+        if segment_store.segments():
+            raise click.UsageError(f"{segment_store.directory} contient déjà des segments")
+        table = QRScanLog.__table__
+        last_id = 0
+        total = 0
+        while True:
+            rows = db.session.execute(
+                db.select(table.c.id, table.c.qr_code_id, table.c.scanned_at, table.c.device_type, table.c.country)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(10000)
+            ).mappings().all()
+            if not rows:
+                break
+            total += segment_store.append(rows)
+            last_id = rows[-1]['id']
+        click.echo(f"{total} logs de scan copiés dans {segment_store.directory}")
+    
+    @app.cli.command('purge-scan-logs')
+    @click.option('--days', type=int, default=None, help='Rétention en jours (SCAN_RETENTION_DAYS par défaut)')
+    @click.option('--batch-size', type=int, default=None, help='Logs par lot (SCAN_PURGE_BATCH_SIZE par défaut)')
+    @click.option('--pause', type=float, default=0.0, help='Pause entre deux lots, en secondes')
+    def purge_scan_logs_command(days, batch_size, pause):
+        """Archive puis supprime les logs de scan plus anciens que la rétention"""
+        days = days if days is not None else app.config.get('SCAN_RETENTION_DAYS', 0)
+        if not days or days < 1:
+            raise click.UsageError('Indiquer --days ou SCAN_RETENTION_DAYS (> 0)')
+        if scan_archive is None:
+            raise click.UsageError('Indiquer SCAN_ARCHIVE_DIR')
+        result = purge_scan_logs(
+            scan_archive,
+            days,
+            batch_size=batch_size or app.config.get('SCAN_PURGE_BATCH_SIZE', 1000),
+            pause=pause
+        )
+        click.echo(f"{result['archived']} logs archivés dans {scan_archive.directory} "
+                   f"(antérieurs au {result['cutoff']}, {result['batches']} lots)")
+    
+    @app.cli.command('build-geoip')
+    @click.argument('csv_path')
+    @click.option('--output', default=None, help='Fichier binaire (GEOIP_DB_PATH par défaut)')
+    def build_geoip_command(csv_path, output):
+        """Construit la base IP -> pays depuis un CSV ip_début,ip_fin,pays"""
+        output = output or app.config.get('GEOIP_DB_PATH', '')
+        if not output:
+            raise click.UsageError('Indiquer --output ou GEOIP_DB_PATH')
+        count_v4, count_v6 = build_database_from_csv(csv_path, output)
+        click.echo(f"{count_v4} plages IPv4 et {count_v6} plages IPv6 écrites dans {output}")
+    
+    @app.route('/admin/cache-stats', methods=['GET'])
+    @jwt_required()
+    def cache_stats():
+        """Statistiques du cache de liens courts (hits/misses)"""
+        return jsonify({
+            'short_link_cache': short_link_cache.stats(),
+            'short_code_filter': short_code_filter.stats(),
+            'user_agents': user_agent_cache_stats(),
+            'dashboard_cache': dashboard_cache.stats(),
+            'analytics_cache': analytics_cache.stats(),
+            'image_cache': image_cache.stats(),
+            'image_disk_cache': image_disk_cache.stats() if image_disk_cache else None,
+            'geoip': geoip_db.stats() if geoip_db else None
+        }), 200
+    
+    @app.route('/admin/ingest-stats', methods=['GET'])
+    @jwt_required()
+    def ingest_stats():
+        """Statistiques de l'ingestion asynchrone des scans"""
+        return jsonify({
+            'scan_ingest': scan_ingestor.stats(),
+            'scan_segments': segment_store.stats() if segment_store else None
+        }), 200
+    
     return app
 
 # Point d'entrée principal
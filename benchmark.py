@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Benchmark des endpoints critiques sur une base SQLite locale pré-remplie
+
+Construit create_app() contre une base temporaire, injecte un jeu de données
+reproductible puis mesure débit, latences p50/p95/p99 et requêtes SQL par
+requête HTTP. Le résultat JSON peut être comparé à celui d'un autre commit :
+
+    python benchmark.py --output bench_before.json
+    python benchmark.py --compare bench_before.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+
+from app_clean import create_app
+from models import db, User, QRCode, QRScanLog, ShortLink
+
+ENDPOINTS = ('redirect', 'list_qr_codes', 'create_qr_code', 'login', 'scan_logs')
+
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'bench-password-123'
+SCAN_USER_AGENT = ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 '
+                   '(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1')
+
+
+class QueryCounter:
+    """Compte les requêtes SQL exécutées par le thread courant"""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self) -> None:
+        self._local.count = 0
+
+    @property
+    def count(self) -> int:
+        return getattr(self._local, 'count', 0)
+
+
+def seed(app, qr_codes: int, scans: int, rng: random.Random) -> dict:
+    """Insère un utilisateur, ses QR codes dynamiques et des logs de scan"""
+    with app.app_context():
+        user = User(email=BENCH_EMAIL)
+        user.set_password(BENCH_PASSWORD)
+        user.email_verified = True
+        db.session.add(user)
+        db.session.commit()
+
+        base_url = app.config['BASE_URL'].rstrip('/')
+        expires_at = datetime.utcnow() + timedelta(days=365)
+        qr_rows, link_rows, short_codes = [], [], []
+        for i in range(qr_codes):
+            short_code = ''.join(rng.choices(string.ascii_letters + string.digits, k=8))
+            qr_id = f"qr_bench_{i:07d}"
+            short_url = f"{base_url}/go/{short_code}"
+            qr_rows.append({
+                'id': qr_id, 'user_id': user.id, 'type': 'url', 'data': short_url,
+                'original_url': f"https://example.com/{i}", 'color': '#000000',
+                'background_color': '#ffffff', 'size': 256, 'is_dynamic': True,
+                'short_code': short_code, 'short_url': short_url, 'status': 'active',
+                'scans': 0, 'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow(),
+                'expires_at': expires_at
+            })
+            link_rows.append({
+                'short_code': short_code, 'original_url': f"https://example.com/{i}",
+                'qr_code_id': qr_id, 'clicks': 0, 'is_active': True,
+                'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow()
+            })
+            short_codes.append(short_code)
+        db.session.execute(QRCode.__table__.insert(), qr_rows)
+        db.session.execute(ShortLink.__table__.insert(), link_rows)
+
+        # Les logs sont concentrés sur le premier QR code (cas « code viral »)
+        hot_qr_id = qr_rows[0]['id']
+        now = datetime.utcnow()
+        devices = ('mobile', 'desktop', 'tablet')
+        for start in range(0, scans, 5000):
+            db.session.execute(QRScanLog.__table__.insert(), [{
+                'qr_code_id': hot_qr_id,
+                'ip_address': f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+                'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile',
+                'device_type': rng.choice(devices),
+                'scanned_at': now - timedelta(seconds=rng.randrange(90 * 86400))
+            } for _ in range(start, min(start + 5000, scans))])
+        db.session.execute(
+            QRCode.__table__.update().where(QRCode.__table__.c.id == hot_qr_id).values(scans=scans)
+        )
+        db.session.commit()
+
+        with app.test_request_context():
+            token = create_access_token(identity=str(user.id))
+
+    return {'user_id': user.id, 'token': token, 'short_codes': short_codes, 'hot_qr_id': hot_qr_id}
+
+
+def build_request(name: str, fixture: dict, rng: random.Random, seq: int):
+    """Retourne (méthode, url, kwargs, statuts attendus) pour un endpoint"""
+    headers = {'Authorization': f"Bearer {fixture['token']}"}
+    if name == 'redirect':
+        # UA de navigateur : sans User-Agent le scan serait écarté comme robot
+        scan_headers = {'User-Agent': SCAN_USER_AGENT}
+        return 'GET', f"/go/{rng.choice(fixture['short_codes'])}", {'headers': scan_headers}, (302,)
+    if name == 'list_qr_codes':
+        return 'GET', '/qr-codes', {'headers': headers}, (200,)
+    if name == 'create_qr_code':
+        payload = {
+            'type': 'url',
+            'data': f"https://example.com/bench/{seq}/{rng.random()}",
+            'isDynamic': True,
+            'expiresAt': (datetime.utcnow() + timedelta(days=30)).isoformat() + 'Z',
+            'validityDuration': '30 days'
+        }
+        return 'POST', '/qr-codes', {'headers': headers, 'json': payload}, (201,)
+    if name == 'login':
+        return 'POST', '/login', {'json': {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}}, (200,)
+    if name == 'scan_logs':
+        return 'GET', f"/qr-codes/{fixture['hot_qr_id']}/scan-logs", {'headers': headers}, (200,)
+    raise ValueError(f"Endpoint inconnu: {name}")
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Percentile par rang le plus proche"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def run_endpoint(app, counter: QueryCounter, name: str, fixture: dict,
+                 requests_count: int, concurrency: int, seed_value: int) -> dict:
+    """Exécute `requests_count` requêtes sur un endpoint avec `concurrency` threads"""
+    local = threading.local()
+    seq_lock = threading.Lock()
+    seq = [0]
+
+    def one_request(_):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+            local.rng = random.Random(seed_value + threading.get_ident())
+        with seq_lock:
+            seq[0] += 1
+            n = seq[0]
+        method, url, kwargs, expected = build_request(name, fixture, local.rng, n)
+        counter.reset()
+        start = time.perf_counter()
+        response = local.client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        return elapsed, counter.count, response.status_code in expected
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+    queries = [r[1] for r in results]
+    return {
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'errors': sum(1 for r in results if not r[2]),
+        'throughput_rps': round(requests_count / wall, 2) if wall else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3)
+        },
+        'queries_per_request': round(sum(queries) / len(queries), 2)
+    }
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Ratios courant/référence du débit et du p95 par endpoint"""
+    diff = {}
+    for name, result in current['endpoints'].items():
+        ref = baseline.get('endpoints', {}).get(name)
+        if not ref:
+            continue
+        diff[name] = {
+            'throughput_ratio': round(result['throughput_rps'] / ref['throughput_rps'], 3) if ref['throughput_rps'] else None,
+            'p95_ratio': round(result['latency_ms']['p95'] / ref['latency_ms']['p95'], 3) if ref['latency_ms']['p95'] else None,
+            'queries_delta': round(result['queries_per_request'] - ref['queries_per_request'], 2)
+        }
+    return diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark des endpoints critiques')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f"Liste séparée par des virgules parmi: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--requests', type=int, default=500, help='Requêtes par endpoint')
+    parser.add_argument('--login-requests', type=int, default=20,
+                        help='Requêtes pour /login (hachage du mot de passe coûteux)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Threads clients simultanés')
+    parser.add_argument('--qr-codes', type=int, default=1000, help='QR codes dynamiques pré-créés')
+    parser.add_argument('--scans', type=int, default=20000, help='Logs de scan pré-créés')
+    parser.add_argument('--seed', type=int, default=42, help='Graine du jeu de données')
+    parser.add_argument('--output', help='Fichier JSON de sortie (stdout par défaut)')
+    parser.add_argument('--compare', help='Résultat JSON de référence à comparer')
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.endpoints.split(',') if n.strip()]
+    for name in names:
+        if name not in ENDPOINTS:
+            parser.error(f"Endpoint inconnu: {name}")
+
+    workdir = tempfile.mkdtemp(prefix='qrcode-bench-')
+    try:
+        # La configuration affiche des messages : les garder hors du JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                'RATELIMIT_ENABLED': False
+            })
+        rng = random.Random(args.seed)
+        fixture = seed(app, args.qr_codes, args.scans, rng)
+
+        with app.app_context():
+            counter = QueryCounter(db.engine)
+            # Le filtre de codes courts doit connaître les liens injectés
+            short_code_filter = app.extensions.get('short_code_filter')
+            if short_code_filter is not None:
+                short_code_filter.rebuild()
+
+        report = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'parameters': {
+                'requests': args.requests,
+                'login_requests': args.login_requests,
+                'concurrency': args.concurrency,
+                'qr_codes': args.qr_codes,
+                'scans': args.scans,
+                'seed': args.seed
+            },
+            'endpoints': {}
+        }
+        for name in names:
+            count = args.login_requests if name == 'login' else args.requests
+            report['endpoints'][name] = run_endpoint(
+                app, counter, name, fixture, count, args.concurrency, args.seed
+            )
+
+        ingestor = app.extensions.get('scan_ingestor')
+        if ingestor is not None:
+            ingestor.stop()
+
+        if args.compare:
+            with open(args.compare) as f:
+                report['comparison'] = compare(report, json.load(f))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Cache mémoire LRU avec expiration (TTL), partagé par les threads d'un worker
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, Iterable, NamedTuple, Optional
+
+
+class CachedShortLink(NamedTuple):
+    """Résolution d'un lien court mise en cache (lien + état du QR code associé)"""
+    original_url: str
+    qr_code_id: Optional[str]
+    is_active: bool
+    qr_status: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+    def is_expired(self, now: datetime) -> bool:
+        """Vérifie si le QR code associé est expiré ou désactivé"""
+        if self.qr_status is not None and self.qr_status != 'active':
+            return True
+        return self.expires_at is not None and self.expires_at <= now
+
+
+# Code court absent de la base, mis en cache comme un lien (même durée de vie) :
+# les scans d'un code supprimé ou inventé ne relisent pas la base à chaque fois
+MISSING_SHORT_LINK = CachedShortLink(original_url='', qr_code_id=None, is_active=False)
+
+
+class LRUCache:
+    """Cache LRU borné dont les entrées expirent après `ttl` secondes"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retourne la valeur en cache ou `default` si absente ou expirée"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Ajoute ou remplace une entrée, en évinçant la moins récente si plein"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Supprime une entrée"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_many(self, keys: Iterable[Hashable]) -> None:
+        """Supprime plusieurs entrées en une seule prise du verrou"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Vide le cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Compteurs du cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -30,6 +30,9 @@ class ProductionConfig:
     
     # Configuration SQLAlchemy
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Mise à jour du schéma dans chaque processus au démarrage (serveur de
+    # développement uniquement) ; sinon `flask --app wsgi upgrade-db` par déploiement
+    SCHEMA_AUTO_UPGRADE = os.getenv('SCHEMA_AUTO_UPGRADE', 'false').lower() == 'true'
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
@@ -46,6 +49,76 @@ class ProductionConfig:
     # Rate Limiting avec Redis si disponible
     RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
     
+    # Cache de résolution des liens courts (/go/<short_code>)
+    SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+    SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 60))
+    
+    # Filtre de Bloom des codes courts existants
+    SHORT_CODE_FILTER_CAPACITY = int(os.getenv('SHORT_CODE_FILTER_CAPACITY', 100000))
+    SHORT_CODE_FILTER_ERROR_RATE = float(os.getenv('SHORT_CODE_FILTER_ERROR_RATE', 0.001))
+    SHORT_CODE_FILTER_REFRESH_INTERVAL = float(os.getenv('SHORT_CODE_FILTER_REFRESH_INTERVAL', 2.0))
+    
+    # Allocation des codes courts (blocs de séquence réservés par worker)
+    SHORT_CODE_BLOCK_SIZE = int(os.getenv('SHORT_CODE_BLOCK_SIZE', 1000))
+    SHORT_CODE_MIN_LENGTH = int(os.getenv('SHORT_CODE_MIN_LENGTH', 7))
+    SHORT_CODE_MAX_LENGTH = int(os.getenv('SHORT_CODE_MAX_LENGTH', 10))
+    
+    # Création en lot (POST /qr-codes/batch) : nombre maximal d'éléments par requête
+    QR_BATCH_MAX_SIZE = int(os.getenv('QR_BATCH_MAX_SIZE', 5000))
+    
+    # Ingestion asynchrone des scans (politiques : drop, block, inline)
+    SCAN_INGEST_QUEUE_SIZE = int(os.getenv('SCAN_INGEST_QUEUE_SIZE', 10000))
+    SCAN_INGEST_FLUSH_SIZE = int(os.getenv('SCAN_INGEST_FLUSH_SIZE', 500))
+    SCAN_INGEST_FLUSH_INTERVAL = float(os.getenv('SCAN_INGEST_FLUSH_INTERVAL', 1.0))
+    SCAN_INGEST_BACKPRESSURE = os.getenv('SCAN_INGEST_BACKPRESSURE', 'drop')
+    SCAN_COUNTER_FLUSH_INTERVAL = float(os.getenv('SCAN_COUNTER_FLUSH_INTERVAL', 5.0))
+    
+    # Cache du tableau de bord par utilisateur (invalidé à l'écriture des compteurs)
+    DASHBOARD_CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', 1000))
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 60))
+    
+    # Cache des requêtes /analytics (clé = ETag : dernier scan ingéré + paramètres)
+    ANALYTICS_CACHE_SIZE = int(os.getenv('ANALYTICS_CACHE_SIZE', 2000))
+    ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', 300))
+    
+    # Table de redirection pour le serveur frontal (vide = désactivée ; formats : nginx, apache)
+    REDIRECT_MAP_PATH = os.getenv('REDIRECT_MAP_PATH', '')
+    REDIRECT_MAP_FORMAT = os.getenv('REDIRECT_MAP_FORMAT', 'nginx')
+    # Apache ne peut pas envoyer de balise de scan : ses redirections ne sont pas comptées
+    REDIRECT_MAP_ALLOW_UNCOUNTED = os.getenv('REDIRECT_MAP_ALLOW_UNCOUNTED', 'false').lower() == 'true'
+    # Nginx ne relit la table qu'au rechargement : commande lancée après chaque
+    # écriture (ex. « sudo nginx -s reload »). Apache relit une table txt modifiée.
+    REDIRECT_MAP_RELOAD_COMMAND = os.getenv('REDIRECT_MAP_RELOAD_COMMAND', '')
+    # Modifications regroupées : une réécriture complète de la table par intervalle
+    REDIRECT_MAP_FLUSH_INTERVAL = float(os.getenv('REDIRECT_MAP_FLUSH_INTERVAL', 1.0))
+    # Export complet au plus tard après cet intervalle (et à chaque expiration de lien)
+    REDIRECT_MAP_EXPORT_INTERVAL = float(os.getenv('REDIRECT_MAP_EXPORT_INTERVAL', 300.0))
+    REDIRECT_BEACON_ALLOWED_IPS = os.getenv('REDIRECT_BEACON_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    
+    # Base IP -> pays hors ligne (vide = pays non renseigné ; voir `flask build-geoip`)
+    GEOIP_DB_PATH = os.getenv('GEOIP_DB_PATH', '')
+    GEOIP_CACHE_SIZE = int(os.getenv('GEOIP_CACHE_SIZE', 10000))
+    
+    # Rétention des logs de scan (0 = conservés indéfiniment ; voir `flask purge-scan-logs`)
+    SCAN_RETENTION_DAYS = int(os.getenv('SCAN_RETENTION_DAYS', 0))
+    # Archives hors de l'arborescence du code (vide = purge et relecture désactivées)
+    SCAN_ARCHIVE_DIR = os.getenv('SCAN_ARCHIVE_DIR', '')
+    SCAN_PURGE_BATCH_SIZE = int(os.getenv('SCAN_PURGE_BATCH_SIZE', 1000))
+    
+    # Stockage local en colonnes des scans (vide = désactivé ; agrégation NumPy si installé)
+    SCAN_SEGMENTS_DIR = os.getenv('SCAN_SEGMENTS_DIR', '')
+    SCAN_SEGMENT_ROWS = int(os.getenv('SCAN_SEGMENT_ROWS', 1000000))
+    
+    # Cache des images de QR codes rendues : mémoire par worker, puis disque
+    # partagé adressé par contenu (IMAGE_CACHE_DIR vide ou IMAGE_CACHE_MAX_BYTES = 0
+    # désactive le disque)
+    IMAGE_CACHE_SIZE = int(os.getenv('IMAGE_CACHE_SIZE', 500))
+    IMAGE_CACHE_TTL = int(os.getenv('IMAGE_CACHE_TTL', 3600))
+    IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', '')
+    IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    # Durée de cache navigateur (0 = revalidation systématique par ETag)
+    IMAGE_CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', 0))
+    
     # Configuration Email
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -0,0 +1,51 @@
+"""
+Fixtures communes : application sur une base SQLite temporaire et
+utilisateurs authentifiés
+"""
+import pytest
+
+from app_clean import create_app
+from models import db, User
+
+
+@pytest.fixture
+def app_config():
+    """Configuration propre à un module de tests (fixture à redéfinir)"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'RATELIMIT_ENABLED': False,
+        'TESTING': True,
+        **app_config
+    })
+    yield app
+    app.extensions['scan_ingestor'].stop()
+    if app.extensions['redirect_map'] is not None:
+        app.extensions['redirect_map'].stop()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(app, client):
+    """Crée un utilisateur et renvoie les en-têtes d'authentification"""
+    def login(email='test.user@gmail.com', password='password123'):
+        with app.app_context():
+            user = User(email=email)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+        response = client.post('/login', json={'email': email, 'password': password})
+        assert response.status_code == 200, response.json
+        return {'Authorization': f"Bearer {response.json['access_token']}"}
+    return login
@@ -0,0 +1,170 @@
+"""
+Résolution IP → pays hors ligne, à partir d'un fichier binaire de plages.
+
+Le fichier est projeté en mémoire (mmap) et jamais chargé : pour chaque
+famille (IPv4 puis IPv6) il contient les débuts de plage triés, les fins de
+plage, puis les codes pays sur 2 octets. Une recherche est un bisect sur les
+débuts, soit une vingtaine de lectures, précédé d'un cache LRU par adresse.
+
+Format (entiers non signés big-endian) :
+    en-tête   : b'QRGEOIP1', nombre de plages IPv4 (u32), nombre de plages IPv6 (u32)
+    IPv4      : débuts (n × 4 octets), fins (n × 4 octets), pays (n × 2 octets)
+    IPv6      : débuts (n × 16 octets), fins (n × 16 octets), pays (n × 2 octets)
+
+Le fichier se construit depuis un CSV « ip_début,ip_fin,pays » (format des
+bases « IP to Country » usuelles) avec `flask build-geoip`.
+"""
+
+import bisect
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'QRGEOIP1'
+HEADER = struct.Struct('>8sII')
+
+
+class _IntArray:
+    """Vue séquence d'entiers de largeur fixe sur un buffer (utilisable par bisect)"""
+
+    def __init__(self, buffer, offset: int, count: int, width: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+        self._width = width
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> int:
+        start = self._offset + index * self._width
+        return int.from_bytes(self._buffer[start:start + self._width], 'big')
+
+
+class _RangeTable:
+    """Plages d'une famille d'adresses dans le fichier"""
+
+    def __init__(self, buffer, offset: int, count: int, width: int):
+        self.starts = _IntArray(buffer, offset, count, width)
+        self.ends = _IntArray(buffer, offset + count * width, count, width)
+        self._buffer = buffer
+        self._countries = offset + 2 * count * width
+        self.size = count * (2 * width + 2)
+
+    def find(self, value: int) -> Optional[str]:
+        index = bisect.bisect_right(self.starts, value) - 1
+        if index < 0 or value > self.ends[index]:
+            return None
+        start = self._countries + 2 * index
+        return self._buffer[start:start + 2].decode('ascii')
+
+
+class GeoIPDatabase:
+    """Base IP → code pays ISO 3166-1 alpha-2, en lecture seule"""
+
+    def __init__(self, path: str, cache_size: int = 10000):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count_v4, count_v6 = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Fichier GeoIP invalide: {path}")
+        self._v4 = _RangeTable(self._mmap, HEADER.size, count_v4, 4)
+        self._v6 = _RangeTable(self._mmap, HEADER.size + self._v4.size, count_v6, 16)
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, ip_address: Optional[str]) -> Optional[str]:
+        """Code pays de l'adresse, None si inconnue ou invalide"""
+        if not ip_address:
+            return None
+        try:
+            address = ipaddress.ip_address(ip_address.strip())
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        table = self._v4 if address.version == 4 else self._v6
+        return table.find(int(address))
+
+    def stats(self) -> dict:
+        """Taille de la base et efficacité du cache"""
+        info = self.lookup.cache_info()
+        return {
+            'path': self.path,
+            'ipv4_ranges': len(self._v4.starts),
+            'ipv6_ranges': len(self._v6.starts),
+            'cache_size': info.currsize,
+            'cache_hits': info.hits,
+            'cache_misses': info.misses
+        }
+
+    def close(self) -> None:
+        self.lookup.cache_clear()
+        self._mmap.close()
+
+
+def _parse_ranges(rows: Iterable[Tuple[str, str, str]]):
+    """Trie et valide les plages par famille"""
+    ranges = {4: [], 6: []}
+    for start, end, country in rows:
+        start_ip = ipaddress.ip_address(start.strip())
+        end_ip = ipaddress.ip_address(end.strip())
+        country = country.strip().upper()
+        if start_ip.version != end_ip.version or int(end_ip) < int(start_ip):
+            raise ValueError(f"Plage invalide: {start} - {end}")
+        if len(country) != 2 or country == '--':
+            continue
+        ranges[start_ip.version].append((int(start_ip), int(end_ip), country))
+    for version, items in ranges.items():
+        items.sort()
+        for previous, current in zip(items, items[1:]):
+            if current[0] <= previous[1]:
+                raise ValueError(f"Plages IPv{version} qui se chevauchent: {previous} / {current}")
+    return ranges[4], ranges[6]
+
+
+def build_database(rows: Iterable[Tuple[str, str, str]], path: str) -> Tuple[int, int]:
+    """Écrit le fichier binaire (remplacement atomique), retourne le nombre de
+    plages IPv4 et IPv6"""
+    ranges_v4, ranges_v6 = _parse_ranges(rows)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.geoip-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(ranges_v4), len(ranges_v6)))
+            for ranges, width in ((ranges_v4, 4), (ranges_v6, 16)):
+                f.write(b''.join(start.to_bytes(width, 'big') for start, _, _ in ranges))
+                f.write(b''.join(end.to_bytes(width, 'big') for _, end, _ in ranges))
+                f.write(b''.join(country.encode('ascii') for _, _, country in ranges))
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return len(ranges_v4), len(ranges_v6)
+
+
+def build_database_from_csv(csv_path: str, path: str) -> Tuple[int, int]:
+    """Construit le fichier depuis un CSV ip_début,ip_fin,pays (sans en-tête)"""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = (row[:3] for row in csv.reader(f) if len(row) >= 3 and not row[0].startswith('#'))
+        return build_database(rows, path)
+
+
+def open_database(path: str, cache_size: int = 10000) -> Optional[GeoIPDatabase]:
+    """Ouvre la base si le chemin est configuré, None sinon (pays non renseigné)"""
+    if not path:
+        return None
+    try:
+        return GeoIPDatabase(path, cache_size=cache_size)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Base GeoIP indisponible ({path}): {e}")
+        return None
@@ -0,0 +1,147 @@
+"""
+Cache disque des images de QR codes rendues, adressé par contenu.
+
+La clé est l'empreinte SHA-256 de tout ce qui détermine l'image (contenu,
+couleurs, taille, format, niveau de correction et version du rendu) ; elle
+sert aussi d'ETag. Modifier un QR code change donc sa clé : rien n'est
+jamais invalidé, les images devenues inutiles sortent par éviction.
+
+Les fichiers (`ab/abcdef….png`) sont partagés par les workers : écriture
+dans un fichier temporaire puis renommage atomique. Une lecture rafraîchit
+la date de modification, l'éviction supprime les plus anciennes jusqu'à
+repasser sous 90 % de la taille maximale.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter si le rendu change : les anciennes images ne sont plus servies
+RENDER_VERSION = 1
+
+
+def image_key(data: str, color: str, background: str, size: int, fmt: str, ec: str) -> str:
+    """Empreinte des paramètres de rendu (clé de cache et ETag)"""
+    payload = json.dumps([RENDER_VERSION, data, color, background, size, fmt, ec], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ImageDiskCache:
+    """Images rendues sur disque, taille totale bornée"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # calculée à la première écriture
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def get(self, key: str, fmt: str) -> Optional[bytes]:
+        path = self._path(key, fmt)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # évincée entre-temps par un autre worker
+        self.hits += 1
+        return data
+
+    def put(self, key: str, fmt: str, data: bytes) -> None:
+        path = self._path(key, fmt)
+        if os.path.exists(path):
+            return
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self.writes += 1
+            if self._size is None:
+                self._size = self._scan()[0]
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """(taille totale, [(date de modification, taille, chemin)])"""
+        total = 0
+        entries = []
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                total += stat.st_size
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return total, entries
+
+    def _evict(self) -> None:
+        # Relecture du répertoire : les autres workers écrivent aussi
+        total, entries = self._scan()
+        target = int(self.max_bytes * 0.9)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def stats(self) -> dict:
+        return {
+            'directory': self.directory,
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'evictions': self.evictions
+        }
+
+
+def open_disk_cache(directory: str, max_bytes: int) -> Optional[ImageDiskCache]:
+    """Ouvre le cache disque s'il est configuré, None sinon"""
+    if not directory or max_bytes <= 0:
+        return None
+    try:
+        return ImageDiskCache(directory, max_bytes)
+    except OSError as e:
+        logger.warning(f"Cache disque des images indisponible ({directory}): {e}")
+        return None
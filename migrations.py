@@ -0,0 +1,138 @@
+"""
+Mises à jour additives du schéma (`flask --app wsgi upgrade-db`).
+
+db.create_all() crée les tables manquantes mais ne modifie pas les tables
+existantes : ce module ajoute les colonnes et index déclarés dans les modèles
+qui manquent en base, puis exécute les backfills (idempotents, par lots).
+Un backfill coûteux ne tourne qu'à la mise à jour qui ajoute sa colonne ; il
+reste disponible en commande CLI pour être relancé à la main.
+
+La mise à jour est lancée une fois par déploiement (étape de pré-déploiement),
+pas par chaque worker au démarrage : plusieurs workers exécuteraient en même
+temps les ALTER TABLE et les backfills. Au démarrage, l'application signale
+seulement un schéma en retard (SCHEMA_AUTO_UPGRADE la réactive pour un
+serveur de développement à processus unique).
+"""
+
+import logging
+from typing import List, Set
+
+from sqlalchemy import inspect, text
+
+from models import db, QRCode, QRScanLog
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _missing_columns(inspector):
+    """(table, colonne) déclarées dans les modèles et absentes en base"""
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                yield table, column
+
+
+def _missing_indexes(inspector):
+    """Index déclarés dans les modèles et absents en base"""
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {idx['name'] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                yield index
+
+
+def pending_schema_changes() -> List[str]:
+    """Colonnes (« table.colonne ») et index que `upgrade_schema` ajouterait,
+    sans rien modifier"""
+    inspector = inspect(db.engine)
+    changes = [f"{table.name}.{column.name}" for table, column in _missing_columns(inspector)]
+    return changes + [index.name for index in _missing_indexes(inspector)]
+
+
+def add_missing_columns() -> Set[str]:
+    """ALTER TABLE ... ADD COLUMN pour chaque colonne de modèle absente en base
+    
+    Retourne les colonnes ajoutées (« table.colonne »).
+    """
+    added = set()
+    for table, column in list(_missing_columns(inspect(db.engine))):
+        col_type = column.type.compile(dialect=db.engine.dialect)
+        with db.engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+        logger.info(f"Colonne ajoutée: {table.name}.{column.name}")
+        added.add(f"{table.name}.{column.name}")
+    return added
+
+
+def create_missing_indexes() -> None:
+    """Crée les index déclarés dans les modèles et absents en base"""
+    for index in list(_missing_indexes(inspect(db.engine))):
+        index.create(bind=db.engine)
+        logger.info(f"Index créé: {index.name}")
+
+
+def backfill_data_digest() -> int:
+    """Calcule QRCode.data_digest pour les lignes antérieures à la colonne"""
+    table = QRCode.__table__
+    total = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.data)
+            .where(table.c.data_digest.is_(None))
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('b_id')).values(data_digest=db.bindparam('b_digest')),
+            [{'b_id': row.id, 'b_digest': QRCode.compute_digest(row.data)} for row in rows]
+        )
+        db.session.commit()
+        total += len(rows)
+    if total:
+        logger.info(f"data_digest calculé pour {total} QR codes")
+    return total
+
+
+def backfill_last_scanned_at() -> int:
+    """Renseigne QRCode.last_scanned_at depuis les logs pour les QR codes déjà
+    scannés (une seule requête, sous-requête servie par l'index des logs)
+    
+    Les QR codes dont les logs ont été purgés restent à NULL : ne pas
+    l'exécuter à chaque démarrage (voir `flask backfill-last-scanned-at`).
+    """
+    table = QRCode.__table__
+    logs = QRScanLog.__table__
+    last_scan = (
+        db.select(db.func.max(logs.c.scanned_at))
+        .where(logs.c.qr_code_id == table.c.id)
+        .scalar_subquery()
+    )
+    updated = db.session.execute(
+        table.update()
+        .where(table.c.last_scanned_at.is_(None), table.c.scans > 0)
+        .values(last_scanned_at=last_scan, updated_at=table.c.updated_at)
+    ).rowcount
+    db.session.commit()
+    return updated
+
+
+def upgrade_schema() -> Set[str]:
+    """Aligne une base existante sur les modèles (contexte applicatif requis) ;
+    retourne les colonnes ajoutées"""
+    added = add_missing_columns()
+    create_missing_indexes()
+    backfill_data_digest()
+    if f"{QRCode.__tablename__}.last_scanned_at" in added:
+        updated = backfill_last_scanned_at()
+        logger.info(f"last_scanned_at renseigné pour {updated} QR codes")
+    return added
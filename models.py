@@ -1,6 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+import hashlib
 import secrets
 import string
 from typing import Optional
@@ -154,6 +157,12 @@ class RefreshToken(db.Model):
 class QRCode(db.Model):
     """Modèle QR Code étendu"""
     __tablename__ = 'qr_codes'
+    __table_args__ = (
+        # Déduplication à la création : (user_id, type, empreinte du contenu)
+        db.Index('ix_qr_codes_user_type_digest', 'user_id', 'type', 'data_digest'),
+        # Liste paginée par curseur : WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        db.Index('ix_qr_codes_user_created', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(100), primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -161,6 +170,7 @@ class QRCode(db.Model):
     # Contenu du QR Code
     type = db.Column(db.String(20), nullable=False)  # url, text, email, etc.
     data = db.Column(db.Text, nullable=False)
+    data_digest = db.Column(db.String(64))  # SHA-256 hex de data, tenu à jour par _update_data_digest
     original_url = db.Column(db.Text)  # Pour les QR dynamiques
     
     # Apparence
@@ -176,6 +186,7 @@ class QRCode(db.Model):
     # Statut et validation
     status = db.Column(db.String(20), default='active')  # active, expired, disabled
     scans = db.Column(db.Integer, default=0)
+    last_scanned_at = db.Column(db.DateTime)  # tenu à jour avec scans par add_scans
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -192,9 +203,38 @@ class QRCode(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
     
+    @staticmethod
+    def compute_digest(data: Optional[str]) -> Optional[str]:
+        """Empreinte de largeur fixe du contenu, indexable contrairement à data"""
+        if data is None:
+            return None
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+    
+    @validates('data')
+    def _update_data_digest(self, key, value):
+        self.data_digest = QRCode.compute_digest(value)
+        return value
+    
     def increment_scan(self) -> None:
-        """Incrémente le compteur de scans"""
-        self.scans += 1
+        """Incrémente le compteur de scans (UPDATE scans = scans + 1 côté SQL)"""
+        self.scans = QRCode.scans + 1
+    
+    @classmethod
+    def add_scans(cls, deltas: dict, last_scanned: Optional[dict] = None) -> None:
+        """Ajoute des deltas {qr_id: n} aux compteurs, en un seul executemany ;
+        `last_scanned` {qr_id: datetime} met à jour last_scanned_at"""
+        if not deltas:
+            return
+        last_scanned = last_scanned or {}
+        table = cls.__table__
+        stmt = table.update().where(table.c.id == bindparam('b_id')).values(
+            scans=table.c.scans + bindparam('b_delta'),
+            last_scanned_at=db.func.coalesce(bindparam('b_last', type_=db.DateTime), table.c.last_scanned_at)
+        )
+        db.session.execute(stmt, [
+            {'b_id': qr_id, 'b_delta': delta, 'b_last': last_scanned.get(qr_id)}
+            for qr_id, delta in deltas.items()
+        ])
     
     def is_expired(self) -> bool:
         """Vérifie si le QR code a expiré"""
@@ -220,6 +260,7 @@ class QRCode(db.Model):
             'short_url': self.short_url,
             'status': self.status,
             'scans': self.scans,
+            'last_scanned_at': self.last_scanned_at.isoformat() if self.last_scanned_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'expires_at': self.expires_at.isoformat() if self.expires_at else None,
@@ -230,6 +271,10 @@ class QRCode(db.Model):
 class QRScanLog(db.Model):
     """Log des scans de QR codes"""
     __tablename__ = 'qr_scan_logs'
+    __table_args__ = (
+        # Pagination par curseur : WHERE qr_code_id = ? ORDER BY scanned_at DESC, id DESC
+        db.Index('ix_qr_scan_logs_qr_scanned', 'qr_code_id', 'scanned_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     qr_code_id = db.Column(db.String(100), db.ForeignKey('qr_codes.id'), nullable=False)
@@ -240,6 +285,8 @@ class QRScanLog(db.Model):
     referer = db.Column(db.String(500))
     country = db.Column(db.String(2))
     device_type = db.Column(db.String(20))  # mobile, desktop, tablet
+    os = db.Column(db.String(20))
+    browser = db.Column(db.String(20))
     
     # Timestamp
     scanned_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -263,6 +310,8 @@ class QRScanLog(db.Model):
             'device_type': self.device_type,
             'device_info': {
                 'type': self.device_type,
+                'os': self.os,
+                'browser': self.browser,
                 'user_agent': self.user_agent
             },
             'location': {
@@ -298,8 +347,19 @@ class ShortLink(db.Model):
                 setattr(self, key, value)
     
     def increment_clicks(self) -> None:
-        """Incrémente le compteur de clics"""
-        self.clicks += 1
+        """Incrémente le compteur de clics (UPDATE clicks = clicks + 1 côté SQL)"""
+        self.clicks = ShortLink.clicks + 1
+    
+    @classmethod
+    def add_clicks(cls, deltas: dict) -> None:
+        """Ajoute des deltas {short_code: n} aux compteurs, en un seul executemany"""
+        if not deltas:
+            return
+        table = cls.__table__
+        stmt = table.update().where(table.c.short_code == bindparam('b_short_code')).values(
+            clicks=table.c.clicks + bindparam('b_delta')
+        )
+        db.session.execute(stmt, [{'b_short_code': code, 'b_delta': delta} for code, delta in deltas.items()])
     
     def to_dict(self) -> dict:
         """Convertit le lien court en dictionnaire"""
@@ -312,4 +372,58 @@ class ShortLink(db.Model):
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class IdSequence(db.Model):
+    """Séquences réservées par blocs (allocation des codes courts sans collision)"""
+    __tablename__ = 'id_sequences'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=0)
+    # Clé de permutation tirée à la création, stable pour toute la vie de la séquence
+    salt = db.Column(db.String(64), nullable=False)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class QRScanRollup(db.Model):
+    """Compteurs de scans pré-agrégés par QR code, période et dimension"""
+    __tablename__ = 'qr_scan_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('qr_code_id', 'granularity', 'dimension', 'bucket_start', 'value',
+                            name='uq_qr_scan_rollups_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    qr_code_id = db.Column(db.String(100), db.ForeignKey('qr_codes.id'), nullable=False)
+    
+    granularity = db.Column(db.String(5), nullable=False)  # hour, day
+    dimension = db.Column(db.String(20), nullable=False)  # total, device_type, country
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    value = db.Column(db.String(20), nullable=False, default='')  # '' pour total ou inconnu
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self) -> dict:
+        """Convertit le compteur en dictionnaire"""
+        return {
+            'qr_code_id': self.qr_code_id,
+            'granularity': self.granularity,
+            'dimension': self.dimension,
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'value': self.value,
+            'count': self.count
+        }
+
+
+class QRScanSketch(db.Model):
+    """Sketch HyperLogLog des scanners distincts d'un QR code pour un jour"""
+    __tablename__ = 'qr_scan_sketches'
+    __table_args__ = (
+        db.UniqueConstraint('qr_code_id', 'day', name='uq_qr_scan_sketches_day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    qr_code_id = db.Column(db.String(100), db.ForeignKey('qr_codes.id'), nullable=False)
+    day = db.Column(db.DateTime, nullable=False)
+    sketch = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
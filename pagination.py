@@ -0,0 +1,44 @@
+"""
+Pagination par curseur (keyset) : le curseur opaque encode la clé de tri du
+dernier élément renvoyé, la page suivante repart de cette clé via l'index au
+lieu de sauter OFFSET lignes.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    """Curseur opaque pour (valeur de tri, id)"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, datetime_sort: bool = True) -> Tuple[Any, Any]:
+    """Décode un curseur, ValueError s'il est invalide"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if datetime_sort:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, row_id
+    except Exception:
+        raise ValueError('Curseur invalide')
+
+
+def keyset_before(sort_column, id_column, sort_value, row_id):
+    """Condition « après le curseur » pour un tri (sort DESC, id DESC).
+
+    Écrite sort <= v AND (sort < v OR id < i) plutôt qu'en tuple pour que
+    MySQL garde un parcours d'intervalle sur l'index.
+    """
+    return and_(
+        sort_column <= sort_value,
+        or_(sort_column < sort_value, id_column < row_id)
+    )
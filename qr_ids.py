@@ -0,0 +1,63 @@
+"""
+Identifiants de QR codes ordonnés dans le temps (format ULID, préfixe « qr_»).
+
+48 bits de millisecondes puis 80 bits aléatoires, encodés en base32 de
+Crockford : les identifiants sont triables lexicographiquement, les insertions
+arrivent en fin d'index clustered et l'unicité ne demande aucune requête
+(dans une même milliseconde, la partie aléatoire est incrémentée).
+"""
+
+import os
+import secrets
+import threading
+import time
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+class ULIDGenerator:
+    """Générateur monotone d'identifiants ULID"""
+
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+        self._pid = None
+
+    def new(self) -> str:
+        """Retourne un identifiant strictement supérieur au précédent"""
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if self._pid != os.getpid():
+                # Après un fork, ne pas reprendre la suite aléatoire du parent
+                self._pid = os.getpid()
+                self._last_ms = -1
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = secrets.randbits(RANDOM_BITS)
+            elif self._last_random < RANDOM_MAX:
+                self._last_random += 1
+            else:
+                self._last_ms += 1
+                self._last_random = secrets.randbits(RANDOM_BITS)
+            return self.prefix + _encode(self._last_ms, 10) + _encode(self._last_random, 16)
+
+
+_qr_id_generator = ULIDGenerator(prefix='qr_')
+
+
+def new_qr_id() -> str:
+    """Nouvel identifiant de QR code, ex. qr_01JA2Z6V3K8Q4T1M0C7R9XWB5E"""
+    return _qr_id_generator.new()
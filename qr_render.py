@@ -0,0 +1,499 @@
+"""
+Encodage des QR codes (ISO/IEC 18004) et rendu PNG / SVG côté serveur.
+
+Le contenu est encodé en un seul segment (numérique, alphanumérique ou octets
+UTF-8) dans la plus petite version qui le contient, pour le niveau de
+correction d'erreur demandé (L, M, Q, H).
+
+Tout est fait par lignes entières plutôt que module par module :
+
+- Reed-Solomon : le reste de la division est un entier de n octets, chaque
+  octet de données coûte un décalage et un XOR avec une ligne précalculée ;
+- placement : les bits de données sont répartis dans la matrice par une
+  seule indexation (`itemgetter`) dont la table est calculée une fois par
+  version ;
+- masques et pénalités : chaque ligne est un entier, les masques sont des
+  XOR de lignes et les pénalités des expressions régulières et opérations
+  binaires sur les lignes et colonnes ;
+- PNG : image palette 1 bit, chaque ligne de modules est agrandie par
+  `str.translate` puis répétée, compression zlib.
+"""
+
+import re
+import struct
+import zlib
+from functools import lru_cache
+from itertools import zip_longest
+from operator import itemgetter
+from typing import List, NamedTuple, Optional, Tuple
+
+EC_LEVELS = ('L', 'M', 'Q', 'H')
+IMAGE_FORMATS = ('png', 'svg')
+IMAGE_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Côté de l'image en pixels : bornes acceptées et valeur par défaut
+IMAGE_MIN_SIZE = 100
+IMAGE_MAX_SIZE = 1000
+IMAGE_DEFAULT_SIZE = 256
+
+# Zone de silence imposée par la norme, en modules
+QUIET_ZONE = 4
+
+# Codes de niveau dans les bits de format
+_FORMAT_BITS = {'L': 1, 'M': 0, 'Q': 3, 'H': 2}
+
+# Par niveau puis par version (indice 0 inutilisé)
+_ECC_CODEWORDS_PER_BLOCK = {
+    'L': (0, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28,
+          28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    'M': (0, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+          26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    'Q': (0, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30,
+          28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    'H': (0, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28,
+          30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+}
+_ECC_BLOCKS = {
+    'L': (0, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8,
+          8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    'M': (0, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+          17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    'Q': (0, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20,
+          23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    'H': (0, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25,
+          25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+}
+
+ALPHANUMERIC_CHARSET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+_ALPHANUMERIC_INDEX = {char: i for i, char in enumerate(ALPHANUMERIC_CHARSET)}
+_NUMERIC_RE = re.compile(r'[0-9]*\Z')
+_ALPHANUMERIC_RE = re.compile(r'[0-9A-Z $%*+\-./:]*\Z')
+
+# (indicateur de mode, bits du compteur pour les versions 1-9, 10-26, 27-40)
+_MODES = {
+    'numeric': (0b0001, (10, 12, 14)),
+    'alphanumeric': (0b0010, (9, 11, 13)),
+    'byte': (0b0100, (8, 16, 16)),
+}
+
+# Octet -> ses 8 bits sous forme d'octets 0/1
+_BYTE_BITS = [bytes((value >> shift) & 1 for shift in range(7, -1, -1)) for value in range(256)]
+_TO_ASCII = bytes.maketrans(b'\x00\x01', b'01')
+
+# Pénalités : séries de 5 modules ou plus, et motif 1:1:3:1:1 bordé de 4 clairs
+_RUN_RE = re.compile(r'0{5,}|1{5,}')
+_FINDER_RE = re.compile(r'(?=(?<=0000)1011101|10111010000)')
+_DARK_RUN_RE = re.compile(r'1+')
+
+
+class QRMatrix(NamedTuple):
+    """Matrice de modules : une chaîne de '0'/'1' par ligne ('1' = foncé)"""
+    version: int
+    ec: str
+    mask: int
+    size: int
+    rows: List[str]
+
+
+class DataTooLongError(ValueError):
+    """Le contenu ne tient dans aucune version au niveau de correction demandé"""
+
+
+# Corps de Galois GF(256), polynôme 0x11D
+
+_GF_EXP = [0] * 512
+_GF_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _GF_EXP[_i] = _value
+    _GF_LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _i in range(255, 512):
+    _GF_EXP[_i] = _GF_EXP[_i - 255]
+
+
+def _gf_mul(a: int, b: int) -> int:
+    if not a or not b:
+        return 0
+    return _GF_EXP[_GF_LOG[a] + _GF_LOG[b]]
+
+
+@lru_cache(maxsize=None)
+def _rs_table(degree: int) -> Tuple[int, ...]:
+    """Pour chaque facteur, le polynôme générateur multiplié par ce facteur,
+    sous forme d'entier de `degree` octets (coefficient dominant exclu)"""
+    generator = [1]
+    for i in range(degree):
+        # Multiplication par (x - alpha^i)
+        root = _GF_EXP[i]
+        generator = [
+            coef ^ _gf_mul(prev, root)
+            for coef, prev in zip(generator + [0], [0] + generator)
+        ]
+    coefficients = generator[1:]
+    return tuple(
+        int.from_bytes(bytes(_gf_mul(coef, factor) for coef in coefficients), 'big')
+        for factor in range(256)
+    )
+
+
+def _rs_remainder(data: bytes, degree: int) -> bytes:
+    """Codes correcteurs de Reed-Solomon d'un bloc"""
+    table = _rs_table(degree)
+    shift = 8 * (degree - 1)
+    mask = (1 << (8 * degree)) - 1
+    remainder = 0
+    for byte in data:
+        factor = byte ^ (remainder >> shift)
+        remainder = ((remainder << 8) & mask) ^ table[factor]
+    return remainder.to_bytes(degree, 'big')
+
+
+# Structure des versions
+
+def _raw_data_modules(version: int) -> int:
+    """Modules disponibles pour les données et codes correcteurs"""
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        alignments = version // 7 + 2
+        result -= (25 * alignments - 10) * alignments - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def _data_codewords(version: int, ec: str) -> int:
+    return (_raw_data_modules(version) // 8
+            - _ECC_CODEWORDS_PER_BLOCK[ec][version] * _ECC_BLOCKS[ec][version])
+
+
+def _alignment_positions(version: int) -> List[int]:
+    if version == 1:
+        return []
+    count = version // 7 + 2
+    step = (version * 8 + count * 3 + 5) // (count * 4 - 4) * 2
+    size = version * 4 + 17
+    return [6] + sorted(size - 7 - i * step for i in range(count - 1))
+
+
+def _version_bits(version: int) -> int:
+    remainder = version
+    for _ in range(12):
+        remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+    return version << 12 | remainder
+
+
+def _format_bits(ec: str, mask: int) -> int:
+    data = _FORMAT_BITS[ec] << 3 | mask
+    remainder = data
+    for _ in range(10):
+        remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+    return (data << 10 | remainder) ^ 0x5412
+
+
+def _format_positions(size: int) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """(ligne, colonne) des deux copies des 15 bits de format, bit 0 en premier"""
+    first = [(i, 8) for i in range(6)] + [(7, 8), (8, 8), (8, 7)] + [(8, 14 - i) for i in range(9, 15)]
+    second = [(8, size - 1 - i) for i in range(8)] + [(size - 15 + i, 8) for i in range(8, 15)]
+    return first, second
+
+
+class _Template(NamedTuple):
+    size: int
+    base: bytes                 # modules des motifs fixes, à plat
+    gather: Tuple[int, ...]     # indice source de chaque module (base + bits de données)
+    data_modules: int
+    data_rows: List[int]        # 1 sur les modules de données, par ligne
+
+
+@lru_cache(maxsize=None)
+def _template(version: int) -> _Template:
+    """Motifs fixes d'une version et ordre de placement des données"""
+    size = version * 4 + 17
+    modules = [bytearray(size) for _ in range(size)]
+    reserved = [bytearray(size) for _ in range(size)]
+
+    def put(row: int, col: int, dark: bool) -> None:
+        modules[row][col] = 1 if dark else 0
+        reserved[row][col] = 1
+
+    # Motifs de synchronisation
+    for i in range(size):
+        put(6, i, i % 2 == 0)
+        put(i, 6, i % 2 == 0)
+    # Motifs de repérage et séparateurs
+    for center_row, center_col in ((3, 3), (3, size - 4), (size - 4, 3)):
+        for dr in range(-4, 5):
+            for dc in range(-4, 5):
+                row, col = center_row + dr, center_col + dc
+                if 0 <= row < size and 0 <= col < size:
+                    put(row, col, max(abs(dr), abs(dc)) not in (2, 4))
+    # Motifs d'alignement (sauf sur les trois coins)
+    positions = _alignment_positions(version)
+    last = len(positions) - 1
+    for i, row in enumerate(positions):
+        for j, col in enumerate(positions):
+            if (i, j) in ((0, 0), (0, last), (last, 0)):
+                continue
+            for dr in range(-2, 3):
+                for dc in range(-2, 3):
+                    put(row + dr, col + dc, max(abs(dr), abs(dc)) != 1)
+    # Zones de format (écrites après le choix du masque) et module foncé
+    for row, col in sum(_format_positions(size), []):
+        put(row, col, False)
+    put(size - 8, 8, True)
+    # Informations de version
+    if version >= 7:
+        bits = _version_bits(version)
+        for i in range(18):
+            dark = (bits >> i) & 1
+            a, b = size - 11 + i % 3, i // 3
+            put(b, a, dark)
+            put(a, b, dark)
+
+    # Ordre de placement : colonnes de deux modules, en zigzag de droite à gauche
+    order = []
+    right = size - 1
+    while right >= 1:
+        if right == 6:
+            right = 5
+        upward = ((right + 1) & 2) == 0
+        for vert in range(size):
+            row = size - 1 - vert if upward else vert
+            for col in (right, right - 1):
+                if not reserved[row][col]:
+                    order.append(row * size + col)
+        right -= 2
+
+    base = b''.join(bytes(row) for row in modules)
+    gather = list(range(size * size))
+    for k, position in enumerate(order):
+        gather[position] = size * size + k
+    data_rows = [int(bytes(1 - v for v in row).translate(_TO_ASCII), 2) for row in reserved]
+    return _Template(size, base, tuple(gather), len(order), data_rows)
+
+
+@lru_cache(maxsize=None)
+def _mask_rows(size: int, mask: int) -> List[int]:
+    """Lignes du masque (1 = module inversé)"""
+    conditions = (
+        lambda r, c: (r + c) % 2 == 0,
+        lambda r, c: r % 2 == 0,
+        lambda r, c: c % 3 == 0,
+        lambda r, c: (r + c) % 3 == 0,
+        lambda r, c: (r // 2 + c // 3) % 2 == 0,
+        lambda r, c: r * c % 2 + r * c % 3 == 0,
+        lambda r, c: (r * c % 2 + r * c % 3) % 2 == 0,
+        lambda r, c: ((r + c) % 2 + r * c % 3) % 2 == 0,
+    )
+    condition = conditions[mask]
+    return [
+        int(''.join('1' if condition(r, c) else '0' for c in range(size)), 2)
+        for r in range(size)
+    ]
+
+
+# Encodage des données
+
+def _segment(data: str) -> Tuple[str, int, str]:
+    """(mode, nombre de caractères, bits du contenu)"""
+    if _NUMERIC_RE.match(data):
+        bits = []
+        for i in range(0, len(data), 3):
+            group = data[i:i + 3]
+            bits.append(format(int(group), '0%db' % (len(group) * 3 + 1)))
+        return 'numeric', len(data), ''.join(bits)
+    if _ALPHANUMERIC_RE.match(data):
+        bits = []
+        for i in range(0, len(data) - 1, 2):
+            bits.append(format(_ALPHANUMERIC_INDEX[data[i]] * 45 + _ALPHANUMERIC_INDEX[data[i + 1]], '011b'))
+        if len(data) % 2:
+            bits.append(format(_ALPHANUMERIC_INDEX[data[-1]], '06b'))
+        return 'alphanumeric', len(data), ''.join(bits)
+    payload = data.encode('utf-8')
+    return 'byte', len(payload), format(int.from_bytes(payload, 'big'), '0%db' % (len(payload) * 8))
+
+
+def _count_bits(mode: str, version: int) -> int:
+    widths = _MODES[mode][1]
+    return widths[0] if version <= 9 else widths[1] if version <= 26 else widths[2]
+
+
+def _codewords(data: str, ec: str, min_version: int = 1) -> Tuple[int, bytes]:
+    """Choisit la version et renvoie les codes (données + correction) entrelacés"""
+    mode, count, payload = _segment(data)
+    for version in range(min_version, 41):
+        count_bits = _count_bits(mode, version)
+        capacity = _data_codewords(version, ec) * 8
+        if count < (1 << count_bits) and 4 + count_bits + len(payload) <= capacity:
+            break
+    else:
+        raise DataTooLongError('Contenu trop long pour un QR code')
+
+    bits = format(_MODES[mode][0], '04b') + format(count, '0%db' % count_bits) + payload
+    bits += '0' * min(4, capacity - len(bits))
+    bits += '0' * (-len(bits) % 8)
+    data_bytes = int(bits, 2).to_bytes(len(bits) // 8, 'big')
+    padding = capacity // 8 - len(data_bytes)
+    data_bytes += (b'\xec\x11' * (padding // 2 + 1))[:padding]
+
+    # Blocs : les premiers ont un octet de données de moins
+    blocks = _ECC_BLOCKS[ec][version]
+    ecc_len = _ECC_CODEWORDS_PER_BLOCK[ec][version]
+    raw_codewords = _raw_data_modules(version) // 8
+    short_blocks = blocks - raw_codewords % blocks
+    short_len = raw_codewords // blocks - ecc_len
+    data_blocks = []
+    ecc_blocks = []
+    offset = 0
+    for i in range(blocks):
+        length = short_len + (0 if i < short_blocks else 1)
+        block = data_bytes[offset:offset + length]
+        offset += length
+        data_blocks.append(block)
+        ecc_blocks.append(_rs_remainder(block, ecc_len))
+    interleaved = bytes(byte for column in zip_longest(*data_blocks) for byte in column if byte is not None)
+    interleaved += bytes(byte for column in zip(*ecc_blocks) for byte in column)
+    return version, interleaved
+
+
+def _penalty(rows: List[int], size: int) -> int:
+    lines = [format(row, '0%db' % size) for row in rows]
+    columns = [''.join(column) for column in zip(*lines)]
+    score = 0
+    # Séries de même couleur et motifs de repérage, en lignes puis en colonnes
+    for line in lines + columns:
+        for run in _RUN_RE.finditer(line):
+            score += run.end() - run.start() - 2
+        score += 40 * len(_FINDER_RE.findall('0000' + line + '0000'))
+    # Blocs 2x2 de même couleur
+    pair_mask = (1 << (size - 1)) - 1
+    for upper, lower in zip(rows, rows[1:]):
+        same = ~(upper ^ lower) & ~(upper ^ (upper >> 1)) & ~(lower ^ (lower >> 1)) & pair_mask
+        score += 3 * bin(same).count('1')
+    # Équilibre foncé / clair
+    dark = sum(bin(row).count('1') for row in rows)
+    total = size * size
+    score += 10 * (abs(dark * 100 - total * 50) // (total * 5))
+    return score
+
+
+def encode(data: str, ec: str = 'M', mask: Optional[int] = None, min_version: int = 1) -> QRMatrix:
+    """Encode `data` dans la plus petite version possible (à partir de
+    `min_version`) ; le masque de pénalité minimale est choisi si `mask` est None"""
+    if ec not in EC_LEVELS:
+        raise ValueError('Niveau de correction inconnu')
+    version, codewords = _codewords(data, ec, min_version)
+    template = _template(version)
+    size = template.size
+
+    bits = b''.join(_BYTE_BITS[byte] for byte in codewords)
+    bits += bytes(template.data_modules - len(bits))  # bits de remplissage
+    flat = bytes(itemgetter(*template.gather)(template.base + bits))
+    rows = [int(flat[i:i + size].translate(_TO_ASCII), 2) for i in range(0, size * size, size)]
+
+    first, second = _format_positions(size)
+    best = None
+    for candidate in (range(8) if mask is None else (mask,)):
+        masked = [
+            row ^ (mask_row & data_row)
+            for row, mask_row, data_row in zip(rows, _mask_rows(size, candidate), template.data_rows)
+        ]
+        format_bits = _format_bits(ec, candidate)
+        for i, (row, col) in enumerate(first + second):
+            if (format_bits >> (i % 15)) & 1:
+                masked[row] |= 1 << (size - 1 - col)
+        score = _penalty(masked, size) if mask is None else 0
+        if best is None or score < best[0]:
+            best = (score, candidate, masked)
+
+    _, chosen, masked = best
+    return QRMatrix(version, ec, chosen, size, [format(row, '0%db' % size) for row in masked])
+
+
+# Rendu
+
+_HEX_COLOR_RE = re.compile(r'#?([0-9a-fA-F]{3}|[0-9a-fA-F]{6})\Z')
+
+
+def parse_color(value: Optional[str], default: str) -> str:
+    """Couleur normalisée en #rrggbb (`default` si la valeur est invalide)"""
+    match = _HEX_COLOR_RE.match((value or '').strip())
+    if not match:
+        return default
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = ''.join(char * 2 for char in digits)
+    return '#' + digits.lower()
+
+
+def clamp_size(size) -> int:
+    """Côté en pixels ramené dans [IMAGE_MIN_SIZE, IMAGE_MAX_SIZE]
+    (taille par défaut si la valeur n'est pas un entier)"""
+    if not isinstance(size, int) or isinstance(size, bool):
+        return IMAGE_DEFAULT_SIZE
+    return min(max(size, IMAGE_MIN_SIZE), IMAGE_MAX_SIZE)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def render_png(matrix: QRMatrix, size: int = 256, color: str = '#000000',
+               background: str = '#ffffff', border: int = QUIET_ZONE) -> bytes:
+    """PNG palette 1 bit de `size` pixels de côté (au moins un pixel par
+    module) ; les modules ont tous la même taille, le reste de la division
+    s'ajoute à la marge"""
+    modules = matrix.size + 2 * border
+    scale = max(1, size // modules)
+    width = max(size, modules * scale)
+    margin = (width - matrix.size * scale) // 2
+    row_bits = width + (-width % 8)
+    expand = {ord('0'): '0' * scale, ord('1'): '1' * scale}
+    left = '0' * margin
+    right = '0' * (row_bits - margin - matrix.size * scale)
+
+    blank = bytes(1 + row_bits // 8)  # octet de filtre (0) puis pixels clairs
+    lines = [blank * margin]
+    for row in matrix.rows:
+        pixels = int(left + row.translate(expand) + right, 2).to_bytes(row_bits // 8, 'big')
+        lines.append((b'\x00' + pixels) * scale)
+    lines.append(blank * (width - margin - matrix.size * scale))
+
+    palette = bytes.fromhex(parse_color(background, '#ffffff')[1:] + parse_color(color, '#000000')[1:])
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, width, 1, 3, 0, 0, 0)),
+        _png_chunk(b'PLTE', palette),
+        _png_chunk(b'IDAT', zlib.compress(b''.join(lines), 6)),
+        _png_chunk(b'IEND', b''),
+    ))
+
+
+def render_svg(matrix: QRMatrix, size: int = 256, color: str = '#000000',
+               background: str = '#ffffff', border: int = QUIET_ZONE) -> bytes:
+    """SVG vectoriel : un seul chemin, un rectangle par série de modules foncés"""
+    modules = matrix.size + 2 * border
+    path = ''.join(
+        f'M{run.start() + border} {y + border}h{run.end() - run.start()}v1h-{run.end() - run.start()}z'
+        for y, row in enumerate(matrix.rows)
+        for run in _DARK_RUN_RE.finditer(row)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="{parse_color(background, "#ffffff")}"/>'
+        f'<path fill="{parse_color(color, "#000000")}" d="{path}"/></svg>'
+    ).encode('utf-8')
+
+
+def render(data: str, fmt: str = 'png', ec: str = 'M', color: str = '#000000',
+           background: str = '#ffffff', size: int = 256) -> bytes:
+    """Encode puis rend `data` au format demandé (png ou svg)"""
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError("Format d'image inconnu")
+    matrix = encode(data, ec)
+    renderer = render_png if fmt == 'png' else render_svg
+    return renderer(matrix, size=clamp_size(size), color=color, background=background)
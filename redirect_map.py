@@ -0,0 +1,324 @@
+"""
+Export des liens courts actifs en table de réécriture pour le serveur web
+frontal, qui peut alors répondre aux redirections sans passer par Python.
+
+Apache (RewriteMap n'est pas autorisé dans .htaccess, à placer dans le vhost ;
+pas de miroir natif, les scans servis par la table ne sont pas comptés : ce
+format doit être explicitement accepté avec REDIRECT_MAP_ALLOW_UNCOUNTED) :
+
+    RewriteMap shortlinks "txt:/chemin/vers/redirect_map.txt"
+    RewriteCond ${shortlinks:$1} !=""
+    RewriteRule ^/go/([A-Za-z0-9]+)$ ${shortlinks:$1} [R=302,L]
+
+Nginx (format par défaut) : les codes connus sont redirigés par un
+serveur interne et une copie de la requête est envoyée en miroir à
+/go/<code>/beacon pour compter le scan ; les autres passent par l'application.
+
+    map $uri $short_target { include /chemin/vers/redirect_map.conf; }
+    server {
+        location /go/ {
+            error_page 418 = @app;
+            if ($short_target = "") { return 418; }
+            mirror /_scan_beacon;
+            proxy_pass http://127.0.0.1:8090;
+        }
+        location @app { proxy_pass http://backend; }
+        location = /_scan_beacon {
+            internal;
+            proxy_set_header X-Forwarded-For $remote_addr;
+            proxy_pass http://backend$request_uri/beacon;
+        }
+    }
+    server { listen 127.0.0.1:8090; return 302 $short_target; }
+
+Rechargement : Apache relit une table `txt:` dès que sa date de modification
+change. Nginx ne lit ses `include` qu'au démarrage et au rechargement : sans
+REDIRECT_MAP_RELOAD_COMMAND (par exemple `sudo nginx -s reload`), il continue
+de servir les anciennes destinations et les codes supprimés jusqu'au prochain
+rechargement manuel.
+
+Les modifications (création, changement d'URL, suppression) ne sont pas
+incrémentales : chaque écriture relit et réécrit toute la table (O(N)) sous
+verrou. Elles sont donc mises en attente et appliquées par lot toutes les
+REDIRECT_MAP_FLUSH_INTERVAL secondes, avec une seule réécriture et un seul
+rechargement par lot.
+
+Expiration : chaque export complet planifie le suivant à la prochaine date
+d'expiration des liens exportés (au plus tard après REDIRECT_MAP_EXPORT_INTERVAL
+secondes) ; un lien ajouté qui expire plus tôt avance l'export. Les QR codes
+expirés sortent ainsi de la table à leur échéance et reçoivent le 410 de
+l'application.
+"""
+
+import atexit
+import logging
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+from models import db, QRCode, ShortLink
+
+logger = logging.getLogger(__name__)
+
+FORMAT_APACHE = 'apache'
+FORMAT_NGINX = 'nginx'
+FORMATS = (FORMAT_APACHE, FORMAT_NGINX)
+
+
+def _utc_naive(moment: datetime) -> datetime:
+    """Date UTC sans fuseau (comme les colonnes DateTime)"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+class RedirectMapExporter:
+    """Écrit et maintient la table short_code -> URL de destination
+
+    Avec `app`, les exports complets sont planifiés en arrière-plan (`start`)
+    pour retirer les liens à leur expiration.
+    """
+
+    def __init__(self, path: str, fmt: str = FORMAT_NGINX, reload_command: str = '',
+                 flush_interval: float = 0.0, app=None, export_interval: float = 300.0,
+                 allow_uncounted: bool = False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format de table de redirection inconnu: {fmt}")
+        if fmt == FORMAT_APACHE and not allow_uncounted:
+            raise ValueError("Table Apache : les redirections servies par Apache ne sont pas comptées "
+                             "(utiliser nginx ou REDIRECT_MAP_ALLOW_UNCOUNTED)")
+        self.path = path
+        self.fmt = fmt
+        self.reload_command = reload_command
+        self.flush_interval = flush_interval
+        # short_code -> URL, ou None pour une suppression
+        self._pending: Dict[str, Optional[str]] = {}
+        self._pending_lock = threading.Lock()
+        self._timer = None
+        self.app = app
+        self.export_interval = export_interval
+        self._export_timer = None
+        self._next_export: Optional[datetime] = None
+        self.flushes = 0
+        self.reloads = 0
+        self.exports = 0
+        if flush_interval > 0:
+            atexit.register(self.flush)
+
+    def start(self) -> None:
+        """Lance l'export complet en arrière-plan, puis ses exports planifiés"""
+        if self.app is not None:
+            self.schedule_export(datetime.utcnow())
+
+    def schedule_export(self, when: datetime) -> None:
+        """Avance le prochain export complet à `when` (expiration d'un lien)"""
+        if self.app is None:
+            return
+        when = min(_utc_naive(when), datetime.utcnow() + timedelta(seconds=self.export_interval))
+        with self._pending_lock:
+            if self._next_export is not None and self._next_export <= when:
+                return
+            if self._export_timer is not None:
+                self._export_timer.cancel()
+            self._next_export = when
+            delay = max(0.0, (when - datetime.utcnow()).total_seconds())
+            self._export_timer = threading.Timer(delay, self._export_from_timer)
+            self._export_timer.daemon = True
+            self._export_timer.start()
+
+    def stop(self) -> None:
+        """Annule les exports planifiés et applique les modifications en attente"""
+        with self._pending_lock:
+            if self._export_timer is not None:
+                self._export_timer.cancel()
+            self._export_timer = None
+            self._next_export = None
+        self.flush()
+
+    def _export_from_timer(self) -> None:
+        with self._pending_lock:
+            self._export_timer = None
+            self._next_export = None
+        try:
+            with self.app.app_context():
+                self.export_all()
+        except Exception as e:
+            logger.error(f"Erreur export planifié de la table de redirection: {e}")
+            self.schedule_export(datetime.utcnow() + timedelta(seconds=self.export_interval))
+
+    def export_all(self) -> int:
+        """Régénère la table complète depuis la base (contexte applicatif requis)"""
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            db.select(ShortLink.short_code, ShortLink.original_url, QRCode.expires_at)
+            .join(QRCode, QRCode.id == ShortLink.qr_code_id)
+            .where(
+                ShortLink.is_active.is_(True),
+                QRCode.status == 'active',
+                QRCode.expires_at > now
+            )
+        ).all()
+        entries = {row.short_code: row.original_url for row in rows}
+        with self._locked():
+            self._write(entries)
+        self.exports += 1
+        logger.info(f"Table de redirection exportée: {len(entries)} liens -> {self.path}")
+        self._reload()
+        # Prochain export à la première expiration à venir (borné par l'intervalle)
+        next_export = now + timedelta(seconds=self.export_interval)
+        if rows:
+            next_export = min(_utc_naive(row.expires_at) for row in rows)
+        self.schedule_export(next_export)
+        return len(entries)
+
+    def upsert(self, short_code: str, original_url: str, expires_at: Optional[datetime] = None) -> None:
+        """Ajoute ou met à jour un lien sans relire la base"""
+        self.upsert_many({short_code: original_url}, expires_at)
+
+    def upsert_many(self, links: Dict[str, str], expires_at: Optional[datetime] = None) -> None:
+        """Ajoute ou met à jour des liens (au prochain lot) ; `expires_at`, la
+        première de leurs expirations, planifie l'export qui les retirera"""
+        self._queue(links)
+        if links and expires_at is not None:
+            self.schedule_export(expires_at)
+
+    def remove_many(self, short_codes: Iterable[str]) -> None:
+        """Retire des liens de la table (au prochain lot)"""
+        self._queue({code: None for code in short_codes if code})
+
+    def remove(self, short_code: str) -> None:
+        self.remove_many([short_code])
+
+    def _queue(self, changes: Dict[str, Optional[str]]) -> None:
+        if not changes:
+            return
+        with self._pending_lock:
+            self._pending.update(changes)
+            if self.flush_interval > 0 and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def _flush_from_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Erreur mise à jour table de redirection: {e}")
+
+    def flush(self) -> int:
+        """Applique les modifications en attente : une réécriture, un rechargement"""
+        with self._pending_lock:
+            changes = self._pending
+            self._pending = {}
+            self._timer = None
+        if not changes:
+            return 0
+        try:
+            with self._locked():
+                entries = self._read()
+                for short_code, url in changes.items():
+                    if url is None:
+                        entries.pop(short_code, None)
+                    else:
+                        entries[short_code] = url
+                self._write(entries)
+        except Exception:
+            # Remises en attente, sans écraser des modifications plus récentes
+            with self._pending_lock:
+                for short_code, url in changes.items():
+                    self._pending.setdefault(short_code, url)
+            raise
+        self.flushes += 1
+        self._reload()
+        return len(changes)
+
+    def _reload(self) -> None:
+        """Fait relire la table au serveur frontal (nginx ne la relit pas seul)"""
+        if not self.reload_command:
+            return
+        try:
+            subprocess.run(shlex.split(self.reload_command), check=True, timeout=30,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            self.reloads += 1
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"Erreur rechargement du serveur frontal ({self.reload_command}): {e}")
+
+    def _format_line(self, short_code: str, url: str) -> str:
+        # Les espaces séparent clé et valeur, les guillemets délimitent la valeur nginx
+        url = url.strip().replace(' ', '%20').replace('"', '%22').replace('\n', '').replace('\r', '')
+        if self.fmt == FORMAT_NGINX:
+            return f'/go/{short_code} "{url}";\n'
+        return f"{short_code} {url}\n"
+
+    def _parse_line(self, line: str):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            return None
+        key, _, value = line.partition(' ')
+        if self.fmt == FORMAT_NGINX:
+            key = key[len('/go/'):]
+            value = value.rstrip(';').strip('"')
+        return key, value
+
+    def _read(self) -> Dict[str, str]:
+        entries = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    parsed = self._parse_line(line)
+                    if parsed:
+                        entries[parsed[0]] = parsed[1]
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _write(self, entries: Dict[str, str]) -> None:
+        """Écriture atomique : fichier temporaire puis os.replace"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.redirect_map.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for short_code in sorted(entries):
+                    f.write(self._format_line(short_code, entries[short_code]))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _locked(self):
+        return _FileLock(self.path + '.lock')
+
+
+class _FileLock:
+    """Verrou exclusif entre workers pour les mises à jour lecture-écriture"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        return False
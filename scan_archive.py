@@ -0,0 +1,210 @@
+"""
+Rétention des logs de scan : les logs plus anciens que la durée configurée
+sont déplacés vers des archives NDJSON compressées (un fichier par QR code et
+par mois), puis supprimés de `qr_scan_logs` par petits lots.
+
+Les agrégats (`qr_scan_rollups`) et les compteurs `scans`/`clicks` ne sont
+pas modifiés : les statistiques restent exactes après la purge.
+
+Les archives ne sont écrites qu'en ajout : chaque lot ajoute un membre gzip à
+la fin du fichier (gzip relit les membres concaténés comme un seul flux).
+Un lot est écrit et synchronisé sur disque avant la suppression en base ; si
+la suppression échoue, le passage suivant retrouve ces logs en base mais
+n'ajoute à chaque fichier que les ids supérieurs au dernier qu'il contient
+(les ids sont croissants dans un fichier). La lecture ignore aussi les
+doublons des archives écrites avant cette vérification.
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+from models import db, QRScanLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'qr_code_id', 'scanned_at', 'ip_address', 'user_agent',
+                   'referer', 'country', 'device_type', 'os', 'browser')
+
+ARCHIVE_SUFFIX = '.ndjson.gz'
+
+
+def retention_cutoff(now: datetime, retention_days: int) -> datetime:
+    """Début du mois contenant `now - retention_days` : seuls des mois entiers
+    sont archivés, un fichier mensuel n'est donc jamais complété plus tard par
+    des logs plus anciens que ceux qu'il contient"""
+    limit = now - timedelta(days=retention_days)
+    return limit.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class ScanArchive:
+    """Archives mensuelles des logs de scan, par QR code"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _qr_directory(self, qr_id: str) -> str:
+        # Identifiants fournis par les clients : jamais de « / » ni de « .. »
+        return os.path.join(self.directory, quote(qr_id, safe='').replace('.', '%2E'))
+
+    def archive_path(self, qr_id: str, month: str) -> str:
+        return os.path.join(self._qr_directory(qr_id), month + ARCHIVE_SUFFIX)
+
+    def months(self, qr_id: str) -> List[str]:
+        """Mois archivés (AAAA-MM) d'un QR code, du plus ancien au plus récent"""
+        try:
+            names = os.listdir(self._qr_directory(qr_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(ARCHIVE_SUFFIX)] for name in names if name.endswith(ARCHIVE_SUFFIX))
+
+    def qr_ids(self) -> List[str]:
+        """QR codes ayant des archives"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(unquote(name) for name in names
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def last_id(self, qr_id: str, month: str) -> int:
+        """Plus grand id archivé dans le fichier du mois (0 s'il n'existe pas)"""
+        last_id = 0
+        try:
+            with gzip.open(self.archive_path(qr_id, month), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    last_id = max(last_id, json.loads(line)['id'])
+        except FileNotFoundError:
+            pass
+        return last_id
+
+    def append(self, qr_id: str, month: str, records: List[dict]) -> None:
+        """Ajoute un membre gzip au fichier du mois et le synchronise sur disque"""
+        path = self.archive_path(qr_id, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = ''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for record in records
+        ).encode('utf-8')
+        with open(path, 'ab') as f:
+            f.write(gzip.compress(payload))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_records(self, qr_id: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> Iterator[dict]:
+        """Logs archivés d'un QR code dans [start, end), ordre chronologique par mois"""
+        first_month = start.strftime('%Y-%m') if start else None
+        last_month = end.strftime('%Y-%m') if end else None
+        for month in self.months(qr_id):
+            if (first_month and month < first_month) or (last_month and month > last_month):
+                continue
+            last_id = 0
+            with gzip.open(self.archive_path(qr_id, month), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record['id'] <= last_id:
+                        continue  # lot réarchivé après une suppression échouée
+                    last_id = record['id']
+                    if start or end:
+                        scanned_at = datetime.fromisoformat(record['scanned_at'])
+                        if (start and scanned_at < start) or (end and scanned_at >= end):
+                            continue
+                    yield record
+
+    def remove(self, qr_id: str) -> None:
+        """Supprime les archives d'un QR code (suppression du QR code)"""
+        directory = self._qr_directory(qr_id)
+        for month in self.months(qr_id):
+            os.unlink(self.archive_path(qr_id, month))
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+def open_archive(directory: str) -> Optional[ScanArchive]:
+    """Archives des logs de scan si le répertoire est configuré, None sinon"""
+    return ScanArchive(directory) if directory else None
+
+
+def purge_scan_logs(archive: ScanArchive, retention_days: int, batch_size: int = 1000,
+                    pause: float = 0.0, now: Optional[datetime] = None) -> dict:
+    """Archive puis supprime les logs antérieurs à la rétention (contexte
+    applicatif requis). Chaque lot est une transaction courte ; `pause` laisse
+    respirer la base entre deux lots."""
+    cutoff = retention_cutoff(now or datetime.utcnow(), retention_days)
+    os.makedirs(archive.directory, exist_ok=True)
+    lock_fd = os.open(os.path.join(archive.directory, '.purge.lock'), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError('Une purge des logs de scan est déjà en cours')
+        return _purge_batches(archive, cutoff, batch_size, pause)
+    finally:
+        os.close(lock_fd)
+
+
+def _purge_batches(archive: ScanArchive, cutoff: datetime, batch_size: int, pause: float) -> dict:
+    table = QRScanLog.__table__
+    last_id = 0
+    archived = 0
+    batches = 0
+    # (qr_code_id, mois) -> dernier id archivé, lu une fois par fichier
+    archived_ids = {}
+    while True:
+        # Parcours par id croissant : les logs anciens ont les plus petits ids
+        rows = db.session.execute(
+            db.select(*(table.c[col] for col in ARCHIVE_COLUMNS))
+            .where(table.c.id > last_id, table.c.scanned_at < cutoff)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            db.session.rollback()
+            break
+
+        files = defaultdict(list)
+        for row in rows:
+            record = dict(row)
+            record['scanned_at'] = row['scanned_at'].isoformat()
+            files[(row['qr_code_id'], row['scanned_at'].strftime('%Y-%m'))].append(record)
+        for (qr_id, month), records in files.items():
+            key = (qr_id, month)
+            if key not in archived_ids:
+                archived_ids[key] = archive.last_id(qr_id, month)
+            # Logs déjà archivés par un passage dont la suppression a échoué
+            records = [record for record in records if record['id'] > archived_ids[key]]
+            if records:
+                archive.append(qr_id, month, records)
+                archived_ids[key] = records[-1]['id']
+
+        ids = [row['id'] for row in rows]
+        try:
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        last_id = ids[-1]
+        archived += len(ids)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+
+    if archived:
+        logger.info(f"{archived} logs de scan archivés avant {cutoff:%Y-%m-%d} ({batches} lots)")
+    return {'cutoff': cutoff.isoformat(), 'archived': archived, 'batches': batches}
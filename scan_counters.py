@@ -0,0 +1,112 @@
+"""
+Agrégation en mémoire des compteurs de scans/clics : les deltas sont cumulés
+par short_code et par qr_id puis appliqués périodiquement avec
+`col = col + :delta`, soit un UPDATE par code et par intervalle. La date du
+dernier scan de chaque QR code est écrite dans le même UPDATE.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Optional, Set
+
+from models import db, QRCode, ShortLink
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Deltas de compteurs en attente d'écriture"""
+
+    def __init__(self, app, flush_interval: float = 5.0,
+                 on_flush: Optional[Callable[[Set[str]], None]] = None):
+        self.app = app
+        self.flush_interval = flush_interval
+        # Appelé (contexte applicatif actif) avec les qr_id écrits, après le commit
+        self.on_flush = on_flush
+        self._clicks = Counter()
+        self._scans = Counter()
+        self._last_scanned = {}
+        self._lock = threading.Lock()
+        # Tenu de l'échange des deltas jusqu'au commit (ou à leur remise) :
+        # un flush synchrone attend celui du thread d'écriture en cours
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.flushes = 0
+        self.updates = 0
+
+    def add(self, short_code: Optional[str], qr_code_id: Optional[str], delta: int = 1,
+            scanned_at: Optional[datetime] = None) -> None:
+        """Cumule un scan pour le lien court et le QR code"""
+        with self._lock:
+            if short_code:
+                self._clicks[short_code] += delta
+            if qr_code_id:
+                self._scans[qr_code_id] += delta
+                if scanned_at is not None:
+                    previous = self._last_scanned.get(qr_code_id)
+                    if previous is None or scanned_at > previous:
+                        self._last_scanned[qr_code_id] = scanned_at
+
+    def pending(self) -> int:
+        """Nombre de codes ayant un delta en attente"""
+        with self._lock:
+            return len(self._clicks) + len(self._scans)
+
+    def flush_if_due(self) -> None:
+        """Écrit les deltas si l'intervalle est écoulé"""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """Applique tous les deltas en attente, en une transaction"""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        with self._lock:
+            clicks, self._clicks = self._clicks, Counter()
+            scans, self._scans = self._scans, Counter()
+            last_scanned, self._last_scanned = self._last_scanned, {}
+            self._last_flush = time.monotonic()
+        if not clicks and not scans:
+            return 0
+
+        with self.app.app_context():
+            try:
+                ShortLink.add_clicks(clicks)
+                QRCode.add_scans(scans, last_scanned)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                # Remettre les deltas pour le prochain intervalle
+                with self._lock:
+                    self._clicks.update(clicks)
+                    self._scans.update(scans)
+                    for qr_id, scanned_at in last_scanned.items():
+                        current = self._last_scanned.get(qr_id)
+                        if current is None or scanned_at > current:
+                            self._last_scanned[qr_id] = scanned_at
+                logger.error(f"Erreur écriture compteurs de scans: {e}")
+                return 0
+            
+            if self.on_flush is not None and scans:
+                try:
+                    self.on_flush(set(scans))
+                except Exception as e:
+                    logger.error(f"Erreur après écriture des compteurs: {e}")
+
+        self.flushes += 1
+        self.updates += len(clicks) + len(scans)
+        return len(clicks) + len(scans)
+
+    def stats(self) -> dict:
+        """Compteurs de l'agrégation"""
+        return {
+            'pending': self.pending(),
+            'flushes': self.flushes,
+            'updates': self.updates,
+            'flush_interval': self.flush_interval
+        }
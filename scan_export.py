@@ -0,0 +1,137 @@
+"""
+Export brut des logs de scan en flux (CSV ou NDJSON, gzip optionnel).
+
+Les lignes sont lues par lots avec un curseur côté serveur (`yield_per`) et
+sérialisées directement depuis les tuples, sans passer par des objets ORM :
+la mémoire reste constante quelle que soit la taille de l'export. Les logs
+déjà archivés par la rétention sont relus depuis les archives, avant ceux
+encore en base.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from models import db, QRCode, QRScanLog
+from scan_archive import ScanArchive
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+EXPORT_COLUMNS = ('id', 'qr_code_id', 'scanned_at', 'ip_address', 'user_agent',
+                  'referer', 'country', 'device_type', 'os', 'browser')
+
+EXPORT_BATCH_SIZE = 1000
+
+# Taille visée des morceaux envoyés au client
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_archived_rows(archive: ScanArchive, user_id: int, qr_id: Optional[str] = None,
+                       start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> Iterator[tuple]:
+    """Logs archivés des QR codes de l'utilisateur (ou d'un seul)"""
+    if qr_id is not None:
+        archived_ids = [qr_id] if archive.months(qr_id) else []
+    else:
+        archived_ids = archive.qr_ids()
+        if archived_ids:
+            owned = {row[0] for row in db.session.execute(
+                db.select(QRCode.id).where(QRCode.user_id == user_id)
+            )}
+            archived_ids = [archived_id for archived_id in archived_ids if archived_id in owned]
+    for archived_id in archived_ids:
+        for record in archive.iter_records(archived_id, start, end):
+            yield tuple(record.get(col) for col in EXPORT_COLUMNS)
+
+
+def iter_scan_rows(user_id: int, qr_id: Optional[str] = None,
+                   start: Optional[datetime] = None,
+                   end: Optional[datetime] = None,
+                   archive: Optional[ScanArchive] = None) -> Iterator[tuple]:
+    """Logs de scan des QR codes de l'utilisateur (ou d'un seul) : archives
+    d'abord, puis la base dans l'ordre de l'index (qr_code_id, scanned_at, id)"""
+    if archive is not None:
+        yield from iter_archived_rows(archive, user_id, qr_id, start, end)
+
+    logs = QRScanLog.__table__
+    qr_codes = QRCode.__table__
+    stmt = (
+        db.select(*(logs.c[col] for col in EXPORT_COLUMNS))
+        .join(qr_codes, qr_codes.c.id == logs.c.qr_code_id)
+        .where(qr_codes.c.user_id == user_id)
+        .order_by(logs.c.qr_code_id, logs.c.scanned_at, logs.c.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if qr_id is not None:
+        stmt = stmt.where(logs.c.qr_code_id == qr_id)
+    if start is not None:
+        stmt = stmt.where(logs.c.scanned_at >= start)
+    if end is not None:
+        stmt = stmt.where(logs.c.scanned_at < end)
+
+    result = db.session.execute(stmt)
+    try:
+        for row in result:
+            yield tuple(row)
+    finally:
+        # Libère le curseur si le client interrompt le téléchargement
+        result.close()
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    """Regroupe les lignes en morceaux d'environ CHUNK_SIZE octets"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(value.isoformat() if isinstance(value, datetime) else value
+                        for value in row)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    # En-tête seul si aucun log
+    if out.tell():
+        yield out.getvalue()
+
+
+def _ndjson_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for row in rows:
+        yield dumps({
+            col: value.isoformat() if isinstance(value, datetime) else value
+            for col, value in zip(EXPORT_COLUMNS, row)
+        }) + '\n'
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compression gzip incrémentale des morceaux"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(rows: Iterable[tuple], fmt: str = 'csv', compress: bool = False) -> Iterator[bytes]:
+    """Sérialise les lignes au format demandé, en morceaux d'octets"""
+    lines = _csv_lines(rows) if fmt == 'csv' else _ndjson_lines(rows)
+    chunks = _chunked(lines)
+    return _gzip(chunks) if compress else chunks
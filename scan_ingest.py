@@ -0,0 +1,239 @@
+"""
+Ingestion asynchrone des scans : la redirection dépose un événement dans une
+file bornée, un thread d'écriture les enrichit (pays) et les insère par lots
+(executemany, un commit par lot).
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional, Set
+
+from models import db, QRCode, QRScanLog
+from scan_counters import CounterBuffer
+from scan_rollups import apply_rollups, apply_sketches, rollup_counts, scan_sketches
+
+logger = logging.getLogger(__name__)
+
+# Politiques quand la file est pleine
+BACKPRESSURE_DROP = 'drop'      # l'événement est abandonné (et compté)
+BACKPRESSURE_BLOCK = 'block'    # attente bornée par put_timeout, puis abandon
+BACKPRESSURE_INLINE = 'inline'  # écriture synchrone dans la requête
+BACKPRESSURE_POLICIES = (BACKPRESSURE_DROP, BACKPRESSURE_BLOCK, BACKPRESSURE_INLINE)
+
+
+class ScanEvent(NamedTuple):
+    """Scan capturé par la redirection, en attente d'écriture"""
+    short_code: str
+    qr_code_id: Optional[str]
+    ip_address: Optional[str]
+    user_agent: Optional[str]
+    device_type: Optional[str]
+    os: Optional[str]
+    browser: Optional[str]
+    scanned_at: datetime
+
+
+class ScanIngestor:
+    """File bornée + thread d'écriture par lots pour les scans"""
+
+    def __init__(self, app, queue_size: int = 10000, flush_size: int = 500,
+                 flush_interval: float = 1.0, backpressure: str = BACKPRESSURE_DROP,
+                 put_timeout: float = 0.05, counter_flush_interval: float = 5.0,
+                 country_resolver: Optional[Callable[[Optional[str]], Optional[str]]] = None,
+                 on_counters_flush: Optional[Callable[[Set[str]], None]] = None,
+                 segment_store=None):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Politique de backpressure inconnue: {backpressure}")
+        self.app = app
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.put_timeout = put_timeout
+        # IP -> code pays, appelé dans le thread d'écriture (jamais dans la redirection)
+        self.country_resolver = country_resolver
+        # Copie optionnelle des scans écrits dans le stockage en colonnes
+        self.segment_store = segment_store
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.counters = CounterBuffer(app, flush_interval=counter_flush_interval, on_flush=on_counters_flush)
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.accepted = 0
+        self.dropped = 0
+        self.bots = 0  # scans de robots écartés avant la file
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        atexit.register(self.stop)
+
+    def start(self) -> None:
+        """Démarre le thread d'écriture (une fois par processus, après un fork)"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop_event.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='scan-ingestor', daemon=True)
+            self._thread.start()
+
+    def submit(self, event: ScanEvent) -> bool:
+        """Dépose un scan dans la file, selon la politique de backpressure"""
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            self.start()
+        try:
+            if self.backpressure == BACKPRESSURE_BLOCK:
+                self._queue.put(event, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            if self.backpressure == BACKPRESSURE_INLINE:
+                self._write_batch([event])
+                self.accepted += 1
+                return True
+            self.dropped += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def flush(self) -> int:
+        """Vide la file de manière synchrone, attend le lot en cours du thread
+        puis écrit les compteurs agrégés"""
+        count = 0
+        while True:
+            batch = self._drain_nowait()
+            if not batch:
+                break
+            self._write_queued(batch)
+            count += len(batch)
+        self._queue.join()
+        self.counters.flush()
+        return count
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Arrête le thread puis écrit ce qui reste dans la file"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        """Compteurs de l'ingestion"""
+        return {
+            'queued': self._queue.qsize(),
+            'accepted': self.accepted,
+            'dropped': self.dropped,
+            'bots': self.bots,
+            'written': self.written,
+            'failed': self.failed,
+            'retries': self.retries,
+            'batches': self.batches,
+            'flush_size': self.flush_size,
+            'flush_interval': self.flush_interval,
+            'backpressure': self.backpressure,
+            'counters': self.counters.stats()
+        }
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write_queued(batch)
+            self.counters.flush_if_due()
+
+    def _next_batch(self) -> List[ScanEvent]:
+        """Attend jusqu'à flush_size événements ou flush_interval secondes"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain_nowait(self) -> List[ScanEvent]:
+        batch = []
+        while len(batch) < self.flush_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_queued(self, events: List[ScanEvent]) -> None:
+        try:
+            self._write_batch(events)
+        finally:
+            for _ in events:
+                self._queue.task_done()
+
+    def _insert_batch(self, events: List[ScanEvent]) -> List[dict]:
+        """Logs, agrégats et sketches d'un lot en une transaction ; renvoie
+        les logs écrits (QR codes encore existants)"""
+        qr_ids = {e.qr_code_id for e in events if e.qr_code_id}
+        existing = set()
+        if qr_ids:
+            existing = {row[0] for row in db.session.execute(
+                db.select(QRCode.id).where(QRCode.id.in_(qr_ids))
+            )}
+
+        resolve_country = self.country_resolver or (lambda ip: None)
+        rows = [{
+            'qr_code_id': e.qr_code_id,
+            'ip_address': e.ip_address,
+            'user_agent': e.user_agent,
+            'device_type': e.device_type,
+            'os': e.os,
+            'browser': e.browser,
+            'country': resolve_country(e.ip_address),
+            'scanned_at': e.scanned_at
+        } for e in events if e.qr_code_id in existing]
+
+        if rows:
+            db.session.execute(QRScanLog.__table__.insert(), rows)
+            apply_rollups(rollup_counts(rows))
+            apply_sketches(scan_sketches(rows))
+        db.session.commit()
+        self.written += len(rows)
+        self.batches += 1
+        return rows
+
+    def _write_batch(self, events: List[ScanEvent]) -> None:
+        """Insère un lot de scans et met à jour les agrégats en un seul commit,
+        les compteurs sont cumulés dans le CounterBuffer"""
+        # Compteurs cumulés avant l'écriture : un lot en échec ne perd pas les
+        # clics (un QR code supprimé entre-temps n'est simplement pas mis à jour)
+        for event in events:
+            self.counters.add(event.short_code, event.qr_code_id, scanned_at=event.scanned_at)
+
+        with self.app.app_context():
+            # Une seconde tentative absorbe les conflits de verrous entre workers
+            for attempt in range(2):
+                try:
+                    rows = self._insert_batch(events)
+                    break
+                except Exception as e:
+                    db.session.rollback()
+                    if attempt:
+                        self.failed += len(events)
+                        logger.error(f"Erreur écriture lot de scans ({len(events)}): {e}")
+                        return
+                    self.retries += 1
+                    logger.warning(f"Écriture du lot de scans relancée ({len(events)}): {e}")
+
+        if self.segment_store is not None and rows:
+            try:
+                self.segment_store.append(rows)
+            except Exception as e:
+                logger.error(f"Erreur écriture segment de scans ({len(rows)}): {e}")
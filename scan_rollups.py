@@ -0,0 +1,318 @@
+"""
+Agrégats de scans maintenus à l'ingestion : par QR code, par heure et par jour,
+au total et par device_type / country. Les statistiques sont lues dans
+`qr_scan_rollups` sans jamais parcourir `qr_scan_logs`.
+
+Les scanners distincts sont estimés par un sketch HyperLogLog par QR code et
+par jour (`qr_scan_sketches`), fusionnable sur n'importe quelle plage.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from hyperloglog import HyperLogLog
+from models import db, QRCode, QRScanLog, QRScanRollup, QRScanSketch
+
+GRANULARITIES = ('hour', 'day')
+# Périodes de restitution : semaines et mois sont regroupés à partir des jours
+BUCKETS = ('hour', 'day', 'week', 'month')
+DIMENSIONS = ('total', 'device_type', 'country')
+
+ROLLUP_KEY_COLUMNS = ('qr_code_id', 'granularity', 'dimension', 'bucket_start', 'value')
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Début de la période contenant `moment` (semaines commençant le lundi)"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: datetime, granularity: str) -> datetime:
+    """Début de la période suivante"""
+    if granularity == 'hour':
+        return start + timedelta(hours=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)
+
+
+def bucket_range(start: datetime, end: datetime, granularity: str) -> List[datetime]:
+    """Toutes les périodes de `start` à `end` inclus"""
+    current = bucket_start(start, granularity)
+    buckets = []
+    while current <= end:
+        buckets.append(current)
+        current = next_bucket(current, granularity)
+    return buckets
+
+
+def rollup_counts(scans: Iterable[dict]) -> Counter:
+    """Compte les scans par clé d'agrégat ; chaque scan porte qr_code_id,
+    scanned_at, device_type et country"""
+    counts = Counter()
+    for scan in scans:
+        for granularity in GRANULARITIES:
+            start = bucket_start(scan['scanned_at'], granularity)
+            qr_id = scan['qr_code_id']
+            counts[(qr_id, granularity, 'total', start, '')] += 1
+            counts[(qr_id, granularity, 'device_type', start, scan.get('device_type') or '')] += 1
+            counts[(qr_id, granularity, 'country', start, scan.get('country') or '')] += 1
+    return counts
+
+
+def apply_rollups(counts: Counter) -> None:
+    """Ajoute les comptes aux agrégats (upsert `count = count + n`), dans la
+    transaction de la session courante ; les lignes sont écrites dans l'ordre
+    des clés pour que deux workers verrouillent toujours dans le même ordre"""
+    if not counts:
+        return
+    table = QRScanRollup.__table__
+    rows = [dict(zip(ROLLUP_KEY_COLUMNS, key), count=n) for key, n in sorted(counts.items())]
+    dialect = db.engine.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEY_COLUMNS),
+            set_={'count': table.c.count + stmt.excluded.count}
+        )
+        db.session.execute(stmt, rows)
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted.count)
+        db.session.execute(stmt, rows)
+    else:
+        for row in rows:
+            key_clause = [table.c[col] == row[col] for col in ROLLUP_KEY_COLUMNS]
+            updated = db.session.execute(
+                table.update().where(*key_clause).values(count=table.c.count + row['count'])
+            ).rowcount
+            if not updated:
+                db.session.execute(table.insert().values(**row))
+
+
+def query_rollups(qr_ids: List[str], granularity: str, dimension: str,
+                  start: datetime, end: Optional[datetime] = None):
+    """Lignes (qr_code_id, bucket_start, value, count) des agrégats demandés"""
+    table = QRScanRollup.__table__
+    conditions = [
+        table.c.qr_code_id.in_(qr_ids),
+        table.c.granularity == granularity,
+        table.c.dimension == dimension,
+        table.c.bucket_start >= start
+    ]
+    if end is not None:
+        conditions.append(table.c.bucket_start <= end)
+    return db.session.execute(
+        db.select(table.c.qr_code_id, table.c.bucket_start, table.c.value, table.c.count)
+        .where(*conditions)
+        .order_by(table.c.bucket_start)
+    ).all()
+
+
+def query_user_rollups(user_id: int, granularity: str, dimension: str,
+                       start: datetime, end: Optional[datetime] = None):
+    """Comme query_rollups, pour tous les QR codes d'un utilisateur (jointure
+    plutôt qu'une liste IN de tous ses identifiants)"""
+    table = QRScanRollup.__table__
+    qr_codes = QRCode.__table__
+    conditions = [
+        qr_codes.c.user_id == user_id,
+        table.c.granularity == granularity,
+        table.c.dimension == dimension,
+        table.c.bucket_start >= start
+    ]
+    if end is not None:
+        conditions.append(table.c.bucket_start <= end)
+    return db.session.execute(
+        db.select(table.c.qr_code_id, table.c.bucket_start, table.c.value, table.c.count)
+        .join(qr_codes, qr_codes.c.id == table.c.qr_code_id)
+        .where(*conditions)
+        .order_by(table.c.bucket_start)
+    ).all()
+
+
+def rollup_version(granularity: str, start: datetime, end: Optional[datetime] = None,
+                   qr_ids: Optional[List[str]] = None, user_id: Optional[int] = None) -> Tuple[int, int]:
+    """(lignes, scans) des agrégats « total » d'une plage, pour les QR codes
+    donnés ou tous ceux d'un utilisateur : change dès qu'un scan de la plage
+    est ingéré pour ces QR codes, et seulement dans ce cas"""
+    table = QRScanRollup.__table__
+    conditions = [
+        table.c.granularity == granularity,
+        table.c.dimension == 'total',
+        table.c.bucket_start >= start
+    ]
+    if end is not None:
+        conditions.append(table.c.bucket_start <= end)
+    query = db.select(db.func.count(), db.func.coalesce(db.func.sum(table.c.count), 0))
+    if qr_ids is not None:
+        conditions.append(table.c.qr_code_id.in_(qr_ids))
+    else:
+        qr_codes = QRCode.__table__
+        query = query.select_from(table).join(qr_codes, qr_codes.c.id == table.c.qr_code_id)
+        conditions.append(qr_codes.c.user_id == user_id)
+    rows, scans = db.session.execute(query.where(*conditions)).one()
+    return rows, int(scans)
+
+
+def scanner_key(ip_address: Optional[str], user_agent: Optional[str]) -> Optional[str]:
+    """Identité d'un scanner : IP et User-Agent (plusieurs appareils derrière
+    un même NAT d'opérateur restent distincts)"""
+    if not ip_address:
+        return None
+    return f"{ip_address}|{user_agent or ''}"
+
+
+def scan_sketches(scans: Iterable[dict]) -> Dict[Tuple[str, datetime], HyperLogLog]:
+    """Sketches journaliers des scanners d'un lot, par (qr_code_id, jour)"""
+    sketches = {}
+    for scan in scans:
+        key = scanner_key(scan.get('ip_address'), scan.get('user_agent'))
+        if key is None:
+            continue
+        day = bucket_start(scan['scanned_at'], 'day')
+        sketch = sketches.get((scan['qr_code_id'], day))
+        if sketch is None:
+            sketch = sketches[(scan['qr_code_id'], day)] = HyperLogLog()
+        sketch.add(key)
+    return sketches
+
+
+def apply_sketches(sketches: Dict[Tuple[str, datetime], HyperLogLog]) -> None:
+    """Fusionne les sketches dans ceux stockés, dans la transaction de la
+    session courante (lignes existantes verrouillées pendant la fusion, dans
+    l'ordre des clés comme les agrégats)"""
+    table = QRScanSketch.__table__
+    for attempt in range(2):
+        if not sketches:
+            return
+        pending = dict(sorted(sketches.items()))
+        stored = db.session.execute(
+            db.select(table.c.qr_code_id, table.c.day, table.c.sketch)
+            .where(
+                table.c.qr_code_id.in_({qr_id for qr_id, _ in pending}),
+                table.c.day.in_({day for _, day in pending})
+            )
+            .order_by(table.c.qr_code_id, table.c.day)
+            .with_for_update()
+        ).all()
+        updates = []
+        for row in stored:
+            sketch = pending.pop((row.qr_code_id, row.day), None)
+            if sketch is None:
+                continue
+            merged = HyperLogLog.from_bytes(row.sketch)
+            merged.merge(sketch)
+            updates.append({'b_qr_id': row.qr_code_id, 'b_day': row.day, 'b_sketch': merged.to_bytes()})
+        if updates:
+            db.session.execute(
+                table.update()
+                .where(table.c.qr_code_id == db.bindparam('b_qr_id'), table.c.day == db.bindparam('b_day'))
+                .values(sketch=db.bindparam('b_sketch'), updated_at=datetime.utcnow()),
+                updates
+            )
+        if not pending:
+            return
+        try:
+            # Savepoint : un autre worker peut créer le même jour en parallèle
+            with db.session.begin_nested():
+                db.session.execute(table.insert(), [
+                    {'qr_code_id': qr_id, 'day': day, 'sketch': sketch.to_bytes(), 'updated_at': datetime.utcnow()}
+                    for (qr_id, day), sketch in pending.items()
+                ])
+            return
+        except IntegrityError:
+            if attempt:
+                raise
+            # Relire (et fusionner) uniquement les jours restants
+            sketches = pending
+
+
+def query_sketches(qr_ids: List[str], start: datetime, end: Optional[datetime] = None) -> Dict[datetime, HyperLogLog]:
+    """Sketches par jour sur la plage, fusionnés entre les QR codes demandés"""
+    table = QRScanSketch.__table__
+    conditions = [table.c.qr_code_id.in_(qr_ids), table.c.day >= bucket_start(start, 'day')]
+    if end is not None:
+        conditions.append(table.c.day <= end)
+    days = {}
+    for row in db.session.execute(db.select(table.c.day, table.c.sketch).where(*conditions)):
+        sketch = HyperLogLog.from_bytes(row.sketch)
+        if row.day in days:
+            days[row.day].merge(sketch)
+        else:
+            days[row.day] = sketch
+    return days
+
+
+def union_count(sketches: Iterable[HyperLogLog]) -> int:
+    """Nombre estimé d'éléments distincts sur l'union des sketches"""
+    union = None
+    for sketch in sketches:
+        if union is None:
+            union = HyperLogLog(sketch.precision, bytearray(sketch.registers))
+        else:
+            union.merge(sketch)
+    return union.count() if union is not None else 0
+
+
+def backfill_rollups(batch_size: int = 5000) -> int:
+    """Construit les agrégats à partir des logs existants (à lancer une fois,
+    sur une table d'agrégats vide)"""
+    table = QRScanLog.__table__
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.qr_code_id, table.c.scanned_at,
+                      table.c.device_type, table.c.country)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        apply_rollups(rollup_counts(rows))
+        db.session.commit()
+        last_id = rows[-1]['id']
+        total += len(rows)
+    return total
+
+
+def backfill_sketches(batch_size: int = 5000) -> int:
+    """Construit les sketches de scanners distincts à partir des logs existants
+    (à lancer une fois, sur une table de sketches vide)"""
+    table = QRScanLog.__table__
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.qr_code_id, table.c.scanned_at,
+                      table.c.ip_address, table.c.user_agent)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        apply_sketches(scan_sketches(rows))
+        db.session.commit()
+        last_id = rows[-1]['id']
+        total += len(rows)
+    return total
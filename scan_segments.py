@@ -0,0 +1,346 @@
+"""
+Stockage local en colonnes des événements de scan (optionnel).
+
+Chaque processus écrit ses propres segments, en ajout uniquement : un segment
+est un répertoire de quatre colonnes à largeur fixe, alignées par position.
+
+    ts.u32   secondes depuis l'epoch (UTC)
+    qr.u32   index du QR code (dictionnaire partagé `qr_index.txt`)
+    dev.u8   code de type d'appareil (DEVICE_CODES)
+    cc.u16   code pays (2 lettres compactées, 0 = inconnu)
+
+Les agrégations projettent les colonnes en mémoire et les traitent avec NumPy
+(quelques millisecondes pour des millions de scans, sans requête SQL). Sans
+NumPy, les segments restent écrits mais ne peuvent pas être agrégés : un
+parcours ligne à ligne bloquerait le worker.
+
+Supprimer un QR code ajoute une pierre tombale dans `qr_index.txt` : son
+ancien index n'est plus associé à aucun identifiant, et un QR code recréé
+avec le même identifiant reçoit un nouvel index. Ses anciennes lignes
+restent dans les segments mais ne sont plus jamais agrégées.
+"""
+
+import array
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEVICE_CODES = ('unknown', 'mobile', 'tablet', 'desktop', 'bot')
+DEVICE_INDEX = {name: code for code, name in enumerate(DEVICE_CODES)}
+
+SEGMENT_BUCKETS = ('hour', 'day', 'week', 'month')
+SEGMENT_GROUPS = ('total', 'device_type', 'country')
+
+# (nom du fichier, code array, dtype NumPy) ; little-endian sur disque
+COLUMNS = (
+    ('ts.u32', 'I', '<u4'),
+    ('qr.u32', 'I', '<u4'),
+    ('dev.u8', 'B', 'u1'),
+    ('cc.u16', 'H', '<u2'),
+)
+
+EPOCH = datetime(1970, 1, 1)
+# Lundi 5 janvier 1970 : origine des semaines
+WEEK_ORIGIN = 4 * 86400
+
+
+def encode_country(country: Optional[str]) -> int:
+    if not country or len(country) != 2 or not country.isalpha():
+        return 0
+    country = country.upper()
+    return (ord(country[0]) - 65) * 26 + (ord(country[1]) - 65) + 1
+
+
+def decode_country(code: int) -> Optional[str]:
+    if not code:
+        return None
+    code -= 1
+    return chr(65 + code // 26) + chr(65 + code % 26)
+
+
+def _timestamp(moment: datetime) -> int:
+    return int((moment - EPOCH).total_seconds())
+
+
+class _QRIndex:
+    """Dictionnaire qr_id -> entier partagé entre processus
+
+    Une ligne par événement : l'identifiant encodé (son index est le numéro
+    de la ligne) ou « ! » suivi de l'identifiant pour une suppression.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Dict[str, int] = {}
+        self._lines = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _reload(self) -> None:
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # Ne lire que des lignes complètes
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            if line.startswith('!'):
+                self._index.pop(unquote(line[1:]), None)
+            else:
+                self._index[unquote(line)] = self._lines
+            self._lines += 1
+        self._offset += end
+
+    def refresh(self) -> None:
+        """Relit les lignes ajoutées par les autres processus"""
+        with self._lock:
+            self._reload()
+
+    def lookup(self, qr_id: str) -> Optional[int]:
+        with self._lock:
+            self._reload()
+            return self._index.get(qr_id)
+
+    def _append(self, lines: List[str]) -> None:
+        with open(self.path, 'ab') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                # Un autre processus a pu modifier le dictionnaire entre-temps
+                self._reload()
+                lines = [line for line in lines if self._needs(line)]
+                if lines:
+                    f.write(''.join(line + '\n' for line in lines).encode('utf-8'))
+                    f.flush()
+                    self._reload()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _needs(self, line: str) -> bool:
+        if line.startswith('!'):
+            return unquote(line[1:]) in self._index
+        return unquote(line) not in self._index
+
+    def get_or_add(self, qr_id: str) -> int:
+        with self._lock:
+            if qr_id not in self._index:
+                self._append([quote(qr_id, safe='')])
+            return self._index[qr_id]
+
+    def remove_many(self, qr_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._append(['!' + quote(qr_id, safe='') for qr_id in qr_ids])
+
+
+class ScanSegmentStore:
+    """Segments en colonnes des scans, agrégés sans passer par la base"""
+
+    def __init__(self, directory: str, segment_rows: int = 1_000_000):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        os.makedirs(directory, exist_ok=True)
+        self._qr_index = _QRIndex(os.path.join(directory, 'qr_index.txt'))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._segment = None
+        self._segment_size = 0
+        self.appended = 0
+
+    # Écriture
+
+    def _open_segment(self) -> str:
+        name = f"seg-{datetime.utcnow():%Y%m%d%H%M%S}-{os.getpid()}-{self.appended}"
+        path = os.path.join(self.directory, name)
+        os.makedirs(path, exist_ok=True)
+        self._pid = os.getpid()
+        self._segment = path
+        self._segment_size = 0
+        return path
+
+    def append(self, scans: Iterable[dict]) -> int:
+        """Ajoute des scans (qr_code_id, scanned_at, device_type, country)"""
+        # Suppressions faites par les autres processus depuis le dernier lot
+        self._qr_index.refresh()
+        columns = [array.array(code) for _, code, _ in COLUMNS]
+        ts, qr, dev, cc = columns
+        for scan in scans:
+            ts.append(_timestamp(scan['scanned_at']))
+            qr.append(self._qr_index.get_or_add(scan['qr_code_id']))
+            dev.append(DEVICE_INDEX.get(scan.get('device_type') or 'unknown', 0))
+            cc.append(encode_country(scan.get('country')))
+        if not ts:
+            return 0
+        if sys.byteorder != 'little':
+            for column in columns:
+                column.byteswap()
+
+        with self._lock:
+            # Un segment n'est jamais partagé entre processus (fork compris)
+            if (self._segment is None or self._pid != os.getpid()
+                    or self._segment_size >= self.segment_rows
+                    or not os.path.isdir(self._segment)):
+                self._open_segment()
+            for (filename, _, _), column in zip(COLUMNS, columns):
+                with open(os.path.join(self._segment, filename), 'ab') as f:
+                    column.tofile(f)
+            self._segment_size += len(ts)
+            self.appended += len(ts)
+        return len(ts)
+
+    @property
+    def can_aggregate(self) -> bool:
+        return np is not None
+
+    def remove_many(self, qr_ids: Iterable[str]) -> None:
+        """Oublie les scans de QR codes supprimés (pierre tombale dans l'index)"""
+        self._qr_index.remove_many(qr_ids)
+
+    # Lecture
+
+    def segments(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.startswith('seg-')
+        )
+
+    def _segment_rows(self, path: str) -> int:
+        """Nombre de lignes complètes (une colonne peut être en avance en cas de crash)"""
+        rows = None
+        for filename, code, _ in COLUMNS:
+            try:
+                size = os.path.getsize(os.path.join(path, filename))
+            except FileNotFoundError:
+                return 0
+            count = size // array.array(code).itemsize
+            rows = count if rows is None else min(rows, count)
+        return rows or 0
+
+    def aggregate(self, qr_id: str, bucket: str = 'day', group_by: str = 'total',
+                  start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[datetime, Dict[str, int]]:
+        """Scans d'un QR code par période (et par valeur de `group_by`)"""
+        if bucket not in SEGMENT_BUCKETS or group_by not in SEGMENT_GROUPS:
+            raise ValueError("Période ou regroupement inconnu")
+        if np is None:
+            raise RuntimeError("NumPy est requis pour agréger les segments")
+        qr_index = self._qr_index.lookup(qr_id)
+        if qr_index is None:
+            return {}
+        start_ts = _timestamp(start) if start else None
+        end_ts = _timestamp(end) if end else None
+
+        totals = Counter()
+        for path in self.segments():
+            rows = self._segment_rows(path)
+            if rows:
+                totals.update(self._aggregate(path, rows, qr_index, bucket, group_by, start_ts, end_ts))
+
+        result: Dict[datetime, Dict[str, int]] = {}
+        for (bucket_ts, value), count in totals.items():
+            moment = _bucket_datetime(bucket_ts, bucket)
+            label = self._label(value, group_by)
+            result.setdefault(moment, {})
+            result[moment][label] = result[moment].get(label, 0) + count
+        return dict(sorted(result.items()))
+
+    @staticmethod
+    def _label(value: int, group_by: str) -> str:
+        if group_by == 'device_type':
+            return DEVICE_CODES[value] if value < len(DEVICE_CODES) else 'unknown'
+        if group_by == 'country':
+            return decode_country(value) or 'unknown'
+        return 'total'
+
+    def _aggregate(self, path, rows, qr_index, bucket, group_by, start_ts, end_ts) -> Counter:
+        columns = {
+            filename: np.memmap(os.path.join(path, filename), dtype=dtype, mode='r', shape=(rows,))
+            for filename, _, dtype in COLUMNS
+        }
+        mask = columns['qr.u32'] == qr_index
+        if start_ts is not None:
+            mask &= columns['ts.u32'] >= start_ts
+        if end_ts is not None:
+            mask &= columns['ts.u32'] < end_ts
+        ts = columns['ts.u32'][mask].astype(np.int64)
+        if not ts.size:
+            return Counter()
+
+        if bucket == 'hour':
+            step, keys = 3600, ts // 3600
+        elif bucket == 'day':
+            step, keys = 86400, ts // 86400
+        elif bucket == 'week':
+            step, keys = 604800, (ts - WEEK_ORIGIN) // 604800
+        else:
+            # Mois depuis 1970
+            step, keys = 1, ts.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+        first = int(keys.min())
+        keys -= first
+
+        if group_by == 'total':
+            values, width = None, 1
+        else:
+            column = 'dev.u8' if group_by == 'device_type' else 'cc.u16'
+            values = columns[column][mask].astype(np.int64)
+            width = int(values.max()) + 1
+
+        # Clé combinée (période, valeur) comptée en une passe : bincount sur
+        # un intervalle dense, np.unique si l'intervalle est trop étendu
+        combined = keys * width + values if values is not None else keys
+        if int(combined.max()) < 10_000_000:
+            counts = np.bincount(combined)
+            present = np.nonzero(counts)[0]
+            pairs = zip(present, counts[present])
+        else:
+            pairs = zip(*np.unique(combined, return_counts=True))
+        offset = WEEK_ORIGIN if bucket == 'week' else 0
+        return Counter({
+            ((int(key) // width + first) * step + offset, int(key) % width): int(count)
+            for key, count in pairs
+        })
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        return {
+            'directory': self.directory,
+            'segments': len(segments),
+            'rows': sum(self._segment_rows(path) for path in segments),
+            'appended': self.appended,
+            'numpy': np is not None
+        }
+
+
+def _bucket_datetime(key: int, bucket: str) -> datetime:
+    if bucket == 'month':
+        return datetime(1970 + key // 12, key % 12 + 1, 1)
+    return EPOCH + timedelta(seconds=key)
+
+
+def open_store(directory: str, segment_rows: int = 1_000_000) -> Optional[ScanSegmentStore]:
+    """Ouvre le stockage si le répertoire est configuré, None sinon"""
+    if not directory:
+        return None
+    try:
+        return ScanSegmentStore(directory, segment_rows=segment_rows)
+    except OSError as e:
+        logger.warning(f"Stockage en colonnes des scans indisponible ({directory}): {e}")
+        return None
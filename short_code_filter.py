@@ -0,0 +1,158 @@
+"""
+Filtre d'appartenance des codes courts actifs : un code absent du filtre de
+Bloom est rejeté sans requête en base.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+from models import db, ShortLink
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Filtre de Bloom sur un bytearray (double hachage blake2b)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class ShortCodeFilter:
+    """Ensemble des codes courts actifs connus du worker.
+
+    Les faux positifs (codes supprimés, collisions du filtre) retombent sur la
+    résolution normale, qui met aussi en cache les codes absents. Les codes créés par un autre worker sont rattrapés par
+    une lecture incrémentale (id > dernier id vu), limitée à une requête par
+    `refresh_interval` secondes quel que soit le trafic de codes inconnus.
+    La lecture recouvre les `REFRESH_OVERLAP` derniers ids pour ne pas manquer
+    une transaction commitée après une autre ayant obtenu un id plus grand.
+
+    Entre deux lectures, un code absent peut avoir été créé par un autre
+    worker : il est résolu normalement (au plus `MISS_LOOKUPS_PER_REFRESH`
+    fois par intervalle, pour que des codes aléatoires n'atteignent pas la
+    base) et ajouté au filtre s'il existe.
+    """
+
+    REFRESH_OVERLAP = 1000
+    MISS_LOOKUPS_PER_REFRESH = 100
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001,
+                 refresh_interval: float = 2.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._max_id = 0
+        self._last_refresh = 0.0
+        self._miss_lookups = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.miss_lookups = 0
+
+    def rebuild(self) -> None:
+        """Reconstruit le filtre à partir de tous les liens actifs (contexte applicatif requis)"""
+        rows = db.session.execute(
+            db.select(ShortLink.id, ShortLink.short_code).where(ShortLink.is_active.is_(True))
+        ).all()
+        max_id = db.session.execute(db.select(db.func.max(ShortLink.id))).scalar() or 0
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for _, short_code in rows:
+            bloom.add(short_code)
+        with self._lock:
+            self._bloom = bloom
+            self._max_id = max_id
+            self._last_refresh = time.monotonic()
+        logger.info(f"Filtre de codes courts reconstruit: {len(rows)} codes")
+
+    def refresh(self) -> None:
+        """Ajoute les liens créés depuis la dernière lecture"""
+        with self._lock:
+            self._last_refresh = time.monotonic()
+            self._miss_lookups = 0
+            since = max(0, self._max_id - self.REFRESH_OVERLAP)
+        rows = db.session.execute(
+            db.select(ShortLink.id, ShortLink.short_code)
+            .where(ShortLink.id > since, ShortLink.is_active.is_(True))
+        ).all()
+        if not rows:
+            return
+        with self._lock:
+            for link_id, short_code in rows:
+                if short_code not in self._bloom:
+                    self._bloom.add(short_code)
+                self._max_id = max(self._max_id, link_id)
+            saturated = len(self._bloom) > self._bloom.capacity
+        if saturated:
+            self.rebuild()
+
+    def add(self, short_code: str) -> None:
+        """Enregistre un code créé par ce worker"""
+        with self._lock:
+            self._bloom.add(short_code)
+
+    def might_contain(self, short_code: str, resolve: Optional[Callable[[str], object]] = None) -> bool:
+        """False si le code n'existe certainement pas
+
+        `resolve` (résolution normale, dont le résultat est mis en cache) est
+        appelé pour un code absent créé depuis la dernière lecture.
+        """
+        if short_code in self._bloom:
+            return True
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+            if short_code in self._bloom:
+                return True
+        elif resolve is not None:
+            with self._lock:
+                allowed = self._miss_lookups < self.MISS_LOOKUPS_PER_REFRESH
+                if allowed:
+                    self._miss_lookups += 1
+                    self.miss_lookups += 1
+            if allowed and resolve(short_code):
+                with self._lock:
+                    if short_code not in self._bloom:
+                        self._bloom.add(short_code)
+                return True
+        self.rejected += 1
+        return False
+
+    def stats(self) -> dict:
+        """Compteurs du filtre"""
+        return {
+            'codes': len(self._bloom),
+            'capacity': self._bloom.capacity,
+            'bits': self._bloom.num_bits,
+            'hashes': self._bloom.num_hashes,
+            'rejected': self.rejected,
+            'miss_lookups': self.miss_lookups
+        }
@@ -0,0 +1,135 @@
+"""
+Allocation de codes courts uniques sans interroger la base à chaque code.
+
+Chaque worker réserve un bloc de numéros dans la séquence `id_sequences`
+(un UPDATE par bloc). Un numéro est converti en code en choisissant son palier
+de longueur, puis en le passant dans une permutation de Feistel à clé (avec
+cycle-walking) du domaine 62^longueur, encodée en base62. La permutation étant
+une bijection, deux numéros distincts donnent toujours deux codes distincts ;
+un palier épuisé bascule automatiquement sur la longueur suivante.
+
+Les paliers commencent à 7 caractères : les anciens codes aléatoires font 6
+caractères et ne peuvent donc pas entrer en collision avec les nouveaux.
+"""
+
+import hashlib
+import os
+import secrets
+import string
+import threading
+from typing import List
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdSequence
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+FEISTEL_ROUNDS = 4
+
+
+def base62_encode(value: int, length: int) -> str:
+    """Encode un entier en base62 sur exactement `length` caractères"""
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 62)
+        chars.append(BASE62_ALPHABET[rem])
+    if value:
+        raise ValueError("Valeur trop grande pour la longueur demandée")
+    return ''.join(reversed(chars))
+
+
+class ShortCodeAllocator:
+    """Distribue des codes courts uniques à partir de blocs de séquence réservés"""
+
+    def __init__(self, block_size: int = 1000, min_length: int = 7, max_length: int = 10,
+                 sequence_name: str = 'short_code'):
+        self.block_size = block_size
+        self.sequence_name = sequence_name
+        # (longueur, premier numéro du palier, taille du palier)
+        self.tiers = []
+        offset = 0
+        for length in range(min_length, max_length + 1):
+            self.tiers.append((length, offset, 62 ** length))
+            offset += 62 ** length
+        self.capacity = offset
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = 0
+        self._end = 0
+        self._key = None
+
+    def allocate(self) -> str:
+        """Retourne un code court unique"""
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count: int) -> List[str]:
+        """Retourne `count` codes courts uniques (au plus une réservation en base)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Un bloc hérité d'un fork serait partagé avec le processus parent
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            numbers = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(numbers)
+            missing = count - len(numbers)
+            if missing:
+                start = self._reserve(max(self.block_size, missing))
+                numbers.extend(range(start, start + missing))
+                self._next = start + missing
+                self._end = start + max(self.block_size, missing)
+            key = self._key
+        return [self.encode(n, key) for n in numbers]
+
+    def encode(self, number: int, key: bytes) -> str:
+        """Convertit un numéro de séquence en code court"""
+        for length, offset, size in self.tiers:
+            if number < offset + size:
+                return base62_encode(self._permute(number - offset, size, length, key), length)
+        raise OverflowError("Espace de codes courts épuisé")
+
+    def _permute(self, value: int, domain: int, length: int, key: bytes) -> int:
+        """Permutation de Feistel sur [0, domain), par cycle-walking"""
+        half_bits = (domain.bit_length() + 1) // 2
+        mask = (1 << half_bits) - 1
+        while True:
+            left, right = value >> half_bits, value & mask
+            for round_index in range(FEISTEL_ROUNDS):
+                digest = hashlib.blake2b(
+                    right.to_bytes(8, 'big') + bytes((length, round_index)),
+                    key=key, digest_size=8
+                ).digest()
+                left, right = right, left ^ (int.from_bytes(digest, 'big') & mask)
+            value = (left << half_bits) | right
+            if value < domain:
+                return value
+
+    def _reserve(self, count: int) -> int:
+        """Réserve `count` numéros dans une transaction indépendante de la requête"""
+        table = IdSequence.__table__
+        for _ in range(2):
+            try:
+                with db.engine.begin() as conn:
+                    updated = conn.execute(
+                        table.update()
+                        .where(table.c.name == self.sequence_name)
+                        .values(next_value=table.c.next_value + count)
+                    ).rowcount
+                    if not updated:
+                        conn.execute(table.insert().values(
+                            name=self.sequence_name,
+                            next_value=count,
+                            salt=secrets.token_hex(32)
+                        ))
+                    row = conn.execute(
+                        db.select(table.c.next_value, table.c.salt)
+                        .where(table.c.name == self.sequence_name)
+                    ).one()
+            except IntegrityError:
+                # Un autre worker a créé la séquence en même temps : recommencer
+                continue
+            if row.next_value > self.capacity:
+                raise OverflowError("Espace de codes courts épuisé")
+            self._key = bytes.fromhex(row.salt)
+            return row.next_value - count
+        raise RuntimeError(f"Impossible de réserver la séquence {self.sequence_name}")
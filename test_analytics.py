@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests de l'endpoint /analytics (ETag et périodes)
+"""
+from datetime import datetime
+from urllib.parse import quote
+
+import pytest
+
+import app_clean
+
+QR = {'type': 'text', 'data': 'hello', 'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+def freeze(monkeypatch, now):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now
+
+    monkeypatch.setattr(app_clean, 'datetime', FrozenDatetime)
+
+
+@pytest.mark.parametrize('bucket, before, after', [
+    ('month', datetime(2024, 5, 31, 23), datetime(2024, 6, 1, 1)),
+    ('week', datetime(2024, 6, 2, 23), datetime(2024, 6, 3, 1)),
+])
+def test_etag_changes_with_current_period(client, login, monkeypatch, bucket, before, after):
+    headers = login()
+    assert client.post('/qr-codes', json=QR, headers=headers).status_code == 201
+    freeze(monkeypatch, before)
+    first = client.get(f'/analytics?bucket={bucket}', headers=headers)
+    assert first.status_code == 200
+    assert client.get(f'/analytics?bucket={bucket}',
+                      headers={**headers, 'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # Nouvelle période : la série gagne un point, l'ancien ETag n'est plus valide
+    freeze(monkeypatch, after)
+    second = client.get(f'/analytics?bucket={bucket}',
+                        headers={**headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert len(second.json['series']) == len(first.json['series']) + 1
+
+
+@pytest.mark.parametrize('start, end', [
+    ('2024-05-01T00:00:00Z', '2024-05-31T00:00:00Z'),
+    ('2024-05-01T02:00:00+02:00', '2024-05-31T00:00:00+00:00'),
+    ('2024-05-01', '2024-05-31T00:00:00'),
+])
+def test_range_accepts_utc_suffix(client, login, start, end):
+    response = client.get(f'/analytics?from={quote(start)}&to={quote(end)}', headers=login())
+    assert response.status_code == 200
+    # Dates converties en UTC, sans fuseau comme les agrégats
+    assert response.json['from'] == '2024-05-01T00:00:00'
+    assert response.json['to'] == '2024-05-31T00:00:00'
+    assert len(response.json['series']) == 31
+
+
+def test_range_rejects_invalid_dates(client, login):
+    headers = login()
+    assert client.get('/analytics?from=yesterday', headers=headers).status_code == 400
+    assert client.get('/analytics?from=2024-06-01Z&to=2024-05-01Z', headers=headers).status_code == 400
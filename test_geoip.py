@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests de la base GeoIP hors ligne (construction, bornes des plages)
+"""
+import pytest
+
+from geoip import GeoIPDatabase, build_database, build_database_from_csv, open_database
+
+RANGES = [
+    ('1.0.0.0', '1.0.0.255', 'AU'),
+    ('1.0.1.0', '1.0.3.255', 'cn'),
+    ('2.0.0.0', '2.0.0.0', 'FR'),
+    ('5.0.0.0', '5.0.0.255', '--'),
+    ('2001:db8::', '2001:db8::ffff', 'DE'),
+    ('2a00::', '2a00::1', 'GB'),
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'geoip.bin')
+    assert build_database(RANGES, path) == (3, 2)
+    database = GeoIPDatabase(path)
+    yield database
+    database.close()
+
+
+@pytest.mark.parametrize('ip, country', [
+    ('0.255.255.255', None),  # avant la première plage
+    ('1.0.0.0', 'AU'),  # début de plage
+    ('1.0.0.255', 'AU'),  # fin de plage
+    ('1.0.1.0', 'CN'),  # plage contiguë
+    ('1.0.3.255', 'CN'),
+    ('1.0.4.0', None),  # trou entre deux plages
+    ('1.255.255.255', None),
+    ('2.0.0.0', 'FR'),  # plage d'une seule adresse
+    ('2.0.0.1', None),
+    ('5.0.0.1', None),  # pays inconnu ignoré à la construction
+    ('255.255.255.255', None),  # après la dernière plage
+    ('2001:db7:ffff:ffff:ffff:ffff:ffff:ffff', None),
+    ('2001:db8::', 'DE'),
+    ('2001:db8::ffff', 'DE'),
+    ('2001:db8::1:0', None),
+    ('2a00::1', 'GB'),
+    ('2a00::2', None),
+    ('::ffff:1.0.0.7', 'AU'),  # IPv4 mappée en IPv6
+    (' 2.0.0.0 ', 'FR'),
+    ('', None),
+    (None, None),
+    ('not-an-ip', None),
+])
+def test_lookup_boundaries(database, ip, country):
+    assert database.lookup(ip) == country
+
+
+def test_lookup_is_cached(database):
+    database.lookup('1.0.0.1')
+    database.lookup('1.0.0.1')
+    stats = database.stats()
+    assert stats['ipv4_ranges'] == 3 and stats['ipv6_ranges'] == 2
+    assert stats['cache_hits'] == 1 and stats['cache_misses'] == 1
+
+
+def test_empty_database(tmp_path):
+    path = str(tmp_path / 'geoip.bin')
+    build_database([], path)
+    database = GeoIPDatabase(path)
+    assert database.lookup('1.2.3.4') is None
+    assert database.lookup('2001:db8::1') is None
+    database.close()
+
+
+def test_build_rejects_invalid_ranges(tmp_path):
+    path = str(tmp_path / 'geoip.bin')
+    with pytest.raises(ValueError):
+        build_database([('1.0.0.10', '1.0.0.1', 'FR')], path)
+    with pytest.raises(ValueError):
+        build_database([('1.0.0.0', '::1', 'FR')], path)
+    with pytest.raises(ValueError):
+        build_database([('1.0.0.0', '1.0.0.10', 'FR'), ('1.0.0.10', '1.0.0.20', 'DE')], path)
+    assert not (tmp_path / 'geoip.bin').exists()
+
+
+def test_build_from_csv(tmp_path):
+    csv_path = tmp_path / 'ranges.csv'
+    csv_path.write_text('# plages de test\n1.0.0.0,1.0.0.255,AU\n2001:db8::,2001:db8::ffff,DE\n', encoding='utf-8')
+    path = str(tmp_path / 'geoip.bin')
+    assert build_database_from_csv(str(csv_path), path) == (1, 1)
+    database = open_database(path)
+    assert database.lookup('1.0.0.128') == 'AU'
+    database.close()
+
+
+def test_open_database_invalid_file(tmp_path):
+    path = tmp_path / 'geoip.bin'
+    path.write_bytes(b'NOTGEOIP' + bytes(8))
+    assert open_database(str(path)) is None
+    assert open_database('') is None
+    assert open_database(str(tmp_path / 'missing.bin')) is None
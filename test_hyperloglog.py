@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests du sketch HyperLogLog (précision, fusion, sérialisation)
+"""
+import math
+
+import pytest
+
+from hyperloglog import DEFAULT_PRECISION, HyperLogLog
+
+
+def sketch(values, precision=DEFAULT_PRECISION):
+    hll = HyperLogLog(precision)
+    hll.update(values)
+    return hll
+
+
+@pytest.mark.parametrize('cardinality', [1, 10, 100, 1000, 10000, 100000])
+def test_error_bounds(cardinality):
+    hll = sketch(f"visitor-{i}" for i in range(cardinality))
+    # Trois erreurs types (1,04 / sqrt(m)), arrondi compris
+    bound = 3 * 1.04 / math.sqrt(hll.size)
+    assert abs(hll.count() - cardinality) <= max(1, bound * cardinality)
+
+
+def test_duplicates_not_counted():
+    values = [f"visitor-{i % 50}" for i in range(5000)]
+    assert sketch(values).count() == sketch(set(values)).count()
+
+
+def test_empty():
+    assert HyperLogLog().count() == 0
+
+
+def test_merge_is_union():
+    first = sketch(f"visitor-{i}" for i in range(0, 6000))
+    second = sketch(f"visitor-{i}" for i in range(4000, 10000))
+    first.merge(second)
+    union = sketch(f"visitor-{i}" for i in range(10000))
+    assert first.registers == union.registers
+    assert first.count() == union.count()
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(11).merge(HyperLogLog(12))
+
+
+@pytest.mark.parametrize('precision', [4, DEFAULT_PRECISION, 16])
+def test_serialize_round_trip(precision):
+    hll = sketch((f"visitor-{i}" for i in range(3000)), precision)
+    restored = HyperLogLog.from_bytes(hll.to_bytes())
+    assert restored.precision == precision
+    assert restored.registers == hll.registers
+    assert restored.count() == hll.count()
+    # Un sketch restauré se fusionne comme l'original
+    restored.merge(sketch(['other'], precision))
+    hll.add('other')
+    assert restored.registers == hll.registers
+
+
+def test_serialize_sparse_sketch_is_small():
+    assert len(sketch(['only-one']).to_bytes()) < 100
+
+
+def test_from_bytes_rejects_invalid():
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(b'')
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(b'\xff' + HyperLogLog().to_bytes()[1:])
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests de la mise à jour du schéma (`flask upgrade-db`, jamais au démarrage)
+"""
+from sqlalchemy import inspect, text
+
+from app_clean import create_app
+from migrations import pending_schema_changes
+from models import db
+
+
+def downgrade(app):
+    """Base d'une version antérieure : une colonne et un index manquants"""
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP INDEX ix_qr_scan_logs_qr_scanned'))
+            conn.execute(text('ALTER TABLE qr_codes DROP COLUMN last_scanned_at'))
+        return pending_schema_changes()
+
+
+def qr_code_columns(app):
+    with app.app_context():
+        return {column['name'] for column in inspect(db.engine).get_columns('qr_codes')}
+
+
+def worker_columns(app, **overrides):
+    """Colonnes de qr_codes vues par un nouveau worker démarré sur la même base"""
+    worker = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                         'RATELIMIT_ENABLED': False, 'TESTING': True, **overrides})
+    try:
+        return qr_code_columns(worker)
+    finally:
+        worker.extensions['scan_ingestor'].stop()
+        with worker.app_context():
+            db.engine.dispose()
+
+
+def test_startup_does_not_alter_schema(app):
+    assert downgrade(app) == ['qr_codes.last_scanned_at', 'ix_qr_scan_logs_qr_scanned']
+    # Le worker signale le retard sans modifier la base
+    assert 'last_scanned_at' not in worker_columns(app)
+
+
+def test_auto_upgrade_opt_in(app):
+    downgrade(app)
+    assert 'last_scanned_at' in worker_columns(app, SCHEMA_AUTO_UPGRADE=True)
+
+
+def test_upgrade_db_command(app):
+    downgrade(app)
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['upgrade-db'])
+    assert result.exit_code == 0, result.output
+    assert '1 colonnes ajoutées' in result.output
+    with app.app_context():
+        assert pending_schema_changes() == []
+    # Relancée, la commande ne change plus rien
+    result = runner.invoke(args=['upgrade-db'])
+    assert result.exit_code == 0 and '0 colonnes ajoutées' in result.output
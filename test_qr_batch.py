@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests des opérations en lot sur les QR codes (/qr-codes/batch)
+"""
+from models import db, QRCode, QRScanLog, ShortLink
+
+MOBILE_UA = {'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 '
+                           '(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1'}
+DYNAMIC_QR = {'type': 'url', 'data': 'https://example.com', 'isDynamic': True,
+              'expiresAt': '2030-01-01T00:00:00Z'}
+STATIC_QR = {'type': 'text', 'data': 'hello', 'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+def text_qr(data, **extra):
+    return {**STATIC_QR, 'data': data, **extra}
+
+
+def test_batch_create_keeps_order_and_dedups(app, client, login):
+    headers = login()
+    existing = client.post('/qr-codes', json=text_qr('already here'), headers=headers).json
+    items = [
+        text_qr('first'),
+        text_qr('already here'),
+        text_qr('second', id='client-chosen-id'),
+        text_qr('first'),
+        {**STATIC_QR, 'type': 'url', 'data': 'first'},
+    ]
+    response = client.post('/qr-codes/batch', json=items, headers=headers)
+    assert response.status_code == 201
+    assert response.json['created'] == 3 and response.json['existing'] == 2
+    results = response.json['results']
+    assert [item['index'] for item in results] == list(range(len(items)))
+    assert [(item['type'], item['data'], item['exists']) for item in results] == [
+        ('text', 'first', False),
+        ('text', 'already here', True),
+        ('text', 'second', False),
+        ('text', 'first', True),
+        ('url', 'first', False),
+    ]
+    # Un élément répété renvoie le QR code créé plus haut dans le lot
+    assert results[3]['id'] == results[0]['id']
+    assert results[1]['id'] == existing['id']
+    assert results[2]['id'] == 'client-chosen-id'
+    with app.app_context():
+        assert QRCode.query.count() == 4
+
+    # Lot rejoué : rien n'est recréé
+    replay = client.post('/qr-codes/batch', json={'items': items}, headers=headers)
+    assert replay.status_code == 200
+    assert replay.json['created'] == 0
+    assert [item['id'] for item in replay.json['results']] == [item['id'] for item in results]
+
+
+def test_batch_create_dedup_is_per_user(app, client, login):
+    mine = client.post('/qr-codes/batch', json=[text_qr('shared')], headers=login()).json
+    theirs = client.post('/qr-codes/batch', json=[text_qr('shared', id=mine['results'][0]['id'])],
+                         headers=login('other.user@gmail.com')).json
+    assert theirs['created'] == 1
+    # Identifiant déjà pris par un autre utilisateur : un nouvel identifiant est attribué
+    assert theirs['results'][0]['id'] != mine['results'][0]['id']
+
+
+def test_batch_create_dynamic_codes(client, login):
+    headers = login()
+    response = client.post('/qr-codes/batch', json=[DYNAMIC_QR, DYNAMIC_QR], headers=headers)
+    assert response.status_code == 201
+    results = response.json['results']
+    # Un QR dynamique contient sa propre URL courte : jamais dédupliqué
+    assert response.json['created'] == 2
+    assert results[0]['short_code'] != results[1]['short_code']
+    for item in results:
+        assert item['data'] == item['short_url']
+        redirect = client.get(f"/go/{item['short_code']}", headers=MOBILE_UA)
+        assert redirect.status_code == 302
+        assert redirect.headers['Location'] == 'https://example.com'
+
+
+def test_batch_create_rejects_whole_batch(app, client, login):
+    headers = login()
+    items = [text_qr('valid'), {'type': 'text'}, 'not an object', text_qr('bad date', expiresAt='soon')]
+    response = client.post('/qr-codes/batch', json=items, headers=headers)
+    assert response.status_code == 400
+    assert [error['index'] for error in response.json['errors']] == [1, 2, 3]
+    with app.app_context():
+        assert QRCode.query.count() == 0
+    assert client.post('/qr-codes/batch', json=[], headers=headers).status_code == 400
+
+
+def test_batch_delete_only_own_codes(app, client, login):
+    owner = login()
+    other = login('other.user@gmail.com')
+    mine = [client.post('/qr-codes', json=DYNAMIC_QR, headers=owner).json for _ in range(2)]
+    theirs = client.post('/qr-codes', json=DYNAMIC_QR, headers=other).json
+    for qr_code in mine + [theirs]:
+        assert client.get(f"/go/{qr_code['short_code']}", headers=MOBILE_UA).status_code == 302
+    app.extensions['scan_ingestor'].flush()
+
+    ids = [mine[0]['id'], theirs['id'], 'unknown-id', mine[1]['id']]
+    response = client.delete('/qr-codes/batch', json={'ids': ids}, headers=owner)
+    assert response.status_code == 200
+    assert response.json['deleted'] == 2
+    # Résultats dans l'ordre demandé ; le QR d'un autre utilisateur est introuvable
+    assert response.json['results'] == [
+        {'id': mine[0]['id'], 'status': 'deleted'},
+        {'id': theirs['id'], 'status': 'not_found'},
+        {'id': 'unknown-id', 'status': 'not_found'},
+        {'id': mine[1]['id'], 'status': 'deleted'},
+    ]
+
+    with app.app_context():
+        assert db.session.get(QRCode, theirs['id']) is not None
+        assert QRCode.query.filter(QRCode.id.in_([qr['id'] for qr in mine])).count() == 0
+        assert ShortLink.query.count() == 1
+        assert QRScanLog.query.count() == 1
+    for qr_code in mine:
+        assert client.get(f"/go/{qr_code['short_code']}", headers=MOBILE_UA).status_code == 404
+    assert client.get(f"/go/{theirs['short_code']}", headers=MOBILE_UA).status_code == 302
+
+
+def test_batch_delete_by_filter(app, client, login):
+    owner = login()
+    other = login('other.user@gmail.com')
+    dynamic = client.post('/qr-codes', json=DYNAMIC_QR, headers=owner).json
+    static = client.post('/qr-codes', json=STATIC_QR, headers=owner).json
+    theirs = client.post('/qr-codes', json=DYNAMIC_QR, headers=other).json
+
+    response = client.delete('/qr-codes/batch', json={'filter': {'is_dynamic': True}}, headers=owner)
+    assert response.status_code == 200
+    assert response.json['results'] == [{'id': dynamic['id'], 'status': 'deleted'}]
+    with app.app_context():
+        assert {qr.id for qr in QRCode.query} == {static['id'], theirs['id']}
+    assert client.get(f"/go/{dynamic['short_code']}", headers=MOBILE_UA).status_code == 404
+
+
+def test_batch_delete_rejects_invalid_payload(client, login):
+    headers = login()
+    assert client.delete('/qr-codes/batch', json={}, headers=headers).status_code == 400
+    assert client.delete('/qr-codes/batch', json={'ids': []}, headers=headers).status_code == 400
+    assert client.delete('/qr-codes/batch', json={'ids': [1, 2]}, headers=headers).status_code == 400
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests de la taille des images de QR codes (validation à l'écriture, bornes au rendu)
+"""
+import struct
+
+import pytest
+
+from models import db, QRCode
+from qr_render import IMAGE_MAX_SIZE
+
+QR = {'type': 'text', 'data': 'hello', 'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+def png_width(data):
+    assert data.startswith(b'\x89PNG\r\n\x1a\n')
+    return struct.unpack('>I', data[16:20])[0]
+
+
+@pytest.mark.parametrize('size', [10 ** 9, 99, 1001, 'big', 512.5, True, None])
+def test_create_rejects_invalid_size(client, login, size):
+    headers = login()
+    response = client.post('/qr-codes', json={**QR, 'size': size}, headers=headers)
+    assert response.status_code == 400
+    response = client.post('/qr-codes/batch', json=[{**QR, 'size': size}], headers=headers)
+    assert response.status_code == 400
+
+
+def test_update_rejects_invalid_size(client, login):
+    headers = login()
+    qr_id = client.post('/qr-codes', json={**QR, 'size': 300}, headers=headers).json['id']
+    assert client.put(f'/qr-codes/{qr_id}', json={'size': 10 ** 9}, headers=headers).status_code == 400
+    assert client.put(f'/qr-codes/{qr_id}', json={'size': '500'}, headers=headers).status_code == 400
+    assert client.put('/qr-codes/batch', json={'ids': [qr_id], 'changes': {'size': 5000}},
+                      headers=headers).status_code == 400
+    assert client.put(f'/qr-codes/{qr_id}', json={'size': 400}, headers=headers).status_code == 200
+    image = client.get(f'/qr-codes/{qr_id}/image', headers=headers)
+    assert png_width(image.data) == 400
+
+
+def test_image_clamps_stored_size(app, client, login):
+    headers = login()
+    qr_id = client.post('/qr-codes', json=QR, headers=headers).json['id']
+    # Ligne enregistrée avant la validation
+    with app.app_context():
+        db.session.get(QRCode, qr_id).size = 10 ** 7
+        db.session.commit()
+    image = client.get(f'/qr-codes/{qr_id}/image', headers=headers)
+    assert image.status_code == 200
+    assert png_width(image.data) == IMAGE_MAX_SIZE
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests des filtres de la liste paginée des QR codes (GET /qr-codes)
+"""
+from urllib.parse import quote
+
+import pytest
+
+QR = {'type': 'text', 'data': 'hello'}
+
+
+@pytest.fixture
+def qr_ids(client, login):
+    headers = login()
+    return headers, {
+        expires_at: client.post('/qr-codes', json={**QR, 'data': expires_at, 'expiresAt': expires_at},
+                                headers=headers).json['id']
+        for expires_at in ('2025-01-01T00:00:00Z', '2026-01-01T00:00:00Z', '2030-01-01T00:00:00Z')
+    }
+
+
+def listed(client, headers, **params):
+    query = '&'.join(f'{name}={quote(value)}' for name, value in params.items())
+    response = client.get(f'/qr-codes?fields=id&{query}', headers=headers)
+    assert response.status_code == 200, response.json
+    return {item['id'] for item in response.json['qr_codes']}
+
+
+@pytest.mark.parametrize('after, before', [
+    ('2025-06-01T00:00:00Z', '2027-01-01T00:00:00Z'),
+    ('2026-01-01T02:00:00+02:00', '2026-12-31T23:00:00-01:00'),
+    ('2025-06-01', '2027-01-01T00:00:00'),
+])
+def test_expiry_filters_accept_utc_suffix(client, qr_ids, after, before):
+    headers, ids = qr_ids
+    assert listed(client, headers, expires_after=after, expires_before=before) == {ids['2026-01-01T00:00:00Z']}
+
+
+def test_expiry_filter_in_batch_body(client, qr_ids):
+    headers, ids = qr_ids
+    response = client.delete('/qr-codes/batch', json={'filter': {'expires_before': '2026-01-01T00:00:00Z'}},
+                             headers=headers)
+    assert response.status_code == 200
+    assert response.json['results'] == [{'id': ids['2025-01-01T00:00:00Z'], 'status': 'deleted'}]
+
+
+def test_expiry_filter_rejects_invalid_dates(client, qr_ids):
+    headers, _ = qr_ids
+    assert client.get('/qr-codes?expires_after=tomorrow', headers=headers).status_code == 400
+    assert client.delete('/qr-codes/batch', json={'filter': {'expires_before': 'soon'}},
+                         headers=headers).status_code == 400
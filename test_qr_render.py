@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests de l'encodeur QR (valeurs de référence de la norme ISO/IEC 18004)
+"""
+import pytest
+
+from qr_render import (
+    DataTooLongError, _codewords, _data_codewords, _format_bits, _format_positions,
+    _version_bits, encode, parse_color, render
+)
+
+# Exemple classique « HELLO WORLD » en version 1-Q : 13 codes de données
+# puis 13 codes correcteurs de Reed-Solomon
+HELLO_WORLD_1Q = [
+    32, 91, 11, 120, 209, 114, 220, 77, 67, 64, 236, 17, 236,
+    168, 72, 22, 82, 217, 54, 156, 0, 46, 15, 180, 122, 16,
+]
+
+# Bits de format après masquage 0x5412, masques 0 à 7
+FORMAT_BITS = {
+    'L': ['111011111000100', '111001011110011', '111110110101010', '111100010011101',
+          '110011000101111', '110001100011000', '110110001000001', '110100101110110'],
+    'M': ['101010000010010', '101000100100101', '101111001111100', '101101101001011',
+          '100010111111001', '100000011001110', '100111110010111', '100101010100000'],
+    'Q': ['011010101011111', '011000001101000', '011111100110001', '011101000000110',
+          '010010010110100', '010000110000011', '010111011011010', '010101111101101'],
+    'H': ['001011010001001', '001001110111110', '001110011100111', '001100111010000',
+          '000011101100010', '000001001010101', '000110100001100', '000100000111011'],
+}
+
+# (version, niveau, codes de données)
+DATA_CODEWORDS = [
+    (1, 'L', 19), (1, 'M', 16), (1, 'Q', 13), (1, 'H', 9),
+    (7, 'L', 156), (7, 'M', 124), (7, 'Q', 88), (7, 'H', 66),
+    (10, 'L', 274), (10, 'M', 216), (10, 'Q', 154), (10, 'H', 122),
+    (40, 'L', 2956), (40, 'M', 2334), (40, 'Q', 1666), (40, 'H', 1276),
+]
+
+# (contenu le plus long d'une version, version attendue) au niveau L
+CAPACITY = [
+    ('a' * 17, 1),
+    ('A' * 25, 1),
+    ('1' * 41, 1),
+    ('a' * 2953, 40),
+    ('A' * 4296, 40),
+    ('1' * 7089, 40),
+]
+
+
+def test_hello_world_codewords():
+    version, codewords = _codewords('HELLO WORLD', 'Q')
+    assert version == 1
+    assert list(codewords) == HELLO_WORLD_1Q
+
+
+@pytest.mark.parametrize('ec', sorted(FORMAT_BITS))
+def test_format_bits(ec):
+    assert [format(_format_bits(ec, mask), '015b') for mask in range(8)] == FORMAT_BITS[ec]
+
+
+def test_version_bits():
+    assert _version_bits(7) == 0x07C94
+    assert _version_bits(40) == 0x28C69
+
+
+@pytest.mark.parametrize('version,ec,expected', DATA_CODEWORDS)
+def test_data_codewords(version, ec, expected):
+    assert _data_codewords(version, ec) == expected
+
+
+@pytest.mark.parametrize('data,version', CAPACITY)
+def test_capacity(data, version):
+    assert encode(data, 'L').version == version
+    overflow = data + data[-1]
+    if version == 40:
+        with pytest.raises(DataTooLongError):
+            encode(overflow, 'L')
+    else:
+        assert encode(overflow, 'L').version == version + 1
+
+
+@pytest.mark.parametrize('ec', sorted(FORMAT_BITS))
+def test_matrix_format_and_finders(ec):
+    matrix = encode('https://example.com/qr', ec)
+    size = matrix.size
+    assert size == 4 * matrix.version + 17
+    assert len(matrix.rows) == size and all(len(row) == size for row in matrix.rows)
+    # Les deux copies des bits de format portent le niveau et le masque choisis
+    for positions in _format_positions(size):
+        bits = sum(int(matrix.rows[row][col]) << i for i, (row, col) in enumerate(positions))
+        assert bits == _format_bits(ec, matrix.mask)
+    # Motifs de repérage dans trois coins
+    for top, left in ((0, 0), (0, size - 7), (size - 7, 0)):
+        assert matrix.rows[top][left:left + 7] == '1111111'
+        assert matrix.rows[top + 3][left:left + 7] == '1011101'
+
+
+def test_render_formats():
+    assert render('hello', 'png').startswith(b'\x89PNG\r\n\x1a\n')
+    svg = render('hello', 'svg', color='#112233')
+    assert svg.startswith(b'<svg') and b'fill="#112233"' in svg
+    with pytest.raises(ValueError):
+        render('hello', 'gif')
+
+
+def test_parse_color():
+    assert parse_color('#abc', '#000000') == '#aabbcc'
+    assert parse_color('112233', '#000000') == '#112233'
+    assert parse_color(None, '#000000') == '#000000'
+    assert parse_color('red', '#000000') == '#000000'
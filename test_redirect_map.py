@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests de la table de redirection du serveur frontal : réécriture à chaque
+changement de lien, retrait des liens supprimés et expirés
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, QRCode
+from redirect_map import RedirectMapExporter
+
+DYNAMIC_QR = {'type': 'url', 'data': 'https://example.com', 'isDynamic': True,
+              'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+@pytest.fixture
+def map_path(tmp_path):
+    return tmp_path / 'redirect_map.conf'
+
+
+@pytest.fixture
+def app_config(map_path):
+    return {'REDIRECT_MAP_PATH': str(map_path), 'REDIRECT_MAP_FLUSH_INTERVAL': 0}
+
+
+def read_map(map_path):
+    return map_path.read_text(encoding='utf-8') if map_path.exists() else ''
+
+
+def test_map_follows_link_changes(client, login, map_path):
+    headers = login()
+    qr_code = client.post('/qr-codes', json=DYNAMIC_QR, headers=headers).json
+    line = f'/go/{qr_code["short_code"]} "https://example.com";\n'
+    assert line in read_map(map_path)
+
+    response = client.put(f"/qr-codes/{qr_code['id']}/update-url",
+                          json={'newUrl': 'https://example.org/new'}, headers=headers)
+    assert response.status_code == 200
+    content = read_map(map_path)
+    assert line not in content
+    assert f'/go/{qr_code["short_code"]} "https://example.org/new";\n' in content
+
+    assert client.delete(f"/qr-codes/{qr_code['id']}", headers=headers).status_code == 200
+    assert qr_code['short_code'] not in read_map(map_path)
+
+
+def test_export_all_skips_expired(app, client, login, map_path):
+    headers = login()
+    kept = client.post('/qr-codes', json=DYNAMIC_QR, headers=headers).json
+    expired = client.post('/qr-codes', json=DYNAMIC_QR, headers=headers).json
+    assert expired['short_code'] in read_map(map_path)
+    with app.app_context():
+        db.session.get(QRCode, expired['id']).expires_at = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+        assert app.extensions['redirect_map'].export_all() == 1
+    content = read_map(map_path)
+    assert kept['short_code'] in content
+    assert expired['short_code'] not in content
+
+
+def test_expired_link_removed_at_expiry(app, client, login, map_path):
+    headers = login()
+    expires_at = datetime.utcnow() + timedelta(seconds=1)
+    qr_code = client.post('/qr-codes', json={**DYNAMIC_QR, 'expiresAt': expires_at.isoformat()},
+                          headers=headers).json
+    assert qr_code['short_code'] in read_map(map_path)
+    # L'export planifié à l'expiration retire le lien sans intervention
+    deadline = time.monotonic() + 5
+    while qr_code['short_code'] in read_map(map_path) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert qr_code['short_code'] not in read_map(map_path)
+    assert app.extensions['redirect_map'].exports >= 1
+
+
+def test_apache_requires_explicit_opt_in(tmp_path):
+    path = str(tmp_path / 'redirect_map.txt')
+    with pytest.raises(ValueError):
+        RedirectMapExporter(path, 'apache')
+    exporter = RedirectMapExporter(path, 'apache', allow_uncounted=True)
+    exporter.upsert('abc1234', 'https://example.com')
+    assert (tmp_path / 'redirect_map.txt').read_text() == 'abc1234 https://example.com\n'
+    assert RedirectMapExporter(path).fmt == 'nginx'
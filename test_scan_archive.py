@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests de la purge des logs de scan : archivage puis suppression, reprise
+après une suppression échouée
+"""
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, QRScanLog
+from scan_archive import purge_scan_logs
+
+QR = {'type': 'text', 'data': 'hello', 'expiresAt': '2030-01-01T00:00:00Z'}
+NOW = datetime(2024, 6, 15)
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'SCAN_ARCHIVE_DIR': str(tmp_path / 'archives')}
+
+
+def add_logs(app, qr_id, days_ago):
+    with app.app_context():
+        db.session.add_all(QRScanLog(qr_code_id=qr_id, device_type='mobile', country='FR',
+                                     scanned_at=NOW - timedelta(days=days))
+                           for days in days_ago)
+        db.session.commit()
+
+
+def archived_lines(archive, qr_id):
+    lines = []
+    for month in archive.months(qr_id):
+        with gzip.open(archive.archive_path(qr_id, month), 'rt', encoding='utf-8') as f:
+            lines.extend(json.loads(line)['id'] for line in f)
+    return lines
+
+
+def test_purge_archives_then_deletes(app, client, login):
+    qr_id = client.post('/qr-codes', json=QR, headers=login()).json['id']
+    add_logs(app, qr_id, [100, 95, 70, 2])
+    archive = app.extensions['scan_archive']
+    with app.app_context():
+        result = purge_scan_logs(archive, 30, batch_size=2, now=NOW)
+        assert result['archived'] == 3
+        # Seul le log dans la rétention reste en base
+        assert QRScanLog.query.count() == 1
+    assert archive.months(qr_id) == ['2024-03', '2024-04']
+    assert [record['country'] for record in archive.iter_records(qr_id)] == ['FR'] * 3
+
+
+def test_replay_after_failed_delete_does_not_duplicate(app, client, login, monkeypatch):
+    qr_id = client.post('/qr-codes', json=QR, headers=login()).json['id']
+    add_logs(app, qr_id, [100, 99, 98, 97, 96])
+    archive = app.extensions['scan_archive']
+    with app.app_context():
+        commit = db.session.commit
+        calls = []
+
+        def fail_second_batch():
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('lock wait timeout')
+            commit()
+
+        monkeypatch.setattr(db.session, 'commit', fail_second_batch)
+        with pytest.raises(RuntimeError):
+            purge_scan_logs(archive, 30, batch_size=2, now=NOW)
+        monkeypatch.undo()
+        # Le second lot est archivé mais encore en base
+        assert QRScanLog.query.count() == 3
+        assert len(archived_lines(archive, qr_id)) == 4
+
+        result = purge_scan_logs(archive, 30, batch_size=2, now=NOW)
+        assert result['archived'] == 3
+        assert QRScanLog.query.count() == 0
+    ids = archived_lines(archive, qr_id)
+    assert ids == sorted(set(ids)) and len(ids) == 5
+    assert len(list(archive.iter_records(qr_id))) == 5
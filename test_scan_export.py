@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests de l'export des logs de scan (plage de dates, archives comprises)
+"""
+import json
+from datetime import datetime
+from urllib.parse import quote
+
+import pytest
+
+from models import db, QRScanLog
+from scan_archive import purge_scan_logs
+
+QR = {'type': 'text', 'data': 'hello', 'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'SCAN_ARCHIVE_DIR': str(tmp_path / 'archives')}
+
+
+@pytest.fixture
+def scans(app, client, login):
+    headers = login()
+    qr_id = client.post('/qr-codes', json=QR, headers=headers).json['id']
+    with app.app_context():
+        db.session.add_all(QRScanLog(qr_code_id=qr_id, device_type='mobile', scanned_at=scanned_at)
+                           for scanned_at in (datetime(2024, 3, 10, 12), datetime(2024, 6, 10, 12)))
+        db.session.commit()
+        # Le log de mars passe dans les archives
+        purge_scan_logs(app.extensions['scan_archive'], 30, now=datetime(2024, 6, 15))
+        assert QRScanLog.query.count() == 1
+    return headers, qr_id
+
+
+def exported(client, headers, qr_id, **params):
+    query = '&'.join(f'{name}={quote(value)}' for name, value in params.items())
+    response = client.get(f'/qr-codes/{qr_id}/scan-logs/export?format=ndjson&{query}', headers=headers)
+    assert response.status_code == 200
+    return [json.loads(line)['scanned_at'] for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('start, end, expected', [
+    ('2024-03-01T00:00:00Z', '2024-07-01T00:00:00Z', ['2024-03-10T12:00:00', '2024-06-10T12:00:00']),
+    ('2024-03-10T13:00:00+01:00', '2024-06-10T12:00:00Z', ['2024-03-10T12:00:00']),
+    ('2024-03-10T13:00:01+01:00', '2024-06-10T12:00:01Z', ['2024-06-10T12:00:00']),
+])
+def test_export_range_accepts_utc_suffix(client, scans, start, end, expected):
+    headers, qr_id = scans
+    assert exported(client, headers, qr_id, **{'from': start, 'to': end}) == expected
+
+
+def test_export_rejects_invalid_dates(client, scans):
+    headers, qr_id = scans
+    response = client.get(f'/qr-codes/{qr_id}/scan-logs/export?from=last-week', headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests de l'ingestion des scans : reprise d'un lot en échec, ordre des
+agrégats et flush synchrone des compteurs
+"""
+import threading
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event
+
+import scan_ingest
+from models import db, QRCode, QRScanLog, QRScanRollup, ShortLink
+from scan_rollups import apply_rollups
+
+MOBILE_UA = {'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 '
+                           '(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1'}
+DYNAMIC_QR = {'type': 'url', 'data': 'https://example.com', 'isDynamic': True,
+              'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+def scan(client, qr_code, times=1):
+    for _ in range(times):
+        assert client.get(f"/go/{qr_code['short_code']}", headers=MOBILE_UA).status_code == 302
+
+
+def counts(app, qr_code):
+    with app.app_context():
+        return (
+            db.session.get(QRCode, qr_code['id']).scans,
+            ShortLink.query.filter_by(short_code=qr_code['short_code']).one().clicks,
+            QRScanLog.query.filter_by(qr_code_id=qr_code['id']).count(),
+            sum(row.count for row in QRScanRollup.query.filter_by(
+                qr_code_id=qr_code['id'], granularity='day', dimension='total'))
+        )
+
+
+def test_failed_batch_is_retried(app, client, login, monkeypatch):
+    qr_code = client.post('/qr-codes', json=DYNAMIC_QR, headers=login()).json
+    failures = []
+    original = scan_ingest.apply_rollups
+
+    def deadlock_once(rollups):
+        if not failures:
+            failures.append(1)
+            raise RuntimeError('Deadlock found when trying to get lock')
+        original(rollups)
+
+    monkeypatch.setattr(scan_ingest, 'apply_rollups', deadlock_once)
+    scan(client, qr_code, 3)
+    ingestor = app.extensions['scan_ingestor']
+    ingestor.flush()
+    assert counts(app, qr_code) == (3, 3, 3, 3)
+    assert ingestor.retries == 1 and ingestor.failed == 0
+
+
+def test_batch_failing_twice_keeps_counters(app, client, login, monkeypatch):
+    qr_code = client.post('/qr-codes', json=DYNAMIC_QR, headers=login()).json
+
+    def always_fail(rollups):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(scan_ingest, 'apply_rollups', always_fail)
+    scan(client, qr_code, 2)
+    ingestor = app.extensions['scan_ingestor']
+    ingestor.flush()
+    assert counts(app, qr_code) == (2, 2, 0, 0)
+    assert ingestor.failed == 2
+
+
+def test_rollups_written_in_key_order(app):
+    day = datetime(2024, 5, 1)
+    rollups = Counter({
+        ('qr-b', 'day', 'total', day, ''): 1,
+        ('qr-a', 'hour', 'total', day, ''): 1,
+        ('qr-a', 'day', 'country', day, 'FR'): 1,
+    })
+    written = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'qr_scan_rollups' in statement and executemany:
+            written.extend(parameters)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            apply_rollups(rollups)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+    keys = [tuple(params[:3]) for params in written]
+    assert keys == sorted(keys) and len(keys) == 3
+
+
+def test_flush_waits_for_background_counter_flush(app, client, login, monkeypatch):
+    qr_code = client.post('/qr-codes', json=DYNAMIC_QR, headers=login()).json
+    ingestor = app.extensions['scan_ingestor']
+    started = threading.Event()
+    release = threading.Event()
+    original = QRCode.add_scans
+
+    def slow_add_scans(deltas, last_scanned=None):
+        started.set()
+        release.wait(5)
+        original(deltas, last_scanned)
+
+    monkeypatch.setattr(QRCode, 'add_scans', slow_add_scans)
+    ingestor.counters.add(qr_code['short_code'], qr_code['id'])
+    # Flush périodique du thread d'écriture, bloqué avant son commit
+    background = threading.Thread(target=ingestor.counters.flush)
+    background.start()
+    assert started.wait(5)
+
+    done = threading.Event()
+    foreground = threading.Thread(target=lambda: (ingestor.flush(), done.set()))
+    foreground.start()
+    assert not done.wait(0.2)
+    release.set()
+    foreground.join(5)
+    background.join(5)
+    assert done.is_set()
+    assert counts(app, qr_code)[:2] == (1, 1)
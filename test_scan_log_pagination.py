@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests de la pagination par curseur des logs de scan
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, QRScanLog
+from pagination import decode_cursor, encode_cursor
+
+QR = {'type': 'text', 'data': 'hello', 'expiresAt': '2030-01-01T00:00:00Z'}
+BASE = datetime(2024, 5, 1, 12)
+
+
+def add_logs(app, qr_id, minutes):
+    with app.app_context():
+        logs = [QRScanLog(qr_code_id=qr_id, device_type='mobile', scanned_at=BASE + timedelta(minutes=m))
+                for m in minutes]
+        db.session.add_all(logs)
+        db.session.commit()
+        return [log.id for log in logs]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(BASE, 42)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (BASE, 42)
+    for invalid in ('', 'not-base64!', encode_cursor('not a date', 1)):
+        with pytest.raises(ValueError):
+            decode_cursor(invalid)
+
+
+def test_pages_stable_under_concurrent_inserts(app, client, login):
+    headers = login()
+    qr_id = client.post('/qr-codes', json=QR, headers=headers).json['id']
+    # Plusieurs logs partagent le même instant : l'id départage
+    add_logs(app, qr_id, [0, 1, 1, 1, 2, 3, 3, 4])
+    with app.app_context():
+        expected = [log.id for log in QRScanLog.query.order_by(QRScanLog.scanned_at.desc(), QRScanLog.id.desc())]
+
+    seen = []
+    url = f'/qr-codes/{qr_id}/scan-logs?per_page=3'
+    while True:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        seen.extend(log['id'] for log in response.json['scan_logs'])
+        if not response.json['pagination']['has_next']:
+            break
+        # Scans arrivés entre deux pages, dont un au même instant que la limite de page
+        boundary = response.json['scan_logs'][-1]['timestamp']
+        minute = int((datetime.fromisoformat(boundary) - BASE).total_seconds() // 60)
+        add_logs(app, qr_id, [10, minute])
+        url = f"/qr-codes/{qr_id}/scan-logs?per_page=3&after={response.json['pagination']['next_cursor']}"
+
+    # Ni doublon ni trou : exactement les logs présents à la première page
+    assert seen == expected
+
+
+def test_invalid_cursor(client, login):
+    headers = login()
+    qr_id = client.post('/qr-codes', json=QR, headers=headers).json['id']
+    response = client.get(f'/qr-codes/{qr_id}/scan-logs?after=garbage', headers=headers)
+    assert response.status_code == 400
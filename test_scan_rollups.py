@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests des agrégats de scans (comptage à l'ingestion, upsert, /stats)
+"""
+from collections import Counter
+from datetime import datetime
+
+from models import db, QRScanLog, QRScanRollup
+from scan_rollups import apply_rollups, backfill_rollups, query_rollups, rollup_counts
+
+MOBILE_UA = {'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 '
+                           '(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1'}
+DESKTOP_UA = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                            '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
+DYNAMIC_QR = {'type': 'url', 'data': 'https://example.com', 'isDynamic': True,
+              'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+def rollup_rows(app):
+    with app.app_context():
+        return Counter({
+            (row.qr_code_id, row.granularity, row.dimension, row.bucket_start, row.value): row.count
+            for row in QRScanRollup.query
+        })
+
+
+def test_rollup_counts_keys():
+    scanned_at = datetime(2024, 5, 1, 14, 35)
+    counts = rollup_counts([
+        {'qr_code_id': 'qr-a', 'scanned_at': scanned_at, 'device_type': 'mobile', 'country': 'FR'},
+        {'qr_code_id': 'qr-a', 'scanned_at': scanned_at, 'device_type': 'mobile', 'country': None},
+    ])
+    hour, day = datetime(2024, 5, 1, 14), datetime(2024, 5, 1)
+    assert counts == Counter({
+        ('qr-a', 'hour', 'total', hour, ''): 2,
+        ('qr-a', 'hour', 'device_type', hour, 'mobile'): 2,
+        ('qr-a', 'hour', 'country', hour, 'FR'): 1,
+        ('qr-a', 'hour', 'country', hour, ''): 1,
+        ('qr-a', 'day', 'total', day, ''): 2,
+        ('qr-a', 'day', 'device_type', day, 'mobile'): 2,
+        ('qr-a', 'day', 'country', day, 'FR'): 1,
+        ('qr-a', 'day', 'country', day, ''): 1,
+    })
+
+
+def test_apply_rollups_accumulates(app, client, login):
+    qr_id = client.post('/qr-codes', json=DYNAMIC_QR, headers=login()).json['id']
+    day = datetime(2024, 5, 1)
+    with app.app_context():
+        apply_rollups(Counter({(qr_id, 'day', 'total', day, ''): 2}))
+        db.session.commit()
+        apply_rollups(Counter({(qr_id, 'day', 'total', day, ''): 3,
+                               (qr_id, 'day', 'total', datetime(2024, 5, 2), ''): 1}))
+        db.session.commit()
+        rows = query_rollups([qr_id], 'day', 'total', day)
+    assert [(row.bucket_start, row.count) for row in rows] == [(day, 5), (datetime(2024, 5, 2), 1)]
+
+
+def test_stats_read_ingested_rollups(app, client, login):
+    headers = login()
+    qr_code = client.post('/qr-codes', json=DYNAMIC_QR, headers=headers).json
+    for user_agent in (MOBILE_UA, MOBILE_UA, DESKTOP_UA):
+        assert client.get(f"/go/{qr_code['short_code']}", headers=user_agent).status_code == 302
+    app.extensions['scan_ingestor'].flush()
+
+    response = client.get(f"/qr-codes/{qr_code['id']}/stats?days=7", headers=headers)
+    assert response.status_code == 200
+    assert response.json['total'] == 3
+    # Série complète : les jours sans scan valent 0
+    series = response.json['series']
+    assert len(series) == 7
+    assert [point['count'] for point in series] == [0] * 6 + [3]
+
+    response = client.get(f"/qr-codes/{qr_code['id']}/stats?days=1&granularity=hour&group_by=device_type",
+                          headers=headers)
+    assert response.status_code == 200
+    counts = Counter()
+    for point in response.json['series']:
+        counts.update(point['counts'])
+    assert counts == Counter({'mobile': 2, 'desktop': 1})
+
+    # Le backfill depuis les logs reconstruit exactement les mêmes agrégats
+    ingested = rollup_rows(app)
+    with app.app_context():
+        QRScanRollup.query.delete()
+        db.session.commit()
+        assert backfill_rollups(batch_size=2) == QRScanLog.query.count() == 3
+    assert rollup_rows(app) == ingested
+
+
+def test_stats_validation(client, login):
+    headers = login()
+    qr_id = client.post('/qr-codes', json=DYNAMIC_QR, headers=headers).json['id']
+    for query in ('days=0', 'days=367', 'granularity=week', 'group_by=browser'):
+        assert client.get(f'/qr-codes/{qr_id}/stats?{query}', headers=headers).status_code == 400
+    other = login('other.user@gmail.com')
+    assert client.get(f'/qr-codes/{qr_id}/stats', headers=other).status_code == 404
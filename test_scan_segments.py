@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests du stockage en colonnes des scans (agrégations, pierres tombales)
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+import scan_segments
+from scan_segments import ScanSegmentStore, decode_country, encode_country
+
+requires_numpy = pytest.mark.skipif(scan_segments.np is None, reason='NumPy requis pour agréger')
+
+
+def scan(qr_id, scanned_at, device_type='mobile', country='FR'):
+    return {'qr_code_id': qr_id, 'scanned_at': scanned_at, 'device_type': device_type, 'country': country}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScanSegmentStore(str(tmp_path / 'segments'), segment_rows=3)
+
+
+def test_country_codes_round_trip():
+    assert decode_country(encode_country('fr')) == 'FR'
+    assert decode_country(encode_country('ZZ')) == 'ZZ'
+    for invalid in (None, '', 'F', 'FRA', '1A'):
+        assert encode_country(invalid) == 0
+    assert decode_country(0) is None
+
+
+@requires_numpy
+def test_aggregate_across_segments(store):
+    store.append([
+        scan('qr-a', datetime(2024, 5, 1, 8), 'mobile', 'FR'),
+        scan('qr-a', datetime(2024, 5, 1, 23, 59), 'desktop', 'US'),
+        scan('qr-b', datetime(2024, 5, 1, 9)),
+    ])
+    store.append([
+        scan('qr-a', datetime(2024, 5, 2, 0), 'mobile', None),
+        scan('qr-a', datetime(2024, 5, 3, 12), 'robot', 'FR'),
+    ])
+    # Segment plein : le second lot ouvre un nouveau segment
+    assert len(store.segments()) == 2
+
+    assert store.aggregate('qr-a') == {
+        datetime(2024, 5, 1): {'total': 2},
+        datetime(2024, 5, 2): {'total': 1},
+        datetime(2024, 5, 3): {'total': 1},
+    }
+    assert store.aggregate('qr-a', group_by='device_type') == {
+        datetime(2024, 5, 1): {'mobile': 1, 'desktop': 1},
+        datetime(2024, 5, 2): {'mobile': 1},
+        datetime(2024, 5, 3): {'unknown': 1},
+    }
+    assert store.aggregate('qr-a', 'month', 'country') == {
+        datetime(2024, 5, 1): {'FR': 2, 'US': 1, 'unknown': 1},
+    }
+    # Début inclus, fin exclue
+    assert store.aggregate('qr-a', start=datetime(2024, 5, 1, 23, 59), end=datetime(2024, 5, 3)) == {
+        datetime(2024, 5, 1): {'total': 1},
+        datetime(2024, 5, 2): {'total': 1},
+    }
+    assert store.aggregate('qr-unknown') == {}
+
+
+@requires_numpy
+def test_week_and_month_boundaries(store):
+    store.append([
+        scan('qr-a', datetime(2024, 6, 2, 23, 59, 59)),  # dimanche
+        scan('qr-a', datetime(2024, 6, 3, 0)),  # lundi
+        scan('qr-a', datetime(2024, 6, 30, 23, 59, 59)),
+    ])
+    assert store.aggregate('qr-a', 'week') == {
+        datetime(2024, 5, 27): {'total': 1},
+        datetime(2024, 6, 3): {'total': 1},
+        datetime(2024, 6, 24): {'total': 1},
+    }
+    assert store.aggregate('qr-a', 'month') == {datetime(2024, 6, 1): {'total': 3}}
+    assert store.aggregate('qr-a', 'hour') == {
+        datetime(2024, 6, 2, 23): {'total': 1},
+        datetime(2024, 6, 3, 0): {'total': 1},
+        datetime(2024, 6, 30, 23): {'total': 1},
+    }
+    with pytest.raises(ValueError):
+        store.aggregate('qr-a', 'year')
+
+
+@requires_numpy
+def test_tombstone_hides_old_rows(store, tmp_path):
+    store.append([scan('qr-a', datetime(2024, 5, 1)), scan('qr-b', datetime(2024, 5, 1))])
+    store.remove_many(['qr-a'])
+    assert store.aggregate('qr-a') == {}
+    assert store.aggregate('qr-b') == {datetime(2024, 5, 1): {'total': 1}}
+
+    # Même identifiant recréé : nouvel index, les anciennes lignes restent ignorées
+    store.append([scan('qr-a', datetime(2024, 5, 2))])
+    assert store.aggregate('qr-a') == {datetime(2024, 5, 2): {'total': 1}}
+
+    # Suppression faite par un autre processus, vue au lot suivant
+    other = ScanSegmentStore(store.directory)
+    other.remove_many(['qr-b'])
+    store.append([scan('qr-b', datetime(2024, 5, 3))])
+    assert store.aggregate('qr-b') == {datetime(2024, 5, 3): {'total': 1}}
+
+
+@requires_numpy
+def test_incomplete_row_ignored(store):
+    store.append([scan('qr-a', datetime(2024, 5, 1))])
+    # Crash entre deux colonnes : une seule colonne a reçu la ligne suivante
+    segment = store.segments()[0]
+    with open(os.path.join(segment, 'ts.u32'), 'ab') as f:
+        f.write(b'\x00\x00\x00\x00')
+    assert store.stats()['rows'] == 1
+    assert store.aggregate('qr-a') == {datetime(2024, 5, 1): {'total': 1}}
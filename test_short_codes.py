@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests de la conversion numéro de séquence -> code court (sans base de données)
+"""
+import pytest
+
+from short_codes import BASE62_ALPHABET, ShortCodeAllocator, base62_encode
+
+KEY = bytes(range(32))
+
+
+@pytest.mark.parametrize('domain', [1, 2, 62, 1000, 3844])
+def test_permute_is_bijective(domain):
+    allocator = ShortCodeAllocator()
+    images = [allocator._permute(value, domain, 2, KEY) for value in range(domain)]
+    # Le cycle-walking ne sort jamais du domaine
+    assert sorted(images) == list(range(domain))
+
+
+def test_encode_small_tiers_exhaustive():
+    allocator = ShortCodeAllocator(min_length=1, max_length=2)
+    codes = [allocator.encode(number, KEY) for number in range(allocator.capacity)]
+    assert len(set(codes)) == allocator.capacity == 62 + 62 ** 2
+    # Chaque palier occupe exactement toutes les chaînes de sa longueur
+    assert sorted(code for code in codes if len(code) == 1) == sorted(BASE62_ALPHABET)
+    assert sum(len(code) == 2 for code in codes) == 62 ** 2
+    assert all(len(code) == (1 if number < 62 else 2) for number, code in enumerate(codes))
+    with pytest.raises(OverflowError):
+        allocator.encode(allocator.capacity, KEY)
+
+
+def test_encode_default_tier_boundaries():
+    allocator = ShortCodeAllocator()
+    first_tier = 62 ** 7
+    assert len(allocator.encode(0, KEY)) == 7
+    assert len(allocator.encode(first_tier - 1, KEY)) == 7
+    assert len(allocator.encode(first_tier, KEY)) == 8
+    sample = [allocator.encode(number, KEY) for number in range(first_tier - 500, first_tier + 500)]
+    assert len(set(sample)) == len(sample)
+    assert all(set(code) <= set(BASE62_ALPHABET) for code in sample)
+
+
+def test_encode_depends_on_key():
+    allocator = ShortCodeAllocator()
+    codes = [allocator.encode(number, KEY) for number in range(100)]
+    other = [allocator.encode(number, bytes(32)) for number in range(100)]
+    assert codes != other
+    # Des numéros consécutifs ne donnent pas des codes consécutifs
+    assert codes != sorted(codes)
+
+
+def test_base62_encode():
+    assert base62_encode(0, 3) == '000'
+    assert base62_encode(61, 1) == 'Z'
+    assert base62_encode(62, 2) == '10'
+    with pytest.raises(ValueError):
+        base62_encode(62, 1)
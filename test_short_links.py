@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests de la résolution des liens courts (/go/<code>) : filtre de Bloom et cache
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from models import db, QRCode, ShortLink
+
+MOBILE_UA = {'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 '
+                           '(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1'}
+DYNAMIC_QR = {'type': 'url', 'data': 'https://example.com', 'isDynamic': True,
+              'expiresAt': '2030-01-01T00:00:00Z'}
+
+
+@pytest.fixture
+def short_link_queries(app):
+    """Nombre de requêtes SQL lisant short_links"""
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if 'short_links' in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+    yield statements
+    with app.app_context():
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+
+def test_deleted_code_stops_reaching_database(client, login, short_link_queries):
+    headers = login()
+    qr_code = client.post('/qr-codes', json=DYNAMIC_QR, headers=headers).json
+    assert client.get(f"/go/{qr_code['short_code']}", headers=MOBILE_UA).status_code == 302
+    assert client.delete(f"/qr-codes/{qr_code['id']}", headers=headers).status_code == 200
+
+    # Le code reste « peut-être présent » dans le filtre : une lecture, puis le cache
+    short_link_queries.clear()
+    assert client.get(f"/go/{qr_code['short_code']}", headers=MOBILE_UA).status_code == 404
+    assert len(short_link_queries) == 1
+    for _ in range(5):
+        assert client.get(f"/go/{qr_code['short_code']}", headers=MOBILE_UA).status_code == 404
+    assert len(short_link_queries) == 1
+
+
+def test_unknown_code_is_cached(client, short_link_queries):
+    for _ in range(5):
+        assert client.get('/go/unknownCode', headers=MOBILE_UA).status_code == 404
+    assert len(short_link_queries) <= 1
+
+
+def test_code_created_by_another_worker(app, client, login):
+    login()
+    # Lien inséré directement en base, absent du filtre de ce worker
+    with app.app_context():
+        db.session.add(QRCode(id='other-worker', user_id=1, type='url', data='https://short/otherW1',
+                              expires_at=datetime(2030, 1, 1), is_dynamic=True))
+        db.session.add(ShortLink('otherW1', 'https://other.example', qr_code_id='other-worker'))
+        db.session.commit()
+    response = client.get('/go/otherW1', headers=MOBILE_UA)
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'https://other.example'
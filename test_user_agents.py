@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests de la classification des User-Agent (robots / humains, appareil)
+"""
+import pytest
+
+from user_agents import classify
+
+# (User-Agent réel, robot attendu, type d'appareil attendu pour un humain)
+USER_AGENTS = [
+    # Robots et générateurs d'aperçus
+    ('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)', True, None),
+    ('Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)', True, None),
+    ('Mozilla/5.0 (compatible; AhrefsBot/7.0; +http://ahrefs.com/robot/)', True, None),
+    ('Mozilla/5.0 (compatible; YandexBot/3.0; +http://yandex.com/bots)', True, None),
+    ('Mozilla/5.0 (compatible; Baiduspider/2.0; +http://www.baidu.com/search/spider.html)', True, None),
+    ('Mozilla/5.0 (compatible; Yahoo! Slurp; http://help.yahoo.com/help/us/ysearch/slurp)', True, None),
+    ('facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)', True, None),
+    ('WhatsApp/2.23.20.0 A', True, None),
+    ('TelegramBot (like TwitterBot)', True, None),
+    ('Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)', True, None),
+    ('Mozilla/5.0 (compatible; Discordbot/2.0; +https://discordapp.com)', True, None),
+    ('Twitterbot/1.0', True, None),
+    ('LinkedInBot/1.0 (compatible; Mozilla/5.0; Apache-HttpClient +http://www.linkedin.com)', True, None),
+    ('Pinterestbot/1.0 (+http://www.pinterest.com/bot.html)', True, None),
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'HeadlessChrome/120.0.0.0 Safari/537.36', True, None),
+    ('curl/8.4.0', True, None),
+    ('python-requests/2.31.0', True, None),
+    ('Mozilla/5.0 (compatible; UptimeRobot/2.0; http://www.uptimerobot.com/)', True, None),
+    ('', True, None),
+    # Humains, dont les cas autrefois classés robots
+    ('Mozilla/5.0 (Linux; Android 10; CUBOT X30) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/96.0.4664.45 Mobile Safari/537.36', False, 'mobile'),
+    ('Mozilla/5.0 (Linux; Android 11; KINGKONG 5 Pro Build/RP1A.200720.011; Cubot) '
+     'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0 Mobile Safari/537.36', False, 'mobile'),
+    ('Mozilla/5.0 (Linux; Android 12; Pixel 6 Build/SD1A.210817.036; wv) AppleWebKit/537.36 '
+     '(KHTML, like Gecko) Version/4.0 Chrome/97.0.4692.98 Mobile Safari/537.36 [Pinterest/Android]',
+     False, 'mobile'),
+    ('Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+     'Mobile/15E148 [Pinterest/iOS]', False, 'mobile'),
+    ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+     'Mobile/15E148 Instagram 302.0.0.23.114', False, 'mobile'),
+    ('okhttp/4.9.0', False, 'desktop'),
+    ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+     'Version/17.1 Mobile/15E148 Safari/604.1', False, 'mobile'),
+    ('Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+     'Version/16.6 Mobile/15E148 Safari/604.1', False, 'tablet'),
+    ('Mozilla/5.0 (Linux; Android 13; SM-X200) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/118.0.0.0 Safari/537.36', False, 'tablet'),
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0', False, 'desktop'),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:121.0) Gecko/20100101 Firefox/121.0', False, 'desktop'),
+]
+
+
+@pytest.mark.parametrize('user_agent,is_bot,device_type', USER_AGENTS)
+def test_classify(user_agent, is_bot, device_type):
+    info = classify(user_agent)
+    assert info.is_bot is is_bot
+    if is_bot:
+        assert info.device_type == 'bot'
+    else:
+        assert info.device_type == device_type
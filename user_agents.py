@@ -0,0 +1,99 @@
+"""
+Classification des User-Agent : type d'appareil, système, navigateur et
+robots (moteurs, aperçus de liens des messageries et réseaux sociaux).
+
+Les motifs sont compilés une fois au chargement du module et le résultat est
+mis en cache par chaîne User-Agent : le trafic réel n'en compte que quelques
+centaines de distinctes.
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+CACHE_SIZE = 4096
+
+# Robots et générateurs d'aperçus (le scan d'un humain ne passe jamais par eux).
+# Jetons exacts uniquement : « bot » doit être un mot ou précéder la version
+# (« Googlebot/2.1 ») pour ne pas capter les téléphones Cubot, et les
+# navigateurs intégrés (Pinterest, applications okhttp) restent humains.
+BOT_PATTERN = re.compile(
+    r'\bbot\b|[a-z]bot/|crawler|spider|\bslurp\b|facebookexternalhit|facebookcatalog|'
+    r'whatsapp/|telegrambot|slackbot|slack-imgproxy|discordbot|twitterbot|linkedinbot|'
+    r'skypeuripreview|embedly|pinterestbot|redditbot|applebot|bingpreview|'
+    r'google-inspectiontool|googleother|headlesschrome|phantomjs|chrome-lighthouse|'
+    r'curl/|wget/|python-requests|python-urllib|aiohttp|go-http-client|'
+    r'java/|libwww-perl|apache-httpclient|axios/|node-fetch|scrapy|'
+    r'uptimerobot|pingdom',
+    re.IGNORECASE
+)
+
+# (motif, nom) dans l'ordre de priorité : le premier qui correspond l'emporte
+OS_PATTERNS = [
+    (re.compile(r'windows phone', re.I), 'Windows Phone'),
+    (re.compile(r'windows', re.I), 'Windows'),
+    (re.compile(r'iphone|ipad|ipod', re.I), 'iOS'),
+    (re.compile(r'android', re.I), 'Android'),
+    (re.compile(r'cros', re.I), 'ChromeOS'),
+    (re.compile(r'mac os x|macintosh', re.I), 'macOS'),
+    (re.compile(r'linux', re.I), 'Linux'),
+]
+
+BROWSER_PATTERNS = [
+    (re.compile(r'edg(e|a|ios)?/', re.I), 'Edge'),
+    (re.compile(r'opr/|opera', re.I), 'Opera'),
+    (re.compile(r'samsungbrowser', re.I), 'Samsung Internet'),
+    (re.compile(r'firefox|fxios', re.I), 'Firefox'),
+    (re.compile(r'chrome|crios|chromium', re.I), 'Chrome'),
+    (re.compile(r'safari', re.I), 'Safari'),
+]
+
+# Tablettes d'abord : les UA d'iPad et de tablettes Android contiennent souvent
+# « Mobile » et étaient classés comme téléphones. Android sans « Mobile » nulle
+# part dans l'UA (un suffixe « [Pinterest/Android] » suit souvent « Mobile »)
+TABLET_PATTERN = re.compile(r'ipad|tablet|kindle|silk|playbook|^(?!.*mobile).*android', re.IGNORECASE)
+MOBILE_PATTERN = re.compile(r'mobi|iphone|ipod|android|windows phone|blackberry|opera mini', re.IGNORECASE)
+
+
+class UserAgentInfo(NamedTuple):
+    """Résultat de la classification d'un User-Agent"""
+    device_type: str            # mobile, tablet, desktop, bot
+    os: Optional[str]
+    browser: Optional[str]
+    is_bot: bool
+
+
+def _first_match(patterns, user_agent: str) -> Optional[str]:
+    for pattern, name in patterns:
+        if pattern.search(user_agent):
+            return name
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify(user_agent: Optional[str]) -> UserAgentInfo:
+    """Classe un User-Agent ; un UA absent est traité comme un robot"""
+    if not user_agent or not user_agent.strip():
+        return UserAgentInfo('bot', None, None, True)
+    os_name = _first_match(OS_PATTERNS, user_agent)
+    browser = _first_match(BROWSER_PATTERNS, user_agent)
+    if BOT_PATTERN.search(user_agent):
+        return UserAgentInfo('bot', os_name, browser, True)
+    if TABLET_PATTERN.search(user_agent):
+        device_type = 'tablet'
+    elif MOBILE_PATTERN.search(user_agent):
+        device_type = 'mobile'
+    else:
+        device_type = 'desktop'
+    return UserAgentInfo(device_type, os_name, browser, False)
+
+
+def cache_stats() -> dict:
+    """Efficacité du cache de classification"""
+    info = classify.cache_info()
+    return {
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'hits': info.hits,
+        'misses': info.misses
+    }